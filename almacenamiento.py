@@ -0,0 +1,1007 @@
+"""
+Almacenamiento de contactos compartido por los servidores.
+
+Los contactos viven en la tabla `contacts` de database.py (SQLite en modo
+WAL): cada alta es un INSERT indexado, sin reescribir ningún archivo, y las
+lecturas no bloquean a quien escribe. Los Excel dejaron de ser el registro
+principal; `ContactStore.export_excel()` los genera a pedido, fila a fila
+(xlsxwriter en modo constant_memory), y se envían por partes. Los Excel
+de versiones anteriores se copian una sola vez a la base con
+`ContactStore.import_legacy()`.
+
+`file_lock()` es un lock entre procesos para lo que todavía se coordina por
+archivo (crear las tablas, importar los archivos viejos), así que varios
+workers de gunicorn pueden arrancar a la vez.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from functools import wraps
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import xlsxwriter
+from flask import Response, make_response, request
+from openpyxl import load_workbook
+from sqlalchemy import case, delete, func, insert, literal, or_, select, update
+
+from database import (Contact, ContactImport, ContactStat, ContactsSessionLocal, contacts_database_path,
+                      contacts_engine, init_contacts_db)
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+CONTACT_FIELDS = (
+    'name', 'email', 'phone', 'signature', 'property_code', 'interest', 'budget',
+    'message', 'page', 'ip', 'user_agent', 'status', 'notes'
+)
+
+# Campos con contadores por valor en contact_stats (además del total y por día)
+STAT_FIELDS = ('interest', 'budget')
+
+# Contadores por período en contact_stats: métrica → (formato de la clave, largo)
+BUCKETS = {
+    'hour': ('%Y-%m-%d %H', timedelta(hours=1)),
+    'day': ('%Y-%m-%d', timedelta(days=1)),
+}
+# Campos que además se cuentan por día ("day:<campo>", clave "<día>|<valor>",
+# con el valor de `bucket_value()`)
+BUCKET_FIELDS = ('interest', 'page')
+
+# Encabezados de los Excel y diarios anteriores → campo de Contact
+LEGACY_COLUMNS = {
+    'Nombre': 'name',
+    'Email': 'email',
+    'Teléfono': 'phone',
+    'Firma': 'signature',
+    'Propiedad': 'property_code',
+    'Interés': 'interest',
+    'Presupuesto': 'budget',
+    'Mensaje': 'message',
+    'Página_Origen': 'page',
+    'Página': 'page',
+    'IP_Cliente': 'ip',
+    'IP': 'ip',
+    'User_Agent': 'user_agent',
+    'Estado': 'status',
+    'Notas': 'notes',
+}
+LEGACY_DATE_COLUMNS = ('Timestamp', 'Fecha/Hora', 'Fecha')
+LEGACY_DATE_FORMATS = ('%Y-%m-%d %H:%M:%S', '%d/%m/%Y %H:%M:%S', '%d/%m/%Y', '%Y-%m-%d')
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Contactos recientes que cada proceso tiene en memoria para los listados
+RECENT_CONTACTS_SIZE = int(os.environ.get('RECENT_CONTACTS_SIZE', 1000))
+
+# Envíos repetidos: cuántos se recuerdan y durante cuántos segundos
+SUBMISSION_INDEX_SIZE = int(os.environ.get('SUBMISSION_INDEX_SIZE', 10000))
+SUBMISSION_WINDOW = int(os.environ.get('SUBMISSION_WINDOW', 600))
+
+# Campos del formulario que cambian entre reintentos del mismo envío
+SUBMISSION_VOLATILE_FIELDS = ('timestamp', 'online', 'id_envio', 'submission_id')
+
+# Filas que se traen de la base por vez al exportar y tamaño de cada parte enviada
+EXPORT_BATCH_SIZE = 1000
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+# Los mensajes de los contactos se escriben como texto, nunca como fórmulas o links
+XLSX_OPTIONS = {'constant_memory': True, 'strings_to_formulas': False, 'strings_to_urls': False}
+
+
+@contextmanager
+def file_lock(path):
+    """
+    Lock exclusivo sobre `<path>.lock`, válido entre procesos y entre hilos
+    (cada entrada abre su propio descriptor). No es reentrante.
+    """
+    with open(f"{path}.lock", 'a+') as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def read_excel_records(path, sheet_name=None):
+    """Filas de una hoja de Excel como diccionarios por encabezado."""
+    wb = load_workbook(path, read_only=True)
+    try:
+        ws = wb[sheet_name] if sheet_name else wb.active
+        rows = ws.iter_rows(values_only=True)
+        headers = next(rows, None) or ()
+        return [dict(zip(headers, row)) for row in rows if any(cell is not None for cell in row)]
+    finally:
+        wb.close()
+
+
+def parse_legacy_date(record):
+    for column in LEGACY_DATE_COLUMNS:
+        value = record.get(column)
+        if isinstance(value, datetime):
+            return value
+        if not value:
+            continue
+        text = str(value).strip()
+        if column == 'Fecha' and record.get('Hora'):
+            text = f"{text} {record['Hora']}"
+        try:
+            return datetime.fromisoformat(text)
+        except ValueError:
+            pass
+        for fmt in LEGACY_DATE_FORMATS:
+            try:
+                return datetime.strptime(text, fmt)
+            except ValueError:
+                continue
+    return None
+
+
+def legacy_contact(record, source, default_date):
+    values = {'created_at': parse_legacy_date(record) or default_date, 'source': source}
+    for column, field in LEGACY_COLUMNS.items():
+        value = record.get(column)
+        if value is not None and value != '' and field not in values:
+            values[field] = str(value)
+    # main.py guardaba el email en la columna "Firma"
+    if 'email' not in values and '@' in values.get('signature', ''):
+        values['email'] = values.pop('signature')
+    return values
+
+
+def created(fmt):
+    """Columna de exportación con la fecha de alta en el formato `fmt`."""
+    return lambda contact: contact['created_at'].strftime(fmt)
+
+
+def column_value(contact, spec):
+    return spec(contact) if callable(spec) else contact.get(spec)
+
+
+def as_rows(contacts, columns):
+    """
+    Contactos con las columnas de cada servidor: `columns` va de encabezado
+    a campo de Contact o a una función que recibe el contacto.
+    """
+    return [
+        {label: column_value(contact, spec) for label, spec in columns.items()}
+        for contact in contacts
+    ]
+
+
+def bucket_value(field, value):
+    """
+    Valor con el que `field` se cuenta por día. De `page` (el Referer u Origin
+    que mandó el navegador) queda solo la ruta: la consulta y el fragmento
+    cambian de una visita a otra y sumarían una clave por contacto.
+    """
+    if field != 'page':
+        return value
+    try:
+        path = urlsplit(value).path
+    except ValueError:  # URL mal formada (p. ej. un IPv6 sin cerrar)
+        path = value.split('?', 1)[0].split('#', 1)[0]
+    return path or '/'
+
+
+def stat_keys(contact):
+    """(métrica, clave) de contact_stats que suma un contacto."""
+    keys = [('total', '')]
+    for metric, (fmt, _) in BUCKETS.items():
+        keys.append((metric, contact['created_at'].strftime(fmt)))
+    for field in STAT_FIELDS:
+        if contact.get(field):
+            keys.append((field, contact[field]))
+    day = contact['created_at'].strftime(BUCKETS['day'][0])
+    for field in BUCKET_FIELDS:
+        if contact.get(field):
+            keys.append((f'day:{field}', f"{day}|{bucket_value(field, contact[field])}"))
+    return keys
+
+
+def bucket_range(granularity, since=None, until=None):
+    """
+    Claves (desde, hasta exclusiva) de contact_stats para los períodos de
+    `granularity` que se superponen con [since, until).
+    """
+    fmt, step = BUCKETS[granularity]
+    first = since.strftime(fmt) if since else None
+    after = None
+    if until:
+        last = datetime.strptime((until - timedelta(microseconds=1)).strftime(fmt), fmt)
+        after = (last + step).strftime(fmt)
+    return first, after
+
+
+def bump_stats(session, contacts, known_widths=None):
+    """
+    Suma `contacts` a contact_stats dentro de la transacción de `session`:
+    una fila por clave tocada, sin importar cuántos contactos haya guardados.
+    """
+    tally = Counter(key for contact in contacts for key in stat_keys(contact))
+    for (metric, key), count in tally.items():
+        updated = session.execute(
+            update(ContactStat)
+            .where(ContactStat.metric == metric, ContactStat.key == key)
+            .values(count=ContactStat.count + count)
+        )
+        if updated.rowcount == 0:
+            session.add(ContactStat(metric=metric, key=key, count=count))
+    bump_widths(session, contacts, known_widths)
+
+
+def bump_widths(session, contacts, known_widths=None):
+    """
+    Lleva en contact_stats ("width", campo) el largo máximo de cada campo,
+    para dar ancho a las columnas del Excel sin recorrer sus celdas. Mira solo
+    los contactos nuevos; con `known_widths` (cota inferior de lo guardado)
+    no toca la base si ningún valor es más largo.
+    """
+    widths = {}
+    for contact in contacts:
+        for field in CONTACT_FIELDS:
+            value = contact.get(field)
+            if value:
+                widths[field] = max(widths.get(field, 0), len(str(value)))
+
+    for field, width in widths.items():
+        if known_widths is not None and width <= known_widths.get(field, 0):
+            continue
+        updated = session.execute(
+            update(ContactStat)
+            .where(ContactStat.metric == 'width', ContactStat.key == field)
+            .values(count=case((ContactStat.count < width, width), else_=ContactStat.count))
+        )
+        if updated.rowcount == 0:
+            session.add(ContactStat(metric='width', key=field, count=width))
+        if known_widths is not None:
+            known_widths[field] = width
+
+
+def top(tally, limit):
+    """[(valor, cantidad)] más frecuentes de un contador de `ContactStore.stats()`."""
+    return Counter(tally).most_common(limit)
+
+
+def parse_date_range(args):
+    """
+    (desde, hasta) de los parámetros ?desde=&hasta= (YYYY-MM-DD o fecha ISO).
+    Una fecha sin hora en `hasta` incluye ese día completo. ValueError si no se
+    pueden leer.
+    """
+    def parse(name):
+        value = args.get(name, '').strip()
+        if not value:
+            return None
+        try:
+            return datetime.fromisoformat(value), len(value) == 10
+        except ValueError:
+            raise ValueError(f"Fecha inválida en '{name}': {value} (usar AAAA-MM-DD)")
+
+    desde, hasta = parse('desde'), parse('hasta')
+    since = desde[0] if desde else None
+    until = None
+    if hasta:
+        until = hasta[0] + timedelta(days=1) if hasta[1] else hasta[0]
+    if since and until and since >= until:
+        raise ValueError("'desde' debe ser anterior a 'hasta'")
+    return since, until
+
+
+def write_contacts_sheet(workbook, sheet_name, columns, contacts, field_widths=None):
+    """
+    Hoja con una fila por contacto, escrita a medida que llegan (con
+    constant_memory cada fila se baja a disco). Devuelve cuántas filas escribió.
+
+    Las columnas que son un campo toman el ancho de `field_widths` (los largos
+    máximos de `ContactStore.field_widths()`); solo las calculadas se miden
+    mientras se escriben.
+    """
+    worksheet = workbook.add_worksheet(sheet_name)
+    specs = list(columns.values())
+    widths = [len(label) for label in columns]
+    measured = []
+    for i, spec in enumerate(specs):
+        if field_widths is not None and not callable(spec):
+            widths[i] = max(widths[i], field_widths.get(spec, 0))
+        else:
+            measured.append(i)
+    worksheet.write_row(0, 0, list(columns))
+
+    written = 0
+    for written, contact in enumerate(contacts, start=1):
+        values = [column_value(contact, spec) for spec in specs]
+        worksheet.write_row(written, 0, values)
+        for i in measured:
+            if values[i] is not None:
+                widths[i] = max(widths[i], len(str(values[i])))
+
+    for i, width in enumerate(widths):
+        worksheet.set_column(i, i, min(width + 2, 50))
+    return written
+
+
+def temporary_xlsx_path():
+    fd, path = tempfile.mkstemp(prefix='exportacion_', suffix='.xlsx')
+    os.close(fd)
+    return path
+
+
+class TemporaryFileStream:
+    """
+    Cuerpo de respuesta que envía un archivo en partes y lo borra al cerrarse
+    (el servidor WSGI llama a `close()` aunque el cliente corte la descarga).
+    """
+
+    def __init__(self, path, chunk_size=EXPORT_CHUNK_SIZE):
+        self.path = path
+        self.chunk_size = chunk_size
+
+    def __iter__(self):
+        with open(self.path, 'rb') as f:
+            for chunk in iter(lambda: f.read(self.chunk_size), b''):
+                yield chunk
+
+    def close(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+def xlsx_response(stream, filename):
+    """Descarga de un Excel generado con `export_excel()`."""
+    return Response(stream, mimetype=XLSX_MIMETYPE, headers={
+        'Content-Disposition': f'attachment; filename="{filename}"',
+        'Content-Length': str(os.path.getsize(stream.path))
+    })
+
+
+def submission_keys(payload):
+    """
+    Claves de un envío del formulario: la del encabezado Idempotency-Key o el
+    id que genera el cliente (`id_envio`/`submission_id`), y la huella del
+    contenido sin los campos que cambian entre reintentos.
+    """
+    keys = []
+    key = request.headers.get('Idempotency-Key') or payload.get('id_envio') or payload.get('submission_id')
+    if key:
+        keys.append(('key', str(key)))
+    content = {name: value for name, value in payload.items() if name not in SUBMISSION_VOLATILE_FIELDS}
+    fingerprint = hashlib.sha1(
+        json.dumps(content, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8')).hexdigest()
+    keys.append(('fingerprint', fingerprint))
+    return keys
+
+
+class _Submission:
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.expires = None
+
+
+class SubmissionIndex:
+    """
+    Envíos recientes del formulario por clave (ver `submission_keys()`), con
+    la respuesta que recibieron: un reintento o un doble click devuelve la
+    misma respuesta sin volver a guardar. Tiene a lo sumo `size` claves y cada
+    una dura `window` segundos. Vive en memoria del proceso.
+    """
+
+    def __init__(self, size=SUBMISSION_INDEX_SIZE, window=SUBMISSION_WINDOW):
+        self.size = size
+        self.window = window
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _find(self, keys, now):
+        for key in keys:
+            entry = self._entries.get(key)
+            if entry is None:
+                continue
+            if entry.expires is not None and entry.expires < now:
+                del self._entries[key]
+                continue
+            return entry
+        return None
+
+    def claim(self, keys):
+        """
+        (entry, True) si el envío es nuevo y le toca procesarlo a quien llama,
+        o (entry, False) si ya lo procesa o procesó otro pedido.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._find(keys, now)
+            if entry is not None:
+                return entry, False
+            entry = _Submission()
+            for key in keys:
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+            return entry, True
+
+    def finish(self, keys, entry, response):
+        """Guarda la respuesta de un envío; si es None (falló) lo olvida para que se reintente."""
+        with self._lock:
+            if response is None:
+                for key in keys:
+                    if self._entries.get(key) is entry:
+                        del self._entries[key]
+            else:
+                entry.response = response
+                entry.expires = time.monotonic() + self.window
+        entry.done.set()
+
+
+def idempotent(index):
+    """
+    Decorador para los endpoints que guardan un envío del formulario: si
+    `index` ya vio el envío devuelve la misma respuesta (cuerpo y estado) sin
+    tocar el almacenamiento. Solo se recuerdan las respuestas 2xx.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            payload = request.get_json(silent=True)
+            if not isinstance(payload, dict):
+                return view(*args, **kwargs)
+
+            keys = submission_keys(payload)
+            entry, owner = index.claim(keys)
+            if not owner:
+                entry.done.wait(30)
+                if entry.response is not None:
+                    body, status, mimetype = entry.response
+                    return Response(body, status=status, mimetype=mimetype)
+                return view(*args, **kwargs)
+
+            saved = None
+            try:
+                response = make_response(view(*args, **kwargs))
+                if 200 <= response.status_code < 300:
+                    saved = (response.get_data(), response.status_code, response.mimetype)
+                return response
+            finally:
+                index.finish(keys, entry, saved)
+        return wrapper
+    return decorator
+
+
+class ContactStore:
+    """
+    Contactos en la tabla `contacts` de database.py.
+
+    `source` identifica al servidor que los recibe; todos comparten la
+    misma tabla, así que cualquiera de ellos ve y exporta todos. Con otro
+    `session_factory` (un sessionmaker) las tablas y el lock son los de la
+    base a la que apunta.
+    """
+
+    def __init__(self, source, session_factory=ContactsSessionLocal, recent_size=RECENT_CONTACTS_SIZE):
+        self.source = source
+        self.session_factory = session_factory
+        engine = getattr(session_factory, 'kw', {}).get('bind') or contacts_engine
+        self.path = contacts_database_path(engine)
+        with file_lock(self.path):
+            init_contacts_db(engine)
+            self._sync_stats()
+        self._known_widths = self.field_widths()
+        self.recent_size = recent_size
+        self._recent = deque(maxlen=recent_size)
+        self._recent_lock = threading.Lock()
+
+    def add(self, created_at=None, **fields):
+        """Guarda un contacto y lo devuelve como diccionario (con `contact_id`)."""
+        values = {'created_at': created_at or datetime.now(), 'source': self.source, **fields}
+        with self.session_factory() as session:
+            result = session.execute(insert(Contact).values(**values))
+            bump_stats(session, [values], self._known_widths)
+            session.commit()
+        values['contact_id'] = result.inserted_primary_key[0]
+        return values
+
+    def _sync_stats(self):
+        """
+        Rehace contact_stats desde los contactos si no coincide con ellos
+        (primer arranque con esta tabla o sin anchos, o filas cargadas por
+        fuera del store).
+        """
+        with self.session_factory() as session:
+            total = session.get(ContactStat, ('total', ''))
+            contacts = session.execute(select(func.count()).select_from(Contact)).scalar_one()
+            # Bases de antes de los anchos o de los contadores por hora: recalcular
+            metrics = session.execute(
+                select(func.count(ContactStat.metric.distinct()))
+                .where(ContactStat.metric.in_(('width', 'hour')))).scalar_one()
+            # Y las que contaban las páginas con la URL entera (ver bucket_value)
+            raw_pages = session.execute(select(ContactStat.key).where(
+                ContactStat.metric == 'day:page',
+                or_(*(ContactStat.key.contains(mark) for mark in ('?', '#', '://')))).limit(1)).first()
+            if (total.count if total else 0) == contacts and (metrics == 2 or not contacts) and not raw_pages:
+                return
+
+            # Todo con INSERT ... SELECT dentro de la misma transacción de
+            # escritura, para que nadie agregue contactos entre el borrado y el conteo
+            session.execute(delete(ContactStat))
+            columns = ['metric', 'key', 'count']
+            session.execute(insert(ContactStat).from_select(columns, select(
+                literal('total'), literal(''), func.count()).select_from(Contact)))
+            for metric, (fmt, _) in BUCKETS.items():
+                bucket = func.strftime(fmt, Contact.created_at)
+                session.execute(insert(ContactStat).from_select(columns, select(
+                    literal(metric), bucket, func.count()).group_by(bucket)))
+            day = func.strftime(BUCKETS['day'][0], Contact.created_at)
+            for field in BUCKET_FIELDS:
+                # Por valor guardado; bucket_value() junta los que dan la misma clave
+                column = getattr(Contact, field)
+                tally = Counter()
+                for bucket, value, count in session.execute(select(day, column, func.count())
+                                                            .where(column.isnot(None), column != '')
+                                                            .group_by(day, column)):
+                    tally[f"{bucket}|{bucket_value(field, value)}"] += count
+                if tally:
+                    session.execute(insert(ContactStat), [
+                        {'metric': f'day:{field}', 'key': key, 'count': count} for key, count in tally.items()])
+            for field in STAT_FIELDS:
+                column = getattr(Contact, field)
+                session.execute(insert(ContactStat).from_select(columns, select(
+                    literal(field), column, func.count())
+                    .where(column.isnot(None), column != '').group_by(column)))
+            for field in CONTACT_FIELDS:
+                column = getattr(Contact, field)
+                session.execute(insert(ContactStat).from_select(columns, select(
+                    literal('width'), literal(field), func.max(func.length(column)))
+                    .where(column.isnot(None), column != '')
+                    .having(func.count() > 0)))
+            session.commit()
+        logger.info("Estadísticas de contactos recalculadas")
+
+    def stats(self):
+        """
+        Contadores acumulados: {'total': n, 'interest': {valor: n},
+        'budget': {valor: n}, 'width': {campo: largo}}. Los contadores por
+        período se leen con `rollup()`.
+        """
+        tallies = {'total': 0, 'width': {}}
+        tallies.update({field: {} for field in STAT_FIELDS})
+        query = select(ContactStat).where(ContactStat.metric.in_(tallies))
+        with self.session_factory() as session:
+            for stat in session.scalars(query):
+                if stat.metric == 'total':
+                    tallies['total'] = stat.count
+                else:
+                    tallies[stat.metric][stat.key] = stat.count
+        return tallies
+
+    def rollup(self, granularity='day', since=None, until=None, by=None):
+        """
+        Contactos por período ('hour' o 'day') que se superpone con
+        [since, until): {período: n}. Con `by` (uno de BUCKET_FIELDS, solo por
+        día) {período: {valor: n}}. Lee una fila de contact_stats por período
+        y valor, no los contactos.
+        """
+        if by is not None:
+            if granularity != 'day' or by not in BUCKET_FIELDS:
+                raise ValueError(f"No hay contadores por {granularity} y {by}")
+            metric = f'day:{by}'
+        else:
+            metric = granularity
+        first, after = bucket_range(granularity, since, until)
+
+        query = select(ContactStat.key, ContactStat.count).where(ContactStat.metric == metric)
+        if first is not None:
+            query = query.where(ContactStat.key >= first)
+        if after is not None:
+            query = query.where(ContactStat.key < after)
+        with self.session_factory() as session:
+            rows = session.execute(query.order_by(ContactStat.key)).all()
+
+        if by is None:
+            return dict(rows)
+        buckets = {}
+        for key, count in rows:
+            bucket, value = key.split('|', 1)
+            buckets.setdefault(bucket, {})[value] = count
+        return buckets
+
+    def restore(self, contacts, batch_size=EXPORT_BATCH_SIZE):
+        """
+        Carga contactos de un respaldo conservando su `contact_id` y recalcula
+        contact_stats. Solo sobre una base sin contactos (ValueError si no).
+        """
+        loaded = 0
+        with file_lock(self.path):
+            with self.session_factory() as session:
+                if session.execute(select(Contact.contact_id).limit(1)).first():
+                    raise ValueError("La base ya tiene contactos; restaurar solo sobre una base vacía")
+                batch = []
+                for contact in contacts:
+                    batch.append(contact)
+                    if len(batch) == batch_size:
+                        session.execute(insert(Contact), batch)
+                        loaded += len(batch)
+                        batch = []
+                if batch:
+                    session.execute(insert(Contact), batch)
+                    loaded += len(batch)
+                session.commit()
+            self._sync_stats()
+        self._known_widths = self.field_widths()
+        with self._recent_lock:
+            self._recent.clear()
+        return loaded
+
+    def _query(self, since=None, until=None, after_id=None):
+        query = select(Contact.__table__)
+        if after_id is not None:
+            query = query.where(Contact.contact_id > after_id)
+        if since is not None:
+            query = query.where(Contact.created_at >= since)
+        if until is not None:
+            query = query.where(Contact.created_at < until)
+        return query
+
+    def contacts(self, limit=None, since=None, until=None):
+        """Contactos en orden de llegada; con `limit`, solo los últimos `limit`."""
+        query = self._query(since, until)
+        if limit:
+            query = query.order_by(Contact.contact_id.desc()).limit(limit)
+        else:
+            query = query.order_by(Contact.contact_id)
+        with self.session_factory() as session:
+            rows = [dict(row) for row in session.execute(query).mappings()]
+        return rows[::-1] if limit else rows
+
+    def page(self, limit, before=None, after=None):
+        """
+        (contactos, total): hasta `limit` contactos del más nuevo al más viejo.
+        `before` y `after` son ids usados como cursores: solo los anteriores o
+        posteriores a ellos (con `after`, los más próximos a ese id). Cada
+        página es un rango sobre la clave primaria, sin importar el total.
+        """
+        query = select(Contact.__table__)
+        if before is not None:
+            query = query.where(Contact.contact_id < before)
+        if after is not None:
+            query = query.where(Contact.contact_id > after).order_by(Contact.contact_id)
+        else:
+            query = query.order_by(Contact.contact_id.desc())
+        with self.session_factory() as session:
+            rows = [dict(row) for row in session.execute(query.limit(limit)).mappings()]
+            total = session.get(ContactStat, ('total', ''))
+        return (rows[::-1] if after is not None else rows), (total.count if total else 0)
+
+    def iter_contacts(self, since=None, until=None, batch_size=EXPORT_BATCH_SIZE, after_id=None):
+        """
+        Recorre los contactos en orden de llegada sin cargarlos todos en memoria;
+        con `after_id`, solo los de id mayor.
+        """
+        query = self._query(since, until, after_id).order_by(Contact.contact_id)
+        with self.session_factory() as session:
+            result = session.execute(query.execution_options(yield_per=batch_size))
+            for row in result.mappings():
+                yield dict(row)
+
+    def count(self, since=None, until=None):
+        query = select(func.count()).select_from(self._query(since, until).subquery())
+        with self.session_factory() as session:
+            return session.execute(query).scalar_one()
+
+    def last_id(self):
+        """Id del último contacto guardado (0 si no hay ninguno)."""
+        with self.session_factory() as session:
+            return session.execute(select(func.max(Contact.contact_id))).scalar_one() or 0
+
+    def version(self):
+        """
+        (último id, total de contact_stats): cambia con cada alta de cualquier
+        proceso y se lee sin recorrer la tabla.
+        """
+        with self.session_factory() as session:
+            last_id = session.execute(select(func.max(Contact.contact_id))).scalar_one() or 0
+            total = session.get(ContactStat, ('total', ''))
+            return last_id, total.count if total else 0
+
+    def field_widths(self):
+        """{campo: largo máximo guardado}, para el ancho de las columnas del Excel."""
+        query = select(ContactStat.key, ContactStat.count).where(ContactStat.metric == 'width')
+        with self.session_factory() as session:
+            return dict(session.execute(query).all())
+
+    def count_today(self):
+        with self.session_factory() as session:
+            today = session.get(ContactStat, ('day', datetime.now().strftime(BUCKETS['day'][0])))
+            return today.count if today else 0
+
+    def recent(self, limit):
+        """
+        Últimos `limit` contactos en orden de llegada. Hasta `recent_size` salen
+        de un buffer en memoria al que solo se le agregan los contactos con id
+        mayor al último que tiene (también los guardados por otros procesos),
+        así que el costo no depende de cuántos contactos haya en total.
+        """
+        if limit > self.recent_size:
+            return self.contacts(limit=limit)
+
+        with self._recent_lock:
+            query = select(Contact.__table__).order_by(Contact.contact_id.desc()).limit(self.recent_size)
+            if self._recent:
+                query = query.where(Contact.contact_id > self._recent[-1]['contact_id'])
+            with self.session_factory() as session:
+                new = [dict(row) for row in session.execute(query).mappings()]
+            if len(new) == self.recent_size:
+                self._recent.clear()
+            self._recent.extend(reversed(new))
+            return list(self._recent)[-limit:] if limit > 0 else []
+
+    def last(self):
+        """El contacto más reciente, o None."""
+        latest = self.recent(1)
+        return latest[0] if latest else None
+
+    def export_excel(self, columns, since=None, until=None, sheet_name='Contactos'):
+        """
+        Genera el Excel de los contactos (opcionalmente entre `since` y
+        `until`) en un archivo temporal, sin tenerlos todos en memoria.
+        Devuelve un TemporaryFileStream para enviarlo con `xlsx_response()`.
+        """
+        path = temporary_xlsx_path()
+        try:
+            workbook = xlsxwriter.Workbook(path, XLSX_OPTIONS)
+            write_contacts_sheet(workbook, sheet_name, columns, self.iter_contacts(since, until),
+                                 field_widths=self.field_widths())
+            workbook.close()
+        except Exception:
+            os.remove(path)
+            raise
+        return TemporaryFileStream(path)
+
+    def import_legacy(self, path, sheet_name=None):
+        """
+        Copia a la base los contactos de un Excel anterior.
+        Cada archivo se importa una sola vez (se reconoce por su contenido).
+        Devuelve cuántos contactos copió.
+        """
+        path = str(path)
+        if not os.path.exists(path):
+            return 0
+
+        with file_lock(path):
+            with open(path, 'rb') as f:
+                file_hash = hashlib.sha1(f.read()).hexdigest()
+            with self.session_factory() as session:
+                if session.get(ContactImport, file_hash) is not None:
+                    return 0
+
+                records = read_excel_records(path, sheet_name)
+                now = datetime.now()
+                values = [legacy_contact(record, self.source, now) for record in records]
+                values = [v for v in values if any(field in v for field in CONTACT_FIELDS)]
+
+                if values:
+                    session.execute(insert(Contact), values)
+                    bump_stats(session, values)
+                session.add(ContactImport(file_hash=file_hash, path=os.path.abspath(path),
+                                          imported_at=now, rows=len(values)))
+                session.commit()
+
+        logger.info(f"Importados {len(values)} contactos de {path}")
+        return len(values)
+
+
+class ExcelStorageManager:
+    """
+    📊 Gestor de consultas del formulario
+    Guarda cada consulta en la base de contactos, genera a pedido el Excel
+    (con hoja de estadísticas) y respalda las consultas con respaldos.py.
+    """
+    
+    def __init__(self, base_path='data'):
+        self.base_path = Path(base_path)
+        self.excel_path = self.base_path / 'excel' / 'consultas.xlsx'
+        self.backup_path = self.base_path / 'backups'
+        
+        # Crear directorios si no existen
+        self._crear_estructura_directorios()
+        
+        # Configuración de columnas (encabezado → campo del contacto)
+        self.columnas = {
+            'Fecha': created('%d/%m/%Y'),
+            'Hora': created('%H:%M:%S'),
+            'Timestamp': lambda contacto: contacto['created_at'].isoformat(),
+            'Nombre': 'name',
+            'Email': 'email',
+            'Teléfono': 'phone',
+            'Interés': 'interest',
+            'Presupuesto': 'budget',
+            'Mensaje': 'message',
+            'Página': 'page',
+            'IP': 'ip',
+            'User_Agent': 'user_agent',
+            'Estado': 'status',
+            'Notas': 'notes'
+        }
+        
+        # Base de contactos; el Excel de versiones anteriores se importa una vez
+        self.store = ContactStore('sistema_formulario')
+        self.store.import_legacy(self.excel_path, sheet_name='Consultas')
+        
+        # Respaldos incrementales en un hilo aparte (respaldos.py importa este módulo)
+        from respaldos import BackupWorker
+        self.respaldos = BackupWorker(self.store, str(self.backup_path))
+        
+        logging.info(f"✅ Sistema de almacenamiento inicializado en: {self.base_path}")
+    
+    def _crear_estructura_directorios(self):
+        """Crear estructura de directorios necesaria"""
+        directorios = [
+            self.base_path / 'excel',
+            self.base_path / 'backups',
+            self.base_path / 'temp'
+        ]
+        
+        for directorio in directorios:
+            directorio.mkdir(parents=True, exist_ok=True)
+    
+    def añadir_consulta(self, datos_formulario):
+        """
+        📝 Añadir nueva consulta al sistema de almacenamiento
+        """
+        try:
+            consulta = self.store.add(
+                name=datos_formulario.get('nombre', ''),
+                email=datos_formulario.get('email', ''),
+                phone=datos_formulario.get('telefono', ''),
+                interest=datos_formulario.get('interes', ''),
+                budget=datos_formulario.get('presupuesto', ''),
+                message=datos_formulario.get('mensaje', ''),
+                page=datos_formulario.get('pagina', 'Desconocida'),
+                ip=request.remote_addr if request else 'N/A',
+                user_agent=request.headers.get('User-Agent', 'N/A') if request else 'N/A',
+                status='Nueva',
+                notes=''
+            )
+            
+            # Crear backup automático
+            self._crear_backup_automatico()
+            
+            logging.info(f"✅ Consulta guardada: {consulta['name']} - {consulta['email']}")
+            
+            return {
+                'success': True,
+                'message': 'Consulta guardada correctamente',
+                'timestamp': consulta['created_at'].isoformat(),
+                'id': consulta['contact_id']
+            }
+            
+        except Exception as e:
+            logging.error(f"❌ Error guardando consulta: {str(e)}")
+            return {
+                'success': False,
+                'error': str(e),
+                'message': 'Error al guardar consulta'
+            }
+    
+    def _escribir_excel(self, path, desde=None, hasta=None):
+        """💾 Escribir el Excel de consultas (hoja principal y estadísticas) fila a fila"""
+        workbook = xlsxwriter.Workbook(path, XLSX_OPTIONS)
+        
+        # Sheet principal, una consulta por fila
+        write_contacts_sheet(workbook, 'Consultas', self.columnas,
+                             self.store.iter_contacts(since=desde, until=hasta),
+                             field_widths=self.store.field_widths())
+        
+        # Sheet de estadísticas
+        worksheet = workbook.add_worksheet('Estadísticas')
+        worksheet.write_row(0, 0, ['Métrica', 'Valor'])
+        for fila, (metrica, valor) in enumerate(self._generar_estadisticas(), start=1):
+            worksheet.write_row(fila, 0, [metrica, str(valor)])
+        
+        workbook.close()
+    
+    def exportar_excel(self, desde=None, hasta=None):
+        """📊 Generar el Excel de consultas para descargar con `xlsx_response()`"""
+        path = temporary_xlsx_path()
+        try:
+            self._escribir_excel(path, desde, hasta)
+        except Exception:
+            os.remove(path)
+            raise
+        return TemporaryFileStream(path)
+    
+    def _crear_backup_automatico(self):
+        """🗂️ Avisar al hilo de respaldos: hace un incremental cada 50 consultas nuevas"""
+        self.respaldos.notify()
+    
+    def _generar_estadisticas(self):
+        """📊 Estadísticas de las consultas desde los contadores acumulados: [(métrica, valor)]"""
+        try:
+            stats = self.store.stats()
+            ultima = self.store.last()
+            hoy = datetime.combine(datetime.now().date(), datetime.min.time())
+            semana = self.store.rollup('day', since=hoy - timedelta(days=6))
+            
+            estadisticas = {
+                'Total Consultas': stats['total'],
+                'Consultas Hoy': self.store.count_today(),
+                'Interés Más Común': dict(top(stats['interest'], 1)),
+                'Presupuesto Más Común': dict(top(stats['budget'], 1)),
+                'Última Consulta': ultima['created_at'].strftime('%d/%m/%Y') if ultima else 'N/A',
+                'Consultas Esta Semana': sum(semana.values())
+            }
+            
+            return list(estadisticas.items())
+            
+        except Exception as e:
+            logging.error(f"❌ Error generando estadísticas: {str(e)}")
+            return [('Error', str(e))]
+    
+    def obtener_consultas(self, limite=100):
+        """📋 Obtener últimas consultas"""
+        try:
+            return as_rows(self.store.recent(limite), self.columnas)
+        except Exception as e:
+            logging.error(f"❌ Error obteniendo consultas: {str(e)}")
+            return []
+    
+    def exportar_resumen(self):
+        """📊 Exportar resumen de estadísticas"""
+        try:
+            stats = self.store.stats()
+            total = stats['total']
+            if total == 0:
+                return "No hay datos para exportar"
+            
+            def mas_consultados(campo):
+                valores = top(stats[campo], 5)
+                return '\n'.join(f"{valor}    {cantidad}" for valor, cantidad in valores) or 'No hay datos'
+            
+            resumen = f"""
+📊 RESUMEN DE CONSULTAS - {datetime.now().strftime('%d/%m/%Y %H:%M')}
+
+📈 ESTADÍSTICAS GENERALES:
+• Total de consultas: {total}
+• Consultas hoy: {self.store.count_today()}
+• Última consulta: {self.store.last()['created_at'].strftime('%d/%m/%Y')}
+
+🎯 INTERESES MÁS CONSULTADOS:
+{mas_consultados('interest')}
+
+💰 PRESUPUESTOS MÁS CONSULTADOS:
+{mas_consultados('budget')}
+
+📁 ARCHIVOS:
+• Base de datos: {self.store.path}
+• Excel: se genera a pedido en /api/exportar-excel
+• Backups: {self.backup_path}
+            """
+            
+            return resumen
+            
+        except Exception as e:
+            return f"Error generando resumen: {str(e)}"
@@ -9,16 +9,10 @@ en Excel y CSV. Incluye modo offline, respaldos automáticos y manejo de errores
 
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-import pandas as pd
-import json
-import os
 from datetime import datetime
-import csv
 import logging
-import threading
-import time
-import glob
-from pathlib import Path
+
+from almacenamiento import ExcelStorageManager, SubmissionIndex, idempotent, parse_date_range, xlsx_response
 
 # Configuración de logging
 logging.basicConfig(
@@ -30,252 +24,6 @@ logging.basicConfig(
     ]
 )
 
-class ExcelStorageManager:
-    """
-    📊 Gestor completo de almacenamiento en Excel
-    Maneja múltiples archivos, respaldos y exportación automática
-    """
-    
-    def __init__(self, base_path='data'):
-        self.base_path = Path(base_path)
-        self.excel_path = self.base_path / 'excel' / 'consultas.xlsx'
-        self.csv_path = self.base_path / 'excel' / 'consultas.csv'
-        self.backup_path = self.base_path / 'backups'
-        
-        # Crear directorios si no existen
-        self._crear_estructura_directorios()
-        
-        # Configuración de columnas
-        self.columnas = [
-            'Fecha', 'Hora', 'Timestamp', 'Nombre', 'Email', 'Teléfono', 
-            'Interés', 'Presupuesto', 'Mensaje', 'Página', 'IP', 'User_Agent',
-            'Estado', 'Notas'
-        ]
-        
-        # Inicializar archivos
-        self._inicializar_archivos()
-        
-        logging.info(f"✅ Sistema de almacenamiento inicializado en: {self.base_path}")
-    
-    def _crear_estructura_directorios(self):
-        """Crear estructura de directorios necesaria"""
-        directorios = [
-            self.base_path / 'excel',
-            self.base_path / 'backups',
-            self.base_path / 'temp'
-        ]
-        
-        for directorio in directorios:
-            directorio.mkdir(parents=True, exist_ok=True)
-    
-    def _inicializar_archivos(self):
-        """Inicializar archivos Excel y CSV con encabezados"""
-        # Crear DataFrame con encabezados
-        df_vacio = pd.DataFrame(columns=self.columnas)
-        
-        # Guardar en Excel si no existe
-        if not self.excel_path.exists():
-            with pd.ExcelWriter(self.excel_path, engine='openpyxl') as writer:
-                df_vacio.to_excel(writer, sheet_name='Consultas', index=False)
-                df_vacio.to_excel(writer, sheet_name='Backup', index=False)
-        
-        # Crear CSV con encabezados
-        if not self.csv_path.exists():
-            with open(self.csv_path, 'w', newline='', encoding='utf-8') as f:
-                writer = csv.writer(f)
-                writer.writerow(self.columnas)
-    
-    def añadir_consulta(self, datos_formulario):
-        """
-        📝 Añadir nueva consulta al sistema de almacenamiento
-        """
-        try:
-            # Preparar datos completos
-            timestamp = datetime.now()
-            fecha_hora = timestamp.strftime('%d/%m/%Y %H:%M:%S')
-            
-            consulta_completa = {
-                'Fecha': timestamp.strftime('%d/%m/%Y'),
-                'Hora': timestamp.strftime('%H:%M:%S'),
-                'Timestamp': timestamp.isoformat(),
-                'Nombre': datos_formulario.get('nombre', ''),
-                'Email': datos_formulario.get('email', ''),
-                'Teléfono': datos_formulario.get('telefono', ''),
-                'Interés': datos_formulario.get('interes', ''),
-                'Presupuesto': datos_formulario.get('presupuesto', ''),
-                'Mensaje': datos_formulario.get('mensaje', ''),
-                'Página': datos_formulario.get('pagina', 'Desconocida'),
-                'IP': request.remote_addr if request else 'N/A',
-                'User_Agent': request.headers.get('User-Agent', 'N/A') if request else 'N/A',
-                'Estado': 'Nueva',
-                'Notas': ''
-            }
-            
-            # Guardar en Excel (sheet principal)
-            self._guardar_en_excel(consulta_completa)
-            
-            # Guardar en CSV
-            self._guardar_en_csv(consulta_completa)
-            
-            # Crear backup automático
-            self._crear_backup_automatico()
-            
-            logging.info(f"✅ Consulta guardada: {consulta_completa['Nombre']} - {consulta_completa['Email']}")
-            
-            return {
-                'success': True,
-                'message': 'Consulta guardada correctamente',
-                'timestamp': consulta_completa['Timestamp'],
-                'file': str(self.excel_path)
-            }
-            
-        except Exception as e:
-            logging.error(f"❌ Error guardando consulta: {str(e)}")
-            return {
-                'success': False,
-                'error': str(e),
-                'message': 'Error al guardar consulta'
-            }
-    
-    def _guardar_en_excel(self, consulta):
-        """💾 Guardar en archivo Excel con formato"""
-        try:
-            # Leer Excel existente
-            df = pd.read_excel(self.excel_path, sheet_name='Consultas')
-            
-            # Añadir nueva fila
-            df_nuevo = pd.DataFrame([consulta])
-            df_completo = pd.concat([df, df_nuevo], ignore_index=True)
-            
-            # Guardar con formato
-            with pd.ExcelWriter(self.excel_path, engine='openpyxl') as writer:
-                # Sheet principal con formato
-                df_completo.to_excel(writer, sheet_name='Consultas', index=False)
-                
-                # Sheet de backup
-                df_completo.to_excel(writer, sheet_name='Backup', index=False)
-                
-                # Sheet de estadísticas
-                stats = self._generar_estadisticas()
-                stats.to_excel(writer, sheet_name='Estadísticas', index=False)
-                
-                # Formatear columnas
-                workbook = writer.book
-                worksheet = writer.sheets['Consultas']
-                
-                # Formatear columnas de texto
-                for column in worksheet.columns:
-                    max_length = 0
-                    column_letter = column[0].column_letter
-                    for cell in column:
-                        try:
-                            if len(str(cell.value)) > max_length:
-                                max_length = len(str(cell.value))
-                        except:
-                            pass
-                    adjusted_width = min(max_length + 2, 50)
-                    worksheet.column_dimensions[column_letter].width = adjusted_width
-            
-            logging.info("✅ Guardado en Excel completado")
-            
-        except Exception as e:
-            logging.error(f"❌ Error guardando en Excel: {str(e)}")
-            raise
-    
-    def _guardar_en_csv(self, consulta):
-        """📄 Guardar en archivo CSV"""
-        try:
-            with open(self.csv_path, 'a', newline='', encoding='utf-8') as f:
-                writer = csv.DictWriter(f, fieldnames=self.columnas)
-                writer.writerow(consulta)
-            
-            logging.info("✅ Guardado en CSV completado")
-            
-        except Exception as e:
-            logging.error(f"❌ Error guardando en CSV: {str(e)}")
-            raise
-    
-    def _crear_backup_automatico(self):
-        """🗂️ Crear backup automático cada 50 consultas"""
-        try:
-            # Contar consultas actuales
-            df = pd.read_excel(self.excel_path, sheet_name='Consultas')
-            total_consultas = len(df)
-            
-            if total_consultas > 0 and total_consultas % 50 == 0:
-                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                backup_file = self.backup_path / f'backup_consultas_{timestamp}.xlsx'
-                
-                # Copiar archivo completo
-                import shutil
-                shutil.copy2(self.excel_path, backup_file)
-                
-                logging.info(f"🗂️ Backup creado: {backup_file}")
-                
-        except Exception as e:
-            logging.error(f"❌ Error creando backup: {str(e)}")
-    
-    def _generar_estadisticas(self):
-        """📊 Generar estadísticas de las consultas"""
-        try:
-            df = pd.read_excel(self.excel_path, sheet_name='Consultas')
-            
-            stats = {
-                'Total Consultas': len(df),
-                'Consultas Hoy': len(df[df['Fecha'] == datetime.now().strftime('%d/%m/%Y')]),
-                'Interés Más Común': df['Interés'].value_counts().head(1).to_dict() if not df.empty else {},
-                'Presupuesto Más Común': df['Presupuesto'].value_counts().head(1).to_dict() if not df.empty else {},
-                'Última Consulta': df['Fecha'].max() if not df.empty else 'N/A',
-                'Consultas Esta Semana': len(df[df['Fecha'] >= (datetime.now() - pd.Timedelta(days=7)).strftime('%d/%m/%Y')]) if not df.empty else 0
-            }
-            
-            return pd.DataFrame(list(stats.items()), columns=['Métrica', 'Valor'])
-            
-        except Exception as e:
-            logging.error(f"❌ Error generando estadísticas: {str(e)}")
-            return pd.DataFrame({'Métrica': ['Error'], 'Valor': [str(e)]})
-    
-    def obtener_consultas(self, limite=100):
-        """📋 Obtener últimas consultas"""
-        try:
-            df = pd.read_excel(self.excel_path, sheet_name='Consultas')
-            return df.tail(limite).to_dict('records')
-        except Exception as e:
-            logging.error(f"❌ Error obteniendo consultas: {str(e)}")
-            return []
-    
-    def exportar_resumen(self):
-        """📊 Exportar resumen de estadísticas"""
-        try:
-            df = pd.read_excel(self.excel_path, sheet_name='Consultas')
-            if df.empty:
-                return "No hay datos para exportar"
-            
-            resumen = f"""
-📊 RESUMEN DE CONSULTAS - {datetime.now().strftime('%d/%m/%Y %H:%M')}
-
-📈 ESTADÍSTICAS GENERALES:
-• Total de consultas: {len(df)}
-• Consultas hoy: {len(df[df['Fecha'] == datetime.now().strftime('%d/%m/%Y')])}
-• Última consulta: {df['Fecha'].max()}
-
-🎯 INTERESES MÁS CONSULTADOS:
-{df['Interés'].value_counts().head(5).to_string() if not df.empty else 'No hay datos'}
-
-💰 PRESUPUESTOS MÁS CONSULTADOS:
-{df['Presupuesto'].value_counts().head(5).to_string() if not df.empty else 'No hay datos'}
-
-📁 ARCHIVOS:
-• Excel: {self.excel_path}
-• CSV: {self.csv_path}
-• Backups: {self.backup_path}
-            """
-            
-            return resumen
-            
-        except Exception as e:
-            return f"Error generando resumen: {str(e)}"
-
 # Crear aplicación Flask
 app = Flask(__name__)
 CORS(app)  # Permitir solicitudes desde cualquier origen
@@ -283,6 +31,9 @@ CORS(app)  # Permitir solicitudes desde cualquier origen
 # Inicializar gestor de almacenamiento
 storage_manager = ExcelStorageManager()
 
+# Envíos recientes: reintentos y doble click no se guardan dos veces
+envios_recientes = SubmissionIndex()
+
 @app.route('/')
 def home():
     """🏠 Página principal del sistema"""
@@ -304,14 +55,12 @@ def health_check():
     return jsonify({
         'status': 'healthy',
         'timestamp': datetime.now().isoformat(),
-        'storage_path': str(storage_manager.excel_path),
-        'files_exist': {
-            'excel': storage_manager.excel_path.exists(),
-            'csv': storage_manager.csv_path.exists()
-        }
+        'storage_path': str(storage_manager.base_path),
+        'total_consultas': storage_manager.store.count()
     })
 
 @app.route('/api/guardar-contacto', methods=['POST'])
+@idempotent(envios_recientes)
 def guardar_contacto():
     """💾 Guardar nueva consulta de contacto"""
     try:
@@ -399,19 +148,26 @@ def obtener_resumen():
 
 @app.route('/api/exportar-excel', methods=['GET'])
 def exportar_excel():
-    """📊 Exportar archivo Excel"""
+    """📊 Exportar archivo Excel (rango opcional: ?desde=AAAA-MM-DD&hasta=AAAA-MM-DD)"""
+    try:
+        desde, hasta = parse_date_range(request.args)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    
     try:
-        if not storage_manager.excel_path.exists():
+        if storage_manager.store.count(since=desde, until=hasta) == 0:
             return jsonify({
                 'success': False,
                 'error': 'No hay datos para exportar'
             }), 404
         
-        # Leer archivo y devolver como descarga
-        return app.send_file(
-            storage_manager.excel_path,
-            as_attachment=True,
-            download_name=f'consultas_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
+        # El Excel se genera en el momento a partir de la base de contactos
+        return xlsx_response(
+            storage_manager.exportar_excel(desde, hasta),
+            f'consultas_{datetime.now().strftime("%Y%m%d_%H%M%S")}.xlsx'
         )
         
     except Exception as e:
@@ -424,8 +180,8 @@ def exportar_excel():
 if __name__ == '__main__':
     print("🚀 Iniciando Sistema de Formularios con Almacenamiento Excel")
     print(f"📁 Archivos de datos en: {storage_manager.base_path}")
-    print(f"📊 Excel: {storage_manager.excel_path}")
-    print(f"📄 CSV: {storage_manager.csv_path}")
+    print(f"📊 Consultas registradas: {storage_manager.store.count()}")
+    print("📥 Excel: /api/exportar-excel")
     print("🌐 Servidor disponible en: http://localhost:5000")
     print("=" * 60)
     
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark de la conversión de propiedades de excel_to_json.py
+Dante Propiedades - `procesar_fila()` con `df.iterrows()` (una fila por vez)
+contra `procesar_propiedades()` (columna por columna), con filas sintéticas
+que incluyen valores vacíos, 'nan', columnas alternativas y formatos mixtos.
+
+    python benchmark_serializacion.py                 # 10k, 100k y 1M filas
+    python benchmark_serializacion.py 5000 20000      # otros tamaños
+
+Antes de medir verifica que los dos caminos den el mismo resultado.
+"""
+
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from excel_to_json import procesar_fila, procesar_propiedades
+
+TAMAÑOS = [10_000, 100_000, 1_000_000]
+
+# Filas con las que se compara el resultado de los dos caminos
+FILAS_VERIFICACION = 2_000
+
+
+def propiedades_sinteticas(filas, semilla=0):
+    """DataFrame con columnas como las de propiedades.xlsx ya limpias por limpiar_nombre_columna()"""
+    rng = np.random.default_rng(semilla)
+
+    def elegir(opciones):
+        return rng.choice(np.array(opciones, dtype=object), size=filas)
+
+    return pd.DataFrame({
+        'id_temporal': [f'UF{i:06d}' for i in range(filas)],
+        'titulo': elegir(['Departamento 2 ambientes', 'Casa con jardín', 'PH reciclado', '', np.nan]),
+        'nombre': elegir(['Monoambiente', 'Dúplex', np.nan]),
+        'barrio': elegir(['Palermo', 'Belgrano', 'Caballito', 'nan', np.nan]),
+        'precio': elegir(['USD 120.000', '95000', '1.250.000,50', '150000,5', 85000, np.nan, '']),
+        'ambientes': rng.integers(1, 6, size=filas),
+        'superficie': elegir(['45 m2', '120', 60.5, np.nan]),
+        'operacion': elegir(['Venta', 'Alquiler']),
+        'tipo': elegir(['Departamento', 'Casa', 'PH']),
+        'descripcion': elegir(['Luminoso, al frente', '  Con balcón  ', np.nan]),
+        'expensas': elegir(['$ 45.000', '30000', np.nan]),
+        'cochera': elegir(['Sí', 'no', 'X', '', np.nan]),
+        'pileta': elegir(['Si', 'No', np.nan]),
+        'aire': elegir(['con', 'sin', np.nan]),
+        'fotos': elegir(['a.jpg, b.jpg', 'c.jpg,, d.jpg', '', np.nan]),
+        'imagenes': elegir(['e.jpg', np.nan]),
+        'docs': elegir(['plano.pdf, reglamento.pdf', np.nan]),
+        'lat': elegir(['-34,6037', -34.58, 'sin dato', np.nan]),
+        'lng': elegir(['-58,3816', -58.43, np.nan]),
+    })
+
+
+def con_iterrows(df):
+    return [procesar_fila(fila) for _, fila in df.iterrows()]
+
+
+def sin_fecha(propiedades):
+    return [{k: v for k, v in propiedad.items() if k != 'fecha_procesamiento'} for propiedad in propiedades]
+
+
+def medir(funcion, df):
+    inicio = time.perf_counter()
+    funcion(df)
+    return time.perf_counter() - inicio
+
+
+def main(tamaños):
+    print("⏱️ BENCHMARK - CONVERSIÓN DE PROPIEDADES A JSON")
+    print("=" * 60)
+
+    muestra = propiedades_sinteticas(FILAS_VERIFICACION)
+    if sin_fecha(con_iterrows(muestra)) != sin_fecha(procesar_propiedades(muestra)):
+        print("❌ Los dos caminos no dan el mismo resultado")
+        return False
+    print(f"✅ Mismo resultado en {FILAS_VERIFICACION} filas de prueba")
+    print()
+    print(f"{'Filas':>10}  {'iterrows':>10}  {'columnas':>10}  {'mejora':>8}")
+
+    for filas in tamaños:
+        df = propiedades_sinteticas(filas)
+        tiempo_columnas = medir(procesar_propiedades, df)
+        tiempo_iterrows = medir(con_iterrows, df)
+        print(f"{filas:>10,}  {tiempo_iterrows:>9.2f}s  {tiempo_columnas:>9.2f}s  "
+              f"{tiempo_iterrows / tiempo_columnas:>7.1f}x")
+
+    print("=" * 60)
+    return True
+
+
+if __name__ == '__main__':
+    tamaños = [int(argumento) for argumento in sys.argv[1:]] or TAMAÑOS
+    sys.exit(0 if main(tamaños) else 1)
@@ -0,0 +1,646 @@
+"""
+Catálogo de propiedades en memoria para main.py.
+
+El archivo propiedades.json se lee y valida una sola vez por versión. Cada
+petición trabaja sobre una instantánea inmutable; cuando cambia el archivo
+(mtime o tamaño) se construye una instantánea nueva y se publica de forma
+atómica, sin bloquear a las peticiones que ya están en curso.
+
+Junto con cada instantánea se construye su índice de búsqueda, de modo que
+las consultas no recorren el catálogo completo, y el orden precalculado de
+los campos numéricos para paginar resultados ordenados. Los conteos de
+/filter-options y /stats se calculan una vez y, al recargar, se actualizan
+solo con las propiedades que cambiaron. Las respuestas de búsqueda ya
+serializadas se guardan en un LRU que se vacía al cambiar de versión.
+
+La búsqueda por texto libre (q=) usa un índice invertido de palabras sin
+acentos con coincidencia por prefijo y ranking BM25. Las búsquedas por
+posición (radio o rectángulo) usan una grilla de celdas sobre latitud y
+longitud, de modo que solo se miden las propiedades cercanas.
+"""
+
+from bisect import bisect_left, bisect_right
+from collections import Counter, OrderedDict
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import time
+import unicodedata
+
+
+def safe_print(message):
+    safe_message = message.encode('ascii', 'ignore').decode('ascii')
+    print(safe_message)
+
+
+# Campos por los que se puede ordenar un listado (prefijo '-' = descendente)
+SORT_FIELDS = ('precio', 'metros_cuadrados', 'ambientes')
+
+# Campos que necesita la grilla de resultados del sitio (fields=grid)
+GRID_FIELDS = (
+    'id_temporal', 'titulo', 'barrio', 'operacion', 'tipo', 'precio',
+    'moneda_precio', 'ambientes', 'metros_cuadrados'
+)
+
+
+# Campos que se indexan para la búsqueda por texto libre
+TEXT_FIELDS = ('titulo', 'descripcion', 'direccion', 'barrio', 'amenities')
+
+TOKEN_RE = re.compile(r'\w+')
+
+# Claves aceptadas para las coordenadas de una propiedad
+LATITUDE_KEYS = ('latitud', 'lat')
+LONGITUDE_KEYS = ('longitud', 'lng', 'lon')
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.32
+
+
+def fold(value):
+    """Normaliza un valor para comparaciones sin distinguir mayúsculas."""
+    if value is None:
+        return ''
+    return str(value).strip().casefold()
+
+
+def strip_accents(text):
+    """'Ubicación' -> 'ubicacion' (también ñ -> n), en minúsculas."""
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(strip_accents(text))
+
+
+class TextIndex:
+    """
+    Índice de texto libre sobre TEXT_FIELDS.
+
+    Cada palabra de la consulta debe aparecer en la propiedad, completa o
+    como prefijo (desde MIN_PREFIX letras: "mono" encuentra "monoambiente").
+    Los resultados se puntúan con BM25.
+    """
+
+    K1 = 1.2
+    B = 0.75
+    MIN_PREFIX = 3
+
+    def __init__(self, properties):
+        self.size = len(properties)
+        self.postings = {}
+        self.lengths = []
+
+        for position, prop in enumerate(properties):
+            tokens = []
+            for field in TEXT_FIELDS:
+                value = prop.get(field)
+                if isinstance(value, (list, tuple)):
+                    value = ' '.join(str(item) for item in value)
+                if value:
+                    tokens.extend(tokenize(str(value)))
+
+            self.lengths.append(len(tokens))
+            for term, frequency in Counter(tokens).items():
+                self.postings.setdefault(term, {})[position] = frequency
+
+        self.terms = sorted(self.postings)
+        self.average_length = (sum(self.lengths) / self.size) if self.size else 1.0
+
+    def expand(self, token):
+        """Términos del índice que corresponden a una palabra de la consulta."""
+        if len(token) < self.MIN_PREFIX:
+            return [token] if token in self.postings else []
+
+        terms = []
+        for i in range(bisect_left(self.terms, token), len(self.terms)):
+            if not self.terms[i].startswith(token):
+                break
+            terms.append(self.terms[i])
+        return terms
+
+    def _idf(self, document_frequency):
+        return math.log(1 + (self.size - document_frequency + 0.5) / (document_frequency + 0.5))
+
+    def search(self, query):
+        """
+        Devuelve {posición: puntaje} de las propiedades que contienen todas
+        las palabras, o None si la consulta no tiene palabras.
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return None
+
+        scores = None
+        for token in tokens:
+            token_scores = {}
+            for term in self.expand(token):
+                postings = self.postings[term]
+                idf = self._idf(len(postings))
+                for position, frequency in postings.items():
+                    length_ratio = self.lengths[position] / self.average_length
+                    score = idf * frequency * (self.K1 + 1) / (
+                        frequency + self.K1 * (1 - self.B + self.B * length_ratio))
+                    # Varias expansiones del mismo prefijo no suman entre sí
+                    if score > token_scores.get(position, 0):
+                        token_scores[position] = score
+
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {position: scores[position] + score
+                          for position, score in token_scores.items() if position in scores}
+            if not scores:
+                return {}
+
+        return scores
+
+
+def coordinates(prop):
+    """(latitud, longitud) de la propiedad, o None si no tiene o no son válidas."""
+    lat = next((prop[key] for key in LATITUDE_KEYS if prop.get(key) not in (None, '')), None)
+    lon = next((prop[key] for key in LONGITUDE_KEYS if prop.get(key) not in (None, '')), None)
+    try:
+        lat = float(str(lat).replace(',', '.'))
+        lon = float(str(lon).replace(',', '.'))
+    except (TypeError, ValueError):
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return None
+    return lat, lon
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class GeoIndex:
+    """
+    Grilla de celdas de CELL_DEGREES grados (~1 km) con las propiedades que
+    tienen coordenadas. Una consulta solo revisa las celdas que tocan el
+    área pedida.
+    """
+
+    CELL_DEGREES = 0.01
+
+    def __init__(self, properties):
+        self.cells = {}
+        for position, prop in enumerate(properties):
+            point = coordinates(prop)
+            if point is not None:
+                self.cells.setdefault(self._cell(*point), []).append((position,) + point)
+
+    def _cell(self, lat, lon):
+        return math.floor(lat / self.CELL_DEGREES), math.floor(lon / self.CELL_DEGREES)
+
+    def within_box(self, min_lat, min_lon, max_lat, max_lon):
+        """Puntos (posición, lat, lon) dentro del rectángulo."""
+        low_row, low_col = self._cell(min_lat, min_lon)
+        high_row, high_col = self._cell(max_lat, max_lon)
+
+        # Si el rectángulo abarca más celdas de las que hay ocupadas, conviene recorrer las ocupadas
+        if (high_row - low_row + 1) * (high_col - low_col + 1) > len(self.cells):
+            buckets = [points for (row, col), points in self.cells.items()
+                       if low_row <= row <= high_row and low_col <= col <= high_col]
+        else:
+            buckets = [self.cells[(row, col)]
+                       for row in range(low_row, high_row + 1)
+                       for col in range(low_col, high_col + 1)
+                       if (row, col) in self.cells]
+
+        return [point for points in buckets for point in points
+                if min_lat <= point[1] <= max_lat and min_lon <= point[2] <= max_lon]
+
+    def near(self, lat, lon, radius_km):
+        """[(posición, distancia en km)] dentro del radio, de la más cercana a la más lejana."""
+        lat_delta = radius_km / KM_PER_DEGREE
+        cos_lat = math.cos(math.radians(lat))
+        lon_delta = 180.0 if cos_lat < 1e-6 else min(180.0, radius_km / (KM_PER_DEGREE * cos_lat))
+
+        candidates = self.within_box(max(-90.0, lat - lat_delta), max(-180.0, lon - lon_delta),
+                                     min(90.0, lat + lat_delta), min(180.0, lon + lon_delta))
+        matches = []
+        for position, point_lat, point_lon in candidates:
+            distance = haversine_km(lat, lon, point_lat, point_lon)
+            if distance <= radius_km:
+                matches.append((position, distance))
+
+        matches.sort(key=lambda match: (match[1], match[0]))
+        return matches
+
+    def in_box(self, min_lat, min_lon, max_lat, max_lon):
+        """[(posición, distancia al centro)] dentro del rectángulo, ordenadas por distancia."""
+        center_lat = (min_lat + max_lat) / 2
+        center_lon = (min_lon + max_lon) / 2
+        matches = [(position, haversine_km(center_lat, center_lon, point_lat, point_lon))
+                   for position, point_lat, point_lon in self.within_box(min_lat, min_lon, max_lat, max_lon)]
+        matches.sort(key=lambda match: (match[1], match[0]))
+        return matches
+
+
+class NumericIndex:
+    """Valores numéricos de un campo ordenados, para consultas por rango."""
+
+    def __init__(self, properties, field, convert):
+        pairs = []
+        for position, prop in enumerate(properties):
+            try:
+                value = convert(prop.get(field, 0))
+            except (ValueError, TypeError):
+                continue
+            if value != value:  # NaN no se puede ordenar
+                continue
+            pairs.append((value, position))
+        pairs.sort()
+
+        self.values = [value for value, _ in pairs]
+        self.positions = [position for _, position in pairs]
+        self.rank = {position: rank for rank, position in enumerate(self.positions)}
+
+    def range(self, low=None, high=None):
+        start = bisect_left(self.values, low) if low is not None else 0
+        end = bisect_right(self.values, high) if high is not None else len(self.values)
+        return set(self.positions[start:end])
+
+    def sort(self, positions, descending=False):
+        """Ordena posiciones por el valor del campo; sin valor van al final."""
+        rank = self.rank
+        sign = -1 if descending else 1
+        return sorted(positions, key=lambda p: (p not in rank, sign * rank.get(p, 0)))
+
+
+class PropertyIndex:
+    """
+    Índice invertido del catálogo.
+
+    Guarda conjuntos de posiciones por operación, tipo, barrio y código
+    (normalizados con `fold`), arreglos ordenados para precio y ambientes y
+    el índice de texto libre. Una búsqueda intersecta los conjuntos
+    empezando por el más chico.
+    """
+
+    KEYWORD_FIELDS = ('operacion', 'tipo', 'barrio', 'id_temporal')
+
+    def __init__(self, properties):
+        self.size = len(properties)
+        self.postings = {field: {} for field in self.KEYWORD_FIELDS}
+
+        for position, prop in enumerate(properties):
+            for field, postings in self.postings.items():
+                value = prop.get(field)
+                if value is None or value == '':
+                    continue
+                postings.setdefault(fold(value), set()).add(position)
+
+        self.precio = NumericIndex(properties, 'precio', float)
+        self.ambientes = NumericIndex(properties, 'ambientes', int)
+        self.sorters = {
+            'precio': self.precio,
+            'ambientes': self.ambientes,
+            'metros_cuadrados': NumericIndex(properties, 'metros_cuadrados', float),
+        }
+        self.text = TextIndex(properties)
+
+    def search(self, ope=None, tipo=None, loc=None, cod=None,
+               precio_min=None, precio_max=None, ambientes=None, q=None):
+        """
+        Devuelve las posiciones que cumplen todos los filtros: en orden del
+        catálogo, o por relevancia si hay búsqueda de texto (q).
+        """
+        candidates = []
+        text_scores = self.text.search(q) if q else None
+        if text_scores is not None:
+            candidates.append(text_scores.keys())
+
+        for field, value in (('operacion', ope), ('tipo', tipo),
+                             ('barrio', loc), ('id_temporal', cod)):
+            if value:
+                candidates.append(self.postings[field].get(fold(value), set()))
+
+        if precio_min or precio_max:
+            candidates.append(self.precio.range(precio_min or None, precio_max or None))
+
+        if ambientes:
+            candidates.append(self.ambientes.range(low=ambientes))
+
+        if not candidates:
+            return list(range(self.size))
+
+        candidates.sort(key=len)
+        result = set(candidates[0])
+        for other in candidates[1:]:
+            if not result:
+                break
+            result &= other
+
+        if text_scores is not None:
+            return sorted(result, key=lambda position: (-text_scores[position], position))
+        return sorted(result)
+
+    def sort(self, positions, sort):
+        field = sort.lstrip('-')
+        return self.sorters[field].sort(positions, descending=sort.startswith('-'))
+
+
+def project(prop, fields):
+    """Copia de la propiedad con solo los campos pedidos."""
+    return {field: prop[field] for field in fields if field in prop}
+
+
+class CatalogAggregates:
+    """
+    Conteos del catálogo que alimentan /filter-options y /stats.
+
+    Se mantienen con `add`/`remove` por propiedad; las respuestas se arman
+    una sola vez y quedan en memoria hasta el próximo cambio.
+    """
+
+    COUNT_FIELDS = ('tipo', 'barrio', 'operacion')
+    OPTION_FIELDS = ('barrio', 'tipo')
+
+    def __init__(self, properties=()):
+        self.total = 0
+        self.counts = {field: Counter() for field in self.COUNT_FIELDS}
+        self.options = {field: Counter() for field in self.OPTION_FIELDS}
+        self._filter_options = None
+        self._stats = None
+
+        for prop in properties:
+            self.add(prop)
+
+    def add(self, prop):
+        self._apply(prop, 1)
+
+    def remove(self, prop):
+        self._apply(prop, -1)
+
+    def _apply(self, prop, delta):
+        self.total += delta
+
+        for field, counter in self.counts.items():
+            _bump(counter, prop.get(field, 'Sin especificar'), delta)
+
+        # En los filtros solo se ofrecen valores no vacíos
+        for field, counter in self.options.items():
+            if prop.get(field):
+                _bump(counter, prop[field], delta)
+
+        self._filter_options = None
+        self._stats = None
+
+    def copy(self):
+        other = CatalogAggregates()
+        other.total = self.total
+        other.counts = {field: Counter(counter) for field, counter in self.counts.items()}
+        other.options = {field: Counter(counter) for field, counter in self.options.items()}
+        return other
+
+    def filter_options(self):
+        if self._filter_options is None:
+            self._filter_options = {
+                "barrios": sorted(self.options['barrio']),
+                "tipos": sorted(self.options['tipo']),
+                "total": self.total
+            }
+        return self._filter_options
+
+    def stats(self):
+        if self._stats is None:
+            self._stats = {
+                "total_propiedades": self.total,
+                "tipos_mas_comunes": _top(self.counts['tipo']),
+                "barrios_mas_comunes": _top(self.counts['barrio']),
+                "operaciones": dict(self.counts['operacion'])
+            }
+        return self._stats
+
+
+def _bump(counter, key, delta):
+    counter[key] += delta
+    if counter[key] <= 0:
+        del counter[key]
+
+
+def _top(counter, n=10):
+    return dict(sorted(counter.items(), key=lambda x: x[1], reverse=True)[:n])
+
+
+def diff_properties(old, new):
+    """
+    Compara dos versiones del catálogo por id_temporal.
+    Devuelve (propiedades quitadas o modificadas, propiedades nuevas o modificadas).
+    """
+    old_by_id = {}
+    removed = []
+    for prop in old:
+        code = prop.get('id_temporal')
+        if code is None or code in old_by_id:
+            removed.append(prop)
+        else:
+            old_by_id[code] = prop
+
+    added = []
+    for prop in new:
+        previous = old_by_id.pop(prop.get('id_temporal'), None)
+        if previous is None:
+            added.append(prop)
+        elif previous != prop:
+            removed.append(previous)
+            added.append(prop)
+
+    removed.extend(old_by_id.values())
+    return removed, added
+
+
+class CatalogSnapshot:
+    """Versión inmutable del catálogo tal como se leyó del disco."""
+
+    def __init__(self, properties, version, file_key, aggregates=None):
+        self.properties = properties
+        self.version = version
+        self.file_key = file_key
+        self.modified_at = file_key[0] / 1e9 if file_key else None
+        self.index = PropertyIndex(properties)
+        self.geo = GeoIndex(properties)
+        self.aggregates = aggregates if aggregates is not None else CatalogAggregates(properties)
+
+    def search(self, sort=None, offset=0, limit=None, fields=None, **filters):
+        """
+        Aplica filtros, orden, paginación y proyección.
+        Devuelve (total de coincidencias, propiedades de la página).
+        """
+        positions = self.index.search(**filters)
+        if sort:
+            positions = self.index.sort(positions, sort)
+
+        end = None if limit is None else offset + limit
+        page = [self.properties[position] for position in positions[offset:end]]
+        if fields:
+            page = [project(prop, fields) for prop in page]
+
+        return len(positions), page
+
+    def nearby(self, matches, offset=0, limit=None, fields=None):
+        """
+        Página de resultados geográficos [(posición, distancia)]; cada
+        propiedad se devuelve como copia con `distancia_km`.
+        """
+        end = None if limit is None else offset + limit
+        page = []
+        for position, distance in matches[offset:end]:
+            prop = self.properties[position]
+            prop = project(prop, fields) if fields else dict(prop)
+            prop['distancia_km'] = round(distance, 3)
+            page.append(prop)
+        return len(matches), page
+
+
+EMPTY_SNAPSHOT = CatalogSnapshot((), 'vacio', None)
+
+
+class QueryCache:
+    """
+    LRU acotado de respuestas ya serializadas.
+
+    Las entradas pertenecen a una versión del catálogo: al pedir o guardar
+    con otra versión se descarta todo lo anterior.
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+
+    def _use_version(self, version):
+        if version != self._version:
+            self._entries.clear()
+            self._version = version
+
+    def get(self, version, key):
+        with self._lock:
+            self._use_version(version)
+            body = self._entries.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def put(self, version, key, body):
+        with self._lock:
+            self._use_version(version)
+            self._entries[key] = body
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "version": self._version,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else None
+            }
+
+
+def validate_properties(data):
+    """Devuelve solo las entradas utilizables del JSON (diccionarios)."""
+    if not isinstance(data, list):
+        safe_print(f"ADVERTENCIA: propiedades.json no contiene una lista ({type(data).__name__})")
+        return ()
+
+    valid = tuple(prop for prop in data if isinstance(prop, dict))
+    discarded = len(data) - len(valid)
+    if discarded:
+        safe_print(f"ADVERTENCIA: {discarded} elementos del catalogo no son diccionarios y se descartaron")
+    return valid
+
+
+class PropertyCatalog:
+    """
+    Catálogo compartido por todo el proceso.
+
+    `snapshot()` revisa el archivo como mucho una vez cada `check_interval`
+    segundos; si cambió lo vuelve a cargar. Si la lectura falla se sigue
+    sirviendo la última versión válida.
+    """
+
+    def __init__(self, path, check_interval=1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._snapshot = EMPTY_SNAPSHOT
+        self._checked_at = None
+        self._lock = threading.Lock()
+
+    def snapshot(self):
+        now = time.monotonic()
+        if self._checked_at is None or now - self._checked_at >= self.check_interval:
+            self._refresh(now)
+        return self._snapshot
+
+    def _refresh(self, now):
+        # Una sola recarga a la vez; el resto sigue usando la versión actual
+        if not self._lock.acquire(blocking=self._checked_at is None):
+            return
+        try:
+            if self._checked_at is not None and now - self._checked_at < self.check_interval:
+                return
+            self._checked_at = now
+
+            try:
+                stat = os.stat(self.path)
+            except OSError as e:
+                if self._snapshot is not EMPTY_SNAPSHOT:
+                    safe_print(f"Error accediendo a {self.path}: {str(e)} - se mantiene la version anterior")
+                else:
+                    safe_print(f"Error cargando propiedades: {str(e)}")
+                return
+
+            file_key = (stat.st_mtime_ns, stat.st_size)
+            if file_key == self._snapshot.file_key:
+                return
+
+            try:
+                self._snapshot = self._load(file_key)
+            except (OSError, ValueError) as e:
+                safe_print(f"Error cargando propiedades: {str(e)}")
+        finally:
+            self._lock.release()
+
+    def _load(self, file_key):
+        with open(self.path, 'rb') as f:
+            raw = f.read()
+
+        data = json.loads(raw.decode('utf-8'))
+        properties = validate_properties(data)
+        version = hashlib.sha1(raw).hexdigest()[:16]
+
+        # Los conteos de la versión anterior se ajustan solo con lo que cambió
+        previous = self._snapshot
+        removed, added = diff_properties(previous.properties, properties)
+        aggregates = previous.aggregates.copy()
+        for prop in removed:
+            aggregates.remove(prop)
+        for prop in added:
+            aggregates.add(prop)
+
+        safe_print(f"Catalogo cargado: {len(properties)} propiedades (version {version}, "
+                   f"{len(added)} nuevas o modificadas, {len(removed)} quitadas o reemplazadas)")
+        return CatalogSnapshot(properties, version, file_key, aggregates)
@@ -0,0 +1,10 @@
+"""
+Configuración común de las pruebas: la base de contactos por defecto
+(CONTACTS_DATABASE_URL) va a un directorio temporal, así importar main o
+servidor_excel desde una prueba no escribe en data/ del repo.
+"""
+
+import os
+import tempfile
+
+os.environ['CONTACTS_DATABASE_URL'] = f"sqlite:///{tempfile.mkdtemp(prefix='contactos-')}/contactos.db"
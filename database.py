@@ -1,4 +1,6 @@
-from sqlalchemy import create_engine, Column, Integer, String, Text, DECIMAL, ForeignKey
+import os
+
+from sqlalchemy import create_engine, event, Column, Integer, String, Text, DateTime, DECIMAL, ForeignKey
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 
@@ -79,3 +81,76 @@ def get_db():
         yield db
     finally:
         db.close()
+
+# Contacts live in their own database, under data/ (not tracked and not served
+# by main.py) instead of next to the site files
+CONTACTS_DATABASE_URL = os.environ.get("CONTACTS_DATABASE_URL", "sqlite:///./data/contactos.db")
+
+ContactBase = declarative_base()
+
+class Contact(ContactBase):
+    __tablename__ = "contacts"
+    contact_id = Column(Integer, primary_key=True, index=True)
+    created_at = Column(DateTime, nullable=False, index=True)
+    source = Column(String)  # server that received it, e.g. "main", "servidor_excel"
+    name = Column(String)
+    email = Column(String, index=True)
+    phone = Column(String, index=True)
+    signature = Column(String)
+    property_code = Column(String)
+    interest = Column(String)
+    budget = Column(String)
+    message = Column(Text)
+    page = Column(String)
+    ip = Column(String)
+    user_agent = Column(String)
+    status = Column(String)
+    notes = Column(Text)
+
+class ContactStat(ContactBase):
+    # Running tallies kept in step with contacts: ("total", ""), ("hour", "2025-01-31 14"),
+    # ("day", "2025-01-31"), ("day:interest", "2025-01-31|value"), ("day:page", "2025-01-31|/path"),
+    # ("interest", value), ("budget", value), and ("width", field) with the longest value
+    # of each field (a maximum, not a count)
+    __tablename__ = "contact_stats"
+    metric = Column(String, primary_key=True)
+    key = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False)
+
+class ContactImport(ContactBase):
+    # Legacy xlsx files already copied into contacts, by content hash
+    __tablename__ = "contact_imports"
+    file_hash = Column(String, primary_key=True)
+    path = Column(String)
+    imported_at = Column(DateTime, nullable=False)
+    rows = Column(Integer)
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL: readers never block the writer, and several processes can share the file
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA busy_timeout=10000")
+    cursor.close()
+
+def create_contacts_engine(url):
+    # ContactStore (almacenamiento.py) relies on SQLite: strftime() for the rollups
+    # and its write lock to keep the update-then-insert of contact_stats safe
+    if not url.startswith("sqlite"):
+        raise ValueError(f"CONTACTS_DATABASE_URL tiene que ser una base SQLite: {url}")
+    engine = create_engine(url, connect_args={"check_same_thread": False})
+    event.listen(engine, "connect", _set_sqlite_pragmas)
+    return engine
+
+contacts_engine = create_contacts_engine(CONTACTS_DATABASE_URL)
+ContactsSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=contacts_engine)
+
+def contacts_database_path(engine=contacts_engine):
+    # File of the contacts database (also the base name of its lock); its
+    # directory is created here rather than at import time
+    path = os.path.abspath(engine.url.database or "contactos")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+def init_contacts_db(engine=contacts_engine):
+    ContactBase.metadata.create_all(bind=engine)
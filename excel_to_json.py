@@ -4,6 +4,41 @@ import re
 from datetime import datetime
 import os
 
+# Columnas donde pueden venir las listas de fotos y de documentos
+POSIBLES_CAMPOS_FOTOS = ['fotos', 'imagenes', 'fotos_url', 'multimedia']
+POSIBLES_CAMPOS_DOCUMENTOS = ['documentos', 'archivos', 'docs', 'documentacion']
+
+VALORES_VACIOS = [None, '', 'nan']
+
+# Mapeo de campos básicos: campo del JSON → posibles columnas del Excel
+CAMPOS_BASICOS = {
+    'id_temporal': ['id_temporal', 'id'],
+    'titulo': ['titulo', 'titulo_propiedad', 'nombre'],
+    'barrio': ['barrio', 'zona', 'ubicacion'],
+    'precio': ['precio', 'precio_usd', 'valor'],
+    'ambientes': ['ambientes', 'habitaciones', 'dormitorios'],
+    'metros_cuadrados': ['metros_cuadrados', 'metros', 'superficie', 'm2'],
+    'operacion': ['operacion', 'tipo_operacion'],
+    'tipo': ['tipo', 'tipo_propiedad'],
+    'descripcion': ['descripcion', 'descripción', 'caracteristicas'],
+    'direccion': ['direccion', 'dirección', 'calle'],
+    'antiguedad': ['antiguedad', 'antigüedad', 'años'],
+    'estado': ['estado', 'condicion'],
+    'orientacion': ['orientacion', 'orientación'],
+    'piso': ['piso', 'nivel', 'planta'],
+    'expensas': ['expensas', 'gastos_comunes'],
+    'amenities': ['amenities', 'comodidades', 'servicios'],
+    'cochera': ['cochera', 'garage', 'estacionamiento'],
+    'balcon': ['balcon', 'balcón'],
+    'pileta': ['pileta', 'piscina'],
+    'acepta_mascotas': ['acepta_mascotas', 'mascotas', 'pet_friendly'],
+    'aire_acondicionado': ['aire_acondicionado', 'aire', 'aa'],
+    'info_multimedia': ['info_multimedia', 'multimedia', 'fotos_info'],
+    'documentos': ['documentos', 'archivos', 'docs', 'documentacion'],  # NUEVO CAMPO
+    'latitud': ['latitud', 'latitude', 'lat'],
+    'longitud': ['longitud', 'longitude', 'lng', 'lon']
+}
+
 def excel_a_json(archivo_excel='propiedades.xlsx', archivo_json='propiedades.json'):
     """
     Convierte un archivo Excel de propiedades a formato JSON
@@ -32,19 +67,9 @@ def excel_a_json(archivo_excel='propiedades.xlsx', archivo_json='propiedades.jso
     df.columns = [limpiar_nombre_columna(col) for col in df.columns]
     print("🔧 Nombres de columnas limpiados")
     
-    propiedades = []
-    
-    # Procesar cada fila
-    for index, row in df.iterrows():
-        try:
-            propiedad = procesar_fila(row)
-            if propiedad:
-                propiedades.append(propiedad)
-                print(f"✅ Fila {index+1} procesada: {propiedad.get('id_temporal', 'Sin ID')}")
-                
-        except Exception as e:
-            print(f"⚠️ Error procesando fila {index+1}: {e}")
-            continue
+    # Procesar todas las filas columna por columna
+    propiedades = procesar_propiedades(df)
+    print(f"✅ Filas procesadas: {len(propiedades)}")
     
     # Guardar el JSON
     try:
@@ -80,40 +105,102 @@ def limpiar_nombre_columna(nombre):
     nombre_limpio = re.sub(r'\s+', '_', nombre_limpio)
     return nombre_limpio
 
+def primer_valor(df, posibles_columnas, solo_texto=False):
+    """
+    Por cada fila, el primer valor no vacío entre `posibles_columnas` (como
+    `obtener_valor()`, pero recorriendo cada columna una sola vez)
+    """
+    resultado = pd.Series(None, index=df.index, dtype=object)
+    for columna in posibles_columnas:
+        if columna not in df.columns:
+            continue
+        valores = df[columna].astype(object)
+        validos = valores.notna() & (valores != '')
+        if solo_texto and not es_texto(valores):
+            validos &= valores.map(lambda valor: isinstance(valor, str))
+        resultado = resultado.where(resultado.notna(), valores.where(validos))
+    return resultado
+
+def es_texto(valores):
+    """True si todos los valores presentes de la columna son strings"""
+    return pd.api.types.infer_dtype(valores, skipna=True) in ('string', 'empty')
+
+def aplicar(valores, funcion):
+    """
+    `funcion` sobre cada valor presente. Si son todos textos se llama una vez
+    por texto distinto: Sí/No, barrios o precios se repiten en muchas filas
+    """
+    if not es_texto(valores):
+        return valores.map(funcion, na_action='ignore')
+    presentes = valores.dropna()
+    resultados = {valor: funcion(valor) for valor in presentes.unique()}
+    return presentes.map(resultados).reindex(valores.index)
+
+def limpiador_de_campo(nombre_campo):
+    """La conversión de `limpiar_valor()` que corresponde al campo, elegida una sola vez"""
+    if nombre_campo in ('latitud', 'longitud'):
+        return lambda valor: limpiar_valor(valor, nombre_campo)
+    
+    campos_numericos = ['precio', 'ambientes', 'metros_cuadrados', 'antiguedad', 'expensas']
+    if any(campo in nombre_campo for campo in campos_numericos):
+        return convertir_a_numero
+    
+    campos_booleanos = ['cochera', 'balcon', 'pileta', 'acepta_mascotas', 'aire_acondicionado']
+    if any(campo in nombre_campo for campo in campos_booleanos):
+        return estandarizar_si_no
+    
+    return None
+
+def separar_lista(valores):
+    """Listas separadas por comas ('a.jpg, b.jpg') sin elementos vacíos"""
+    return valores.map(lambda valor: [item.strip() for item in valor.split(',') if item.strip() != ''],
+                       na_action='ignore')
+
+def como_lista(valores):
+    """Columna como lista de Python, con None donde falta el valor"""
+    return valores.astype(object).where(valores.notna(), None).tolist()
+
+def procesar_propiedades(df):
+    """
+    Convierte todo el DataFrame a propiedades, con el mismo resultado que
+    `procesar_fila()` fila por fila: elige y limpia cada columna una vez y
+    arma los registros al final
+    """
+    columnas = {}
+    for campo_json, posibles_campos_excel in CAMPOS_BASICOS.items():
+        valores = primer_valor(df, posibles_campos_excel)
+        valores = valores.where(valores != 'nan')
+        limpiar = limpiador_de_campo(campo_json) or (lambda valor: str(valor).strip())
+        valores = aplicar(valores, limpiar)
+        columnas[campo_json] = como_lista(valores)
+    
+    fotos = como_lista(separar_lista(primer_valor(df, POSIBLES_CAMPOS_FOTOS, solo_texto=True)))
+    documentos = como_lista(separar_lista(primer_valor(df, POSIBLES_CAMPOS_DOCUMENTOS, solo_texto=True)))
+    fecha_procesamiento = datetime.now().isoformat()
+    
+    campos = list(columnas)
+    propiedades = []
+    for fila, lista_fotos, lista_documentos in zip(zip(*columnas.values()), fotos, documentos):
+        propiedad = {campo: valor for campo, valor in zip(campos, fila) if valor not in VALORES_VACIOS}
+        if lista_fotos:
+            propiedad['fotos'] = lista_fotos
+        if lista_documentos:
+            propiedad['documentos'] = lista_documentos
+        propiedad['moneda_precio'] = 'USD'
+        propiedad['moneda_expensas'] = 'ARS'
+        propiedad['fecha_procesamiento'] = fecha_procesamiento
+        propiedades.append(propiedad)
+    
+    return propiedades
+
 def procesar_fila(fila):
     """Procesa una fila individual del DataFrame"""
     
     propiedad = {}
     
-    # Mapeo de campos básicos
-    campos_basicos = {
-        'id_temporal': ['id_temporal', 'id'],
-        'titulo': ['titulo', 'titulo_propiedad', 'nombre'],
-        'barrio': ['barrio', 'zona', 'ubicacion'],
-        'precio': ['precio', 'precio_usd', 'valor'],
-        'ambientes': ['ambientes', 'habitaciones', 'dormitorios'],
-        'metros_cuadrados': ['metros_cuadrados', 'metros', 'superficie', 'm2'],
-        'operacion': ['operacion', 'tipo_operacion'],
-        'tipo': ['tipo', 'tipo_propiedad'],
-        'descripcion': ['descripcion', 'descripción', 'caracteristicas'],
-        'direccion': ['direccion', 'dirección', 'calle'],
-        'antiguedad': ['antiguedad', 'antigüedad', 'años'],
-        'estado': ['estado', 'condicion'],
-        'orientacion': ['orientacion', 'orientación'],
-        'piso': ['piso', 'nivel', 'planta'],
-        'expensas': ['expensas', 'gastos_comunes'],
-        'amenities': ['amenities', 'comodidades', 'servicios'],
-        'cochera': ['cochera', 'garage', 'estacionamiento'],
-        'balcon': ['balcon', 'balcón'],
-        'pileta': ['pileta', 'piscina'],
-        'acepta_mascotas': ['acepta_mascotas', 'mascotas', 'pet_friendly'],
-        'aire_acondicionado': ['aire_acondicionado', 'aire', 'aa'],
-        'info_multimedia': ['info_multimedia', 'multimedia', 'fotos_info'],
-        'documentos': ['documentos', 'archivos', 'docs', 'documentacion']  # NUEVO CAMPO
-    }
     
     # Procesar campos básicos
-    for campo_json, posibles_campos_excel in campos_basicos.items():
+    for campo_json, posibles_campos_excel in CAMPOS_BASICOS.items():
         valor = obtener_valor(fila, posibles_campos_excel)
         if valor not in [None, '', 'nan']:
             propiedad[campo_json] = limpiar_valor(valor, campo_json)
@@ -153,6 +240,13 @@ def limpiar_valor(valor, nombre_campo):
     if pd.isna(valor) or valor == '':
         return None
     
+    # Coordenadas: admiten signo negativo y coma decimal
+    if nombre_campo in ('latitud', 'longitud'):
+        try:
+            return float(str(valor).strip().replace(',', '.'))
+        except ValueError:
+            return None
+    
     # Campos numéricos
     campos_numericos = ['precio', 'ambientes', 'metros_cuadrados', 'antiguedad', 'expensas']
     if any(campo in nombre_campo for campo in campos_numericos):
@@ -215,9 +309,7 @@ def procesar_campo_fotos(fila):
     """Procesa el campo de fotos, puede venir en diferentes formatos"""
     
     # Buscar en diferentes columnas posibles
-    posibles_campos_fotos = ['fotos', 'imagenes', 'fotos_url', 'multimedia']
-    
-    for campo in posibles_campos_fotos:
+    for campo in POSIBLES_CAMPOS_FOTOS:
         if campo in fila and pd.notna(fila[campo]) and fila[campo] != '':
             valor = fila[campo]
             
@@ -236,9 +328,7 @@ def procesar_campo_documentos(fila):
     """Procesa el campo de documentos, puede venir en diferentes formatos - NUEVA FUNCIÓN"""
     
     # Buscar en diferentes columnas posibles para documentos
-    posibles_campos_documentos = ['documentos', 'archivos', 'docs', 'documentacion']
-    
-    for campo in posibles_campos_documentos:
+    for campo in POSIBLES_CAMPOS_DOCUMENTOS:
         if campo in fila and pd.notna(fila[campo]) and fila[campo] != '':
             valor = fila[campo]
             
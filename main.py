@@ -2,94 +2,305 @@
 
 import sys
 import os
-import json
-from flask import Flask, request, jsonify
+import time
+import hashlib
+from stat import S_ISREG
+from flask import Flask, request, jsonify, g, Response, send_file
+from werkzeug.exceptions import HTTPException
+from werkzeug.security import safe_join
 from flask_cors import CORS
-from openpyxl import Workbook, load_workbook
-from datetime import datetime
+from datetime import datetime, timezone
+from catalogo import PropertyCatalog, QueryCache, fold, tokenize, SORT_FIELDS, GRID_FIELDS
+from precomprimir import precompress_static_files, hash_file
+from almacenamiento import ContactStore
 
 app = Flask(__name__)
 CORS(app, resources={r"/api/*": {"origins": ["null", "http://dantepropiedades.com.ar", "http://www.dantepropiedades.com.ar", "https://dantepropiedades.com.ar", "https://www.dantepropiedades.com.ar", "http://dantepropiedades.com", "https://danterealestate-github-io.onrender.com"]}})
 
+# Contactos: se guardan en la base de contactos (database.py)
 EXCEL_FILE = 'contactos_dante_propiedades.xlsx'
+contact_store = ContactStore('main')
+
+# Excel de contactos de versiones anteriores: se importa una sola vez
+contact_store.import_legacy(EXCEL_FILE)
+
+PROPERTIES_FILE = 'propiedades.json'
+
+# Catálogo compartido por el proceso: se recarga solo cuando cambia el archivo
+catalog = PropertyCatalog(PROPERTIES_FILE)
+
+# Tamaño máximo de página para los listados paginados (?limit=)
+MAX_PAGE_SIZE = 100
+
+# Radio por defecto y máximo (km) de /api/properties/near
+DEFAULT_RADIUS_KM = 2.0
+MAX_RADIUS_KM = 50.0
+
+# Respuestas de /api/properties/search ya serializadas, por consulta normalizada
+search_cache = QueryCache(int(os.environ.get('SEARCH_CACHE_SIZE', 256)))
+
+# Cache-Control por tipo de archivo. Cada valor se puede reemplazar con la
+# variable de entorno CACHE_CONTROL_<TIPO> (por ejemplo CACHE_CONTROL_IMAGES)
+CACHE_CONTROL = {
+    'html': 'no-cache',
+    'assets': 'public, max-age=3600',
+    'images': 'public, max-age=86400',
+    'documents': 'public, max-age=86400',
+    'api': 'no-cache',
+    'other': 'public, max-age=3600'
+}
+for _tipo in CACHE_CONTROL:
+    CACHE_CONTROL[_tipo] = os.environ.get(f'CACHE_CONTROL_{_tipo.upper()}', CACHE_CONTROL[_tipo])
+
+# Tipo MIME y clase de caché por extensión de archivo
+STATIC_TYPES = {
+    '.html': ('text/html', 'html'),
+    '.htm': ('text/html', 'html'),
+    '.css': ('text/css', 'assets'),
+    '.js': ('application/javascript', 'assets'),
+    '.json': ('application/json', 'assets'),
+    '.map': ('application/json', 'assets'),
+    '.woff': ('font/woff', 'assets'),
+    '.woff2': ('font/woff2', 'assets'),
+    '.ttf': ('font/ttf', 'assets'),
+    '.eot': ('application/vnd.ms-fontobject', 'assets'),
+    '.png': ('image/png', 'images'),
+    '.jpg': ('image/jpeg', 'images'),
+    '.jpeg': ('image/jpeg', 'images'),
+    '.gif': ('image/gif', 'images'),
+    '.webp': ('image/webp', 'images'),
+    '.ico': ('image/x-icon', 'images'),
+    '.svg': ('image/svg+xml', 'images'),
+    '.pdf': ('application/pdf', 'documents'),
+    '.txt': ('text/plain', 'other'),
+    '.xml': ('application/xml', 'other')
+}
+
+# Archivos que nunca se sirven aunque su extensión esté en STATIC_TYPES
+# (se leen por endpoints propios) y carpetas con datos del servidor
+PRIVATE_FILES = {'contactos_dante_propiedades.xlsx', 'propiedades.json'}
+PRIVATE_DIRS = {'data'}
+
+# Segundos durante los cuales un ETag estático se da por válido sin mirar el disco
+STATIC_REVALIDATE_SECONDS = float(os.environ.get('STATIC_REVALIDATE_SECONDS', 2))
+_static_validators = {}
+
+# Encodings que se ofrecen, en orden de preferencia ante igual calidad
+CONTENT_ENCODINGS = ('br', 'gzip')
 
 def safe_print(message):
     safe_message = message.encode('ascii', 'ignore').decode('ascii')
     print(safe_message)
 
-def init_excel():
-    if not os.path.exists(EXCEL_FILE):
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Contactos"
-        ws['A1'] = 'Fecha/Hora'
-        ws['B1'] = 'Nombre'
-        ws['C1'] = 'Firma'
-        ws['D1'] = 'Teléfono'
-        ws['E1'] = 'Propiedad'
-        ws.column_dimensions['A'].width = 20
-        ws.column_dimensions['B'].width = 25
-        ws.column_dimensions['C'].width = 15
-        ws.column_dimensions['D'].width = 15
-        ws.column_dimensions['E'].width = 15
-        wb.save(EXCEL_FILE)
-        safe_print(f"SUCCESS: Archivo {EXCEL_FILE} creado exitosamente")
+def load_compressed_variants():
+    """Precomprime los archivos de texto al arrancar (PRECOMPRESS_STATIC=0 lo desactiva)"""
+    if os.environ.get('PRECOMPRESS_STATIC', '1') == '0':
+        return {}
+    try:
+        variants = precompress_static_files(os.getcwd())
+        safe_print(f"Variantes comprimidas disponibles para {len(variants)} archivos")
+        return variants
+    except OSError as e:
+        safe_print(f"No se pudieron precomprimir los archivos estaticos: {str(e)}")
+        return {}
+
+# {hash del contenido (= ETag): {encoding: ruta}}
+COMPRESSED_VARIANTS = load_compressed_variants()
+
+def static_type(filename):
+    """(mimetype, clase de caché) según la extensión del archivo, o None si no se sirve"""
+    return STATIC_TYPES.get(os.path.splitext(filename)[1].lower())
+
+def is_public_file(filename):
+    """
+    Solo se sirven archivos con extensión de STATIC_TYPES: nunca la base de
+    contactos (.db, -wal, -shm), locks, .jsonl ni código .py. Tampoco
+    carpetas ocultas (.git, .static_cache) ni las de PRIVATE_DIRS.
+    """
+    parts = filename.replace('\\', '/').split('/')
+    if parts[0] in PRIVATE_DIRS or any(part.startswith('.') for part in parts):
+        return False
+    if filename in PRIVATE_FILES or filename.startswith('api/'):
+        return False
+    return static_type(filename) is not None
+
+def static_validators(file_path):
+    """
+    Devuelve (etag, last_modified) de un archivo estático o None si no existe.
+    El ETag sale del contenido y se recalcula solo si cambian mtime/tamaño/inode.
+    """
+    now = time.monotonic()
+    cached = _static_validators.get(file_path)
+    if cached and now - cached[0] < STATIC_REVALIDATE_SECONDS:
+        return cached[2]
+    
+    try:
+        info = os.stat(file_path)
+    except OSError:
+        _static_validators.pop(file_path, None)
+        return None
+    if not S_ISREG(info.st_mode):
+        return None
+    
+    key = (info.st_mtime_ns, info.st_size, info.st_ino)
+    if cached and cached[1] == key:
+        validators = cached[2]
     else:
-        safe_print(f"INFO: Archivo {EXCEL_FILE} encontrado")
+        validators = (hash_file(file_path), datetime.fromtimestamp(int(info.st_mtime), timezone.utc))
+    
+    _static_validators[file_path] = (now, key, validators)
+    return validators
+
+def is_not_modified(etag, last_modified):
+    """True si el navegador ya tiene esta versión (If-None-Match / If-Modified-Since)"""
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if last_modified is not None and request.if_modified_since is not None:
+        return last_modified <= request.if_modified_since
+    return False
+
+def set_validators(response, etag, last_modified, cache_class):
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = CACHE_CONTROL[cache_class]
+    return response
+
+def not_modified_response(etag, last_modified, cache_class):
+    return set_validators(Response(status=304), etag, last_modified, cache_class)
 
 def serve_static_file(filename):
     try:
-        if filename.startswith('api/') or filename in ['contactos_dante_propiedades.xlsx', 'propiedades.json']:
-            safe_print(f"Archivo {filename} no se sirve como estático - será manejado por endpoint específico")
+        if not is_public_file(filename):
+            safe_print(f"Archivo {filename} no se sirve como estático")
             return jsonify({"error": f"Archivo {filename} no encontrado"}), 404
         
-        file_path = os.path.join(os.getcwd(), filename)
-        safe_print(f"Buscando archivo: {file_path}")
+        file_path = safe_join(os.getcwd(), filename)
+        validators = static_validators(file_path) if file_path else None
+        if validators is None:
+            safe_print(f"Archivo NO encontrado: {filename}")
+            return jsonify({"error": f"Archivo {filename} no encontrado"}), 404
+        
+        content_hash, last_modified = validators
+        mimetype, cache_class = static_type(filename)
+        
+        # Elegir la variante precomprimida que acepte el navegador (sin comprimir en la petición)
+        variants = COMPRESSED_VARIANTS.get(content_hash)
+        encoding = None
+        if variants:
+            encoding = request.accept_encodings.best_match([e for e in CONTENT_ENCODINGS if e in variants])
         
-        if os.path.exists(file_path):
+        etag = f"{content_hash}-{encoding}" if encoding else content_hash
+        body_path = variants[encoding] if encoding else file_path
+        
+        # El navegador ya tiene esta versión: 304 sin leer el archivo
+        if is_not_modified(etag, last_modified):
+            response = not_modified_response(etag, last_modified, cache_class)
+        else:
             try:
-                with open(file_path, 'rb') as f:
-                    content = f.read()
-                
-                # Determinar el tipo de contenido
-                if filename.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.ico', '.svg')):
-                    from flask import Response
-                    return Response(content, mimetype=f'image/{filename.split(".")[-1].lower()}')
-                elif filename.lower().endswith('.css'):
-                    from flask import Response
-                    return Response(content, mimetype='text/css')
-                elif filename.lower().endswith('.js'):
-                    from flask import Response
-                    return Response(content, mimetype='application/javascript')
-                elif filename.lower().endswith('.html'):
-                    from flask import Response
-                    return Response(content, mimetype='text/html')
-                elif filename.lower().endswith('.json'):
-                    from flask import Response
-                    return Response(content, mimetype='application/json')
-                else:
-                    from flask import Response
-                    return Response(content, mimetype='application/octet-stream')
-                    
-            except Exception as e:
+                # send_file transmite desde disco (sendfile bajo gunicorn) sin cargar
+                # el archivo en memoria, y responde Range / If-Range con 206
+                response = send_file(
+                    body_path,
+                    mimetype=mimetype,
+                    conditional=True,
+                    etag=etag,
+                    last_modified=last_modified
+                )
+            except OSError as e:
                 safe_print(f"Error leyendo {filename}: {str(e)}")
-                return jsonify({"error": f"Error al leer archivo {filename}"}), 500
-        else:
-            safe_print(f"Archivo NO encontrado: {file_path}")
-            return jsonify({"error": f"Archivo {filename} no encontrado"}), 404
+                return jsonify({"error": f"Archivo {filename} no encontrado"}), 404
             
+            response.headers['Cache-Control'] = CACHE_CONTROL[cache_class]
+            if encoding:
+                response.headers['Content-Encoding'] = encoding
+        
+        if variants:
+            response.vary.add('Accept-Encoding')
+        return response
+    
+    except HTTPException:
+        # Respuestas de send_file como 416 (rango fuera del archivo)
+        raise
     except Exception as e:
         safe_print(f"Error sirviendo {filename}: {str(e)}")
         return jsonify({"error": f"Error al servir {filename}"}), 500
 
-def load_properties():
-    try:
-        with open('propiedades.json', 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        return data
-    except Exception as e:
-        safe_print(f"Error cargando propiedades: {str(e)}")
-        return []
+def parse_listing_args(args):
+    """Lee limit, offset, sort y fields de la URL. ValueError si sort no es válido."""
+    listing = {}
+    
+    limit = args.get('limit', type=int)
+    if limit is not None and limit > 0:
+        listing['limit'] = min(limit, MAX_PAGE_SIZE)
+    
+    offset = args.get('offset', type=int)
+    if offset is not None and offset > 0:
+        listing['offset'] = offset
+    
+    sort = args.get('sort')
+    if sort:
+        if sort.lstrip('-') not in SORT_FIELDS:
+            raise ValueError(f"Orden no soportado: {sort}. Usar: {', '.join(SORT_FIELDS)}")
+        listing['sort'] = sort
+    
+    fields = args.get('fields')
+    if fields:
+        if fields == 'grid':
+            listing['fields'] = GRID_FIELDS
+        else:
+            listing['fields'] = tuple(f.strip() for f in fields.split(',') if f.strip())
+    
+    return listing
+
+def listing_payload(total, properties, listing):
+    payload = {
+        "total": total,
+        "properties": properties
+    }
+    
+    # Datos de paginación solo si se pidió una página
+    if 'limit' in listing or 'offset' in listing:
+        offset = listing.get('offset', 0)
+        end = offset + len(properties)
+        payload.update({
+            "offset": offset,
+            "limit": listing.get('limit'),
+            "next_offset": end if end < total else None
+        })
+    
+    return payload
+
+def current_snapshot():
+    """Instantánea del catálogo usada en esta petición (la misma que dio el ETag)"""
+    return g.get('catalog_snapshot') or catalog.snapshot()
+
+def catalog_last_modified(snapshot):
+    if snapshot.modified_at is None:
+        return None
+    return datetime.fromtimestamp(int(snapshot.modified_at), timezone.utc)
+
+@app.before_request
+def catalog_conditional_get():
+    """Responde 304 a las consultas del catálogo si la versión no cambió"""
+    if request.method != 'GET' or not request.path.startswith('/api/properties'):
+        return None
+    
+    snapshot = catalog.snapshot()
+    g.catalog_snapshot = snapshot
+    # La respuesta depende solo de la versión del catálogo y de la URL pedida
+    g.catalog_etag = f"{snapshot.version}-{hashlib.sha1(request.full_path.encode('utf-8')).hexdigest()[:12]}"
+    
+    last_modified = catalog_last_modified(snapshot)
+    if is_not_modified(g.catalog_etag, last_modified):
+        return not_modified_response(g.catalog_etag, last_modified, 'api')
+    return None
+
+@app.after_request
+def catalog_validators(response):
+    if 'catalog_etag' in g and response.status_code == 200:
+        set_validators(response, g.catalog_etag, catalog_last_modified(g.catalog_snapshot), 'api')
+    return response
 
 @app.route('/')
 def home():
@@ -104,29 +315,13 @@ def guardar_contacto():
         if not data or 'nombre' not in data:
             return jsonify({"error": "Datos incompletos"}), 400
         
-        # Inicializar archivo Excel si no existe
-        init_excel()
-        
-        # Cargar workbook existente
-        wb = load_workbook(EXCEL_FILE)
-        ws = wb.active
-        
-        # Obtener siguiente fila
-        next_row = ws.max_row + 1
-        
-        # Formatear fecha y hora
-        now = datetime.now()
-        fecha_hora = now.strftime("%Y-%m-%d %H:%M:%S")
-        
-        # Escribir datos
-        ws[f'A{next_row}'] = fecha_hora
-        ws[f'B{next_row}'] = data.get('nombre', '')
-        ws[f'C{next_row}'] = data.get('email', '')
-        ws[f'D{next_row}'] = data.get('telefono', '')
-        ws[f'E{next_row}'] = data.get('propiedad_interes', '')
-        
-        # Guardar archivo
-        wb.save(EXCEL_FILE)
+        contacto = contact_store.add(
+            name=data.get('nombre', ''),
+            email=data.get('email', ''),
+            phone=data.get('telefono', ''),
+            property_code=data.get('propiedad_interes', '')
+        )
+        fecha_hora = contacto['created_at'].strftime("%Y-%m-%d %H:%M:%S")
         
         safe_print(f"Contacto guardado: {data.get('nombre')} - {data.get('email')}")
         
@@ -142,40 +337,21 @@ def guardar_contacto():
 @app.route('/api/properties', methods=['GET'])
 def get_all_properties():
     try:
-        properties = load_properties()
-        return jsonify({
-            "total": len(properties),
-            "properties": properties
-        }), 200
+        try:
+            listing = parse_listing_args(request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        total, properties = current_snapshot().search(**listing)
+        return jsonify(listing_payload(total, properties, listing)), 200
     except Exception as e:
         safe_print(f"Error obteniendo propiedades: {str(e)}")
         return jsonify({"error": f"Error al obtener propiedades"}), 500
 
 def get_filter_options():
     try:
-        properties = load_properties()
-        barrios = []
-        tipos = []
-        
-        for prop in properties:
-            # **CORRECCIÓN CRÍTICA**: Validar tipo antes de usar .get()
-            if not isinstance(prop, dict):
-                safe_print(f"ADVERTENCIA: Elemento no es diccionario: {prop}")
-                continue
-            
-            # Procesar barrio
-            if prop.get('barrio') and prop['barrio'] not in barrios:
-                barrios.append(prop['barrio'])
-            
-            # Procesar tipo
-            if prop.get('tipo') and prop['tipo'] not in tipos:
-                tipos.append(prop['tipo'])
-        
-        return {
-            "barrios": sorted(barrios),
-            "tipos": sorted(tipos),
-            "total": len(properties)
-        }
+        # Precalculado una vez por versión del catálogo
+        return current_snapshot().aggregates.filter_options()
         
     except Exception as e:
         safe_print(f"Error en get_filter_options: {str(e)}")
@@ -194,62 +370,62 @@ def get_filter_options_endpoint():
         safe_print(f"Error en endpoint filter-options: {str(e)}")
         return jsonify({"error": f"Error en servidor: {str(e)}"}), 500
 
-def search_properties(ope=None, tipo=None, loc=None, precio_max=None, ambientes=None):
+def search_properties(ope=None, tipo=None, loc=None, precio_max=None, ambientes=None,
+                      precio_min=None, cod=None, q=None, **listing):
+    """Devuelve (total de coincidencias, propiedades de la página pedida)
+
+    Los errores se propagan: el endpoint responde 500 y no guarda nada en el caché.
+    """
     try:
-        properties = load_properties()
-        results = []
-        
-        for prop in properties:
-            # **CORRECCIÓN CRÍTICA**: Validar tipo antes de usar .get()
-            if not isinstance(prop, dict):
-                safe_print(f"ADVERTENCIA: Elemento no es diccionario en search: {prop}")
-                continue
-            
-            # Aplicar filtros
-            if ope and prop.get('operacion') != ope:
-                continue
-                
-            if tipo and prop.get('tipo') != tipo:
-                continue
-                
-            if loc and prop.get('barrio', '').lower() != loc.lower():
-                continue
-                
-            if precio_max:
-                try:
-                    prop_precio = float(prop.get('precio', 0))
-                    if prop_precio > precio_max:
-                        continue
-                except (ValueError, TypeError):
-                    continue
-                    
-            if ambientes:
-                try:
-                    prop_amb = int(prop.get('ambientes', 0))
-                    if prop_amb < ambientes:
-                        continue
-                except (ValueError, TypeError):
-                    continue
-            
-            results.append(prop)
-        
-        return results
+        # El índice se construye una vez por versión del catálogo
+        return current_snapshot().search(
+            ope=ope,
+            tipo=tipo,
+            loc=loc,
+            cod=cod,
+            precio_min=precio_min,
+            precio_max=precio_max,
+            ambientes=ambientes,
+            q=q,
+            **listing
+        )
         
     except Exception as e:
         safe_print(f"Error en search_properties: {str(e)}")
-        return []
+        raise
+
+def search_cache_key(filters, listing):
+    """Clave de caché: filtros normalizados, sin los que quedan en su valor por defecto"""
+    items = [(name, value) for name, value in filters.items() if value]
+    items.extend(listing.items())
+    return tuple(sorted(items))
 
 @app.route('/api/properties/search', methods=['GET'])
 def search_properties_endpoint():
     try:
-        # Obtener parámetros de la URL
-        ope = request.args.get('ope')
-        tipo = request.args.get('tipo')
-        loc = request.args.get('loc')
+        # Obtener parámetros de la URL (los textos se comparan sin mayúsculas)
+        ope = fold(request.args.get('ope')) or None
+        tipo = fold(request.args.get('tipo')) or None
+        loc = fold(request.args.get('loc')) or None
+        cod = fold(request.args.get('cod')) or None
+        # Texto libre: se guarda ya normalizado (sin acentos ni signos)
+        q = ' '.join(tokenize(request.args.get('q') or '')) or None
+        precio_min = request.args.get('precio_min')
         precio_max = request.args.get('precio_max')
         ambientes = request.args.get('ambientes')
         
+        try:
+            listing = parse_listing_args(request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
         # Convertir tipos de datos
+        if precio_min:
+            try:
+                precio_min = float(precio_min)
+            except ValueError:
+                precio_min = None
+                
         if precio_max:
             try:
                 precio_max = float(precio_max)
@@ -262,24 +438,42 @@ def search_properties_endpoint():
             except ValueError:
                 ambientes = None
         
+        # Un cero equivale a no filtrar
+        precio_min = precio_min or None
+        precio_max = precio_max or None
+        ambientes = ambientes or None
+        
         safe_print(f"--- Nueva Búsqueda ---")
-        safe_print(f"Parámetros recibidos: ope={ope}, tipo={tipo}, loc={loc}, cod={request.args.get('cod')}, precio_min={request.args.get('precio_min')}, precio_max={precio_max}, ambientes={ambientes}")
+        safe_print(f"Parámetros recibidos: q={q}, ope={ope}, tipo={tipo}, loc={loc}, cod={cod}, precio_min={precio_min}, precio_max={precio_max}, ambientes={ambientes}")
         
-        results = search_properties(ope, tipo, loc, precio_max, ambientes)
+        filters = {
+            "texto": q,
+            "operacion": ope,
+            "tipo": tipo,
+            "localidad": loc,
+            "codigo": cod,
+            "precio_min": precio_min,
+            "precio_max": precio_max,
+            "ambientes_min": ambientes
+        }
         
-        safe_print(f"Propiedades encontradas: {len(results)}")
+        # Consultas repetidas: la respuesta ya serializada sale del caché
+        version = current_snapshot().version
+        cache_key = search_cache_key(filters, listing)
+        body = search_cache.get(version, cache_key)
         
-        return jsonify({
-            "total": len(results),
-            "properties": results,
-            "filters": {
-                "operacion": ope,
-                "tipo": tipo,
-                "localidad": loc,
-                "precio_max": precio_max,
-                "ambientes_min": ambientes
-            }
-        }), 200
+        if body is None:
+            total, results = search_properties(ope, tipo, loc, precio_max, ambientes, precio_min, cod, q, **listing)
+            safe_print(f"Propiedades encontradas: {total}")
+            
+            payload = listing_payload(total, results, listing)
+            payload["filters"] = filters
+            body = app.json.dumps(payload)
+            search_cache.put(version, cache_key, body)
+        else:
+            safe_print("Respuesta servida desde cache")
+        
+        return Response(body, mimetype='application/json'), 200
         
     except Exception as e:
         safe_print(f"Error en endpoint search: {str(e)}")
@@ -288,42 +482,79 @@ def search_properties_endpoint():
 @app.route('/api/properties/stats', methods=['GET'])
 def get_stats():
     try:
-        properties = load_properties()
-        
-        total_propiedades = len(properties)
-        tipos_count = {}
-        barrios_count = {}
-        operaciones_count = {}
-        
-        for prop in properties:
-            # **CORRECCIÓN CRÍTICA**: Validar tipo antes de usar .get()
-            if not isinstance(prop, dict):
-                safe_print(f"ADVERTENCIA: Elemento no es diccionario en stats: {prop}")
-                continue
-            
-            # Contar tipos
-            tipo = prop.get('tipo', 'Sin especificar')
-            tipos_count[tipo] = tipos_count.get(tipo, 0) + 1
-            
-            # Contar barrios
-            barrio = prop.get('barrio', 'Sin especificar')
-            barrios_count[barrio] = barrios_count.get(barrio, 0) + 1
-            
-            # Contar operaciones
-            operacion = prop.get('operacion', 'Sin especificar')
-            operaciones_count[operacion] = operaciones_count.get(operacion, 0) + 1
-        
-        return jsonify({
-            "total_propiedades": total_propiedades,
-            "tipos_mas_comunes": dict(sorted(tipos_count.items(), key=lambda x: x[1], reverse=True)[:10]),
-            "barrios_mas_comunes": dict(sorted(barrios_count.items(), key=lambda x: x[1], reverse=True)[:10]),
-            "operaciones": operaciones_count
-        }), 200
+        return jsonify(current_snapshot().aggregates.stats()), 200
         
     except Exception as e:
         safe_print(f"Error obteniendo stats: {str(e)}")
         return jsonify({"error": f"Error al obtener estadísticas: {str(e)}"}), 500
 
+def parse_coordinate(args, name, limit):
+    """Lee una coordenada obligatoria de la URL. ValueError si falta o está fuera de rango."""
+    value = args.get(name, type=float)
+    if value is None or not -limit <= value <= limit:
+        raise ValueError(f"Parámetro {name} inválido o faltante")
+    return value
+
+@app.route('/api/properties/near', methods=['GET'])
+def get_properties_near():
+    """Propiedades dentro de un radio, de la más cercana a la más lejana"""
+    try:
+        try:
+            lat = parse_coordinate(request.args, 'lat', 90)
+            lon = parse_coordinate(request.args, 'lon', 180)
+            radius_km = request.args.get('radius_km', DEFAULT_RADIUS_KM, type=float)
+            if radius_km is None or radius_km <= 0:
+                raise ValueError("Parámetro radius_km inválido")
+            radius_km = min(radius_km, MAX_RADIUS_KM)
+            listing = parse_listing_args(request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        listing.pop('sort', None)  # siempre por distancia
+        
+        snapshot = current_snapshot()
+        total, properties = snapshot.nearby(snapshot.geo.near(lat, lon, radius_km), **listing)
+        
+        payload = listing_payload(total, properties, listing)
+        payload["center"] = {"lat": lat, "lon": lon}
+        payload["radius_km"] = radius_km
+        return jsonify(payload), 200
+        
+    except Exception as e:
+        safe_print(f"Error en endpoint near: {str(e)}")
+        return jsonify({"error": f"Error en servidor: {str(e)}"}), 500
+
+@app.route('/api/properties/within', methods=['GET'])
+def get_properties_within():
+    """Propiedades dentro de un rectángulo (vista del mapa), ordenadas por distancia al centro"""
+    try:
+        try:
+            min_lat = parse_coordinate(request.args, 'min_lat', 90)
+            min_lon = parse_coordinate(request.args, 'min_lon', 180)
+            max_lat = parse_coordinate(request.args, 'max_lat', 90)
+            max_lon = parse_coordinate(request.args, 'max_lon', 180)
+            if min_lat > max_lat or min_lon > max_lon:
+                raise ValueError("El rectángulo debe cumplir min_lat <= max_lat y min_lon <= max_lon")
+            listing = parse_listing_args(request.args)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        listing.pop('sort', None)
+        
+        snapshot = current_snapshot()
+        matches = snapshot.geo.in_box(min_lat, min_lon, max_lat, max_lon)
+        total, properties = snapshot.nearby(matches, **listing)
+        
+        payload = listing_payload(total, properties, listing)
+        payload["bounds"] = {"min_lat": min_lat, "min_lon": min_lon, "max_lat": max_lat, "max_lon": max_lon}
+        return jsonify(payload), 200
+        
+    except Exception as e:
+        safe_print(f"Error en endpoint within: {str(e)}")
+        return jsonify({"error": f"Error en servidor: {str(e)}"}), 500
+
+@app.route('/api/cache/search', methods=['GET'])
+def search_cache_stats():
+    return jsonify(search_cache.stats()), 200
+
 # **RUTA GENÉRICA AL FINAL** - Debe ser la última
 @app.route('/<path:filename>')
 def serve_any_file(filename):
@@ -331,7 +562,6 @@ def serve_any_file(filename):
 
 if __name__ == '__main__':
     safe_print("Iniciando servidor Flask...")
-    init_excel()
     safe_print("Servidor listo para recibir solicitudes")
     
     # Usar puerto 10000 para Render, 5000 para desarrollo local
@@ -0,0 +1,139 @@
+"""
+Versiones precomprimidas (gzip y, si está instalado, brotli) de los archivos
+de texto del sitio.
+
+Cada variante se guarda en STATIC_CACHE_DIR con el hash del contenido como
+nombre (`<hash>.gz`, `<hash>.br`), así que un archivo que no cambió no se
+vuelve a comprimir y una versión nueva nunca se confunde con la anterior.
+Las variantes de versiones que ya no están en el sitio se borran en cada pasada.
+main.py lo ejecuta al arrancar; también se puede correr como paso de build:
+
+    python precomprimir.py
+"""
+
+import gzip
+import hashlib
+import os
+
+try:
+    import brotli
+except ImportError:  # brotli es opcional: sin él solo se genera gzip
+    brotli = None
+
+STATIC_CACHE_DIR = os.environ.get('STATIC_CACHE_DIR', '.static_cache')
+
+COMPRESSIBLE_EXTENSIONS = {'.html', '.htm', '.css', '.js', '.json', '.map', '.svg', '.txt', '.xml'}
+
+# Archivos más chicos que esto no ganan nada comprimidos
+MIN_SIZE = 512
+
+SKIP_DIRS = {'__pycache__', 'data', 'venv', 'node_modules'}
+
+
+def safe_print(message):
+    safe_message = message.encode('ascii', 'ignore').decode('ascii')
+    print(safe_message)
+
+
+def hash_file(file_path):
+    digest = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:20]
+
+
+def _write_atomic(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def _compressors():
+    compressors = [('gzip', '.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        compressors.insert(0, ('br', '.br', lambda data: brotli.compress(data, quality=11)))
+    return compressors
+
+
+def precompress_file(file_path, cache_dir=STATIC_CACHE_DIR):
+    """
+    Genera las variantes de un archivo si todavía no existen.
+    Devuelve (hash del contenido, {encoding: ruta de la variante}).
+    """
+    content_hash = hash_file(file_path)
+    variants = {}
+    data = None
+
+    for encoding, suffix, compress in _compressors():
+        variant_path = os.path.join(cache_dir, content_hash + suffix)
+        if not os.path.exists(variant_path):
+            if data is None:
+                with open(file_path, 'rb') as f:
+                    data = f.read()
+            compressed = compress(data)
+            if len(compressed) >= len(data):
+                continue
+            _write_atomic(variant_path, compressed)
+        variants[encoding] = variant_path
+
+    return content_hash, variants
+
+
+def precompress_static_files(root, cache_dir=STATIC_CACHE_DIR):
+    """
+    Recorre el sitio y precomprime los archivos de texto; borra las variantes
+    de contenidos que ya no están.
+    Devuelve {hash del contenido: {encoding: ruta}} para negociar en cada petición.
+    """
+    cache_dir = os.path.join(root, cache_dir)
+    os.makedirs(cache_dir, exist_ok=True)
+    available = {}
+    current = set()
+
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if not d.startswith('.') and d not in SKIP_DIRS]
+        for filename in filenames:
+            if os.path.splitext(filename)[1].lower() not in COMPRESSIBLE_EXTENSIONS:
+                continue
+            file_path = os.path.join(dirpath, filename)
+            try:
+                if os.path.getsize(file_path) < MIN_SIZE:
+                    continue
+                content_hash, variants = precompress_file(file_path, cache_dir)
+            except OSError as e:
+                safe_print(f"No se pudo precomprimir {file_path}: {str(e)}")
+                continue
+            current.add(content_hash)
+            if variants:
+                available[content_hash] = variants
+
+    prune_cache(cache_dir, current)
+    return available
+
+
+def prune_cache(cache_dir, current):
+    """Borra las variantes cuyo hash no está en `current`. Devuelve cuántas borró."""
+    removed = 0
+    for filename in os.listdir(cache_dir):
+        content_hash, suffix = os.path.splitext(filename)
+        # Los .tmp son de otro proceso que está escribiendo una variante
+        if suffix not in ('.gz', '.br') or content_hash in current:
+            continue
+        try:
+            os.remove(os.path.join(cache_dir, filename))
+            removed += 1
+        except FileNotFoundError:  # otro worker la borró primero
+            pass
+        except OSError as e:
+            safe_print(f"No se pudo borrar {filename} de {cache_dir}: {str(e)}")
+    if removed:
+        safe_print(f"Variantes precomprimidas obsoletas borradas: {removed}")
+    return removed
+
+
+if __name__ == '__main__':
+    variants = precompress_static_files(os.getcwd())
+    encodings = 'br y gzip' if brotli is not None else 'gzip'
+    safe_print(f"Archivos precomprimidos ({encodings}): {len(variants)} en {STATIC_CACHE_DIR}")
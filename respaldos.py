@@ -0,0 +1,277 @@
+"""
+Respaldos de la base de contactos.
+
+Cada respaldo es un archivo de un contacto JSON por línea comprimido con
+gzip, en el directorio de respaldos:
+
+    completo_<fecha>_<último id>.jsonl.gz               todos los contactos
+    incremental_<fecha>_<primer id>-<último id>.jsonl.gz los agregados desde el respaldo anterior
+
+Los incrementales solo leen los contactos con id mayor al último respaldado,
+así que su costo depende de los contactos nuevos y no del total. Se hace un
+respaldo completo por día (el primero del día) y `apply_retention()` conserva
+el último completo de cada uno de los BACKUP_KEEP_DAILY días y de las
+BACKUP_KEEP_WEEKLY semanas más recientes, junto con los incrementales que
+siguen al más viejo de ellos.
+
+`BackupWorker` hace los respaldos en un hilo aparte, fuera de las peticiones.
+También se puede usar desde la línea de comandos:
+
+    python respaldos.py crear [directorio]
+    python respaldos.py restaurar [directorio]
+
+`restaurar` carga el último completo y los incrementales posteriores en la
+base de CONTACTS_DATABASE_URL (database.py), que tiene que estar vacía.
+"""
+
+import gzip
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+
+from almacenamiento import ContactStore, file_lock
+
+logger = logging.getLogger(__name__)
+
+BACKUP_DIR = os.environ.get('BACKUP_DIR', os.path.join('data', 'backups'))
+
+# Contactos nuevos que disparan un respaldo incremental; si no se llega, se
+# respalda lo pendiente cada BACKUP_INTERVAL segundos
+BACKUP_EVERY = int(os.environ.get('BACKUP_EVERY', 50))
+BACKUP_INTERVAL = int(os.environ.get('BACKUP_INTERVAL', 3600))
+
+BACKUP_KEEP_DAILY = int(os.environ.get('BACKUP_KEEP_DAILY', 7))
+BACKUP_KEEP_WEEKLY = int(os.environ.get('BACKUP_KEEP_WEEKLY', 4))
+
+BACKUP_PATTERN = re.compile(
+    r'^(?P<kind>completo|incremental)_(?P<created>\d{8}-\d{6})_'
+    r'(?:(?P<first_id>\d+)-)?(?P<last_id>\d+)\.jsonl\.gz$'
+)
+
+Backup = namedtuple('Backup', 'kind created first_id last_id path')
+
+
+def list_backups(backup_dir):
+    """Respaldos del directorio, del más viejo al más nuevo."""
+    backups = []
+    try:
+        filenames = os.listdir(backup_dir)
+    except FileNotFoundError:
+        return backups
+    for filename in filenames:
+        match = BACKUP_PATTERN.match(filename)
+        if not match:
+            continue
+        last_id = int(match['last_id'])
+        backups.append(Backup(
+            kind=match['kind'],
+            created=datetime.strptime(match['created'], '%Y%m%d-%H%M%S'),
+            first_id=int(match['first_id']) if match['first_id'] else 1,
+            last_id=last_id,
+            path=os.path.join(backup_dir, filename)
+        ))
+    return sorted(backups, key=lambda backup: (backup.last_id, backup.created, backup.kind))
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"No se puede respaldar {type(value).__name__}")
+
+
+def write_backup(backup_dir, kind, contacts, now=None):
+    """
+    Escribe `contacts` (en orden de id) en un respaldo nuevo y lo devuelve,
+    o None si no había contactos.
+    """
+    now = now or datetime.now()
+    tmp_path = os.path.join(backup_dir, f".{kind}.{os.getpid()}.tmp")
+    first_id = last_id = None
+    try:
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+            for contact in contacts:
+                f.write(json.dumps(contact, ensure_ascii=False, default=_json_default) + '\n')
+                first_id = first_id or contact['contact_id']
+                last_id = contact['contact_id']
+        if last_id is None:
+            return None
+        ids = f"{last_id:06d}" if kind == 'completo' else f"{first_id:06d}-{last_id:06d}"
+        path = os.path.join(backup_dir, f"{kind}_{now:%Y%m%d-%H%M%S}_{ids}.jsonl.gz")
+        os.replace(tmp_path, path)
+        return Backup(kind, now.replace(microsecond=0), first_id if kind != 'completo' else 1, last_id, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def read_backup(path):
+    """Contactos de un respaldo, listos para `ContactStore.restore()`."""
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            contact = json.loads(line)
+            contact['created_at'] = datetime.fromisoformat(contact['created_at'])
+            yield contact
+
+
+def create_backup(store, backup_dir=BACKUP_DIR, full=None, now=None):
+    """
+    Respalda los contactos nuevos de `store`: completo si no hay uno del día
+    (o si `full` lo pide), si no incremental. Devuelve el Backup creado o None
+    si no había nada nuevo.
+    """
+    now = now or datetime.now()
+    os.makedirs(backup_dir, exist_ok=True)
+    with file_lock(os.path.join(backup_dir, 'respaldos')):
+        backups = list_backups(backup_dir)
+        fulls = [backup for backup in backups if backup.kind == 'completo']
+        if full is None:
+            full = not fulls or fulls[-1].created.date() < now.date()
+
+        if full:
+            backup = write_backup(backup_dir, 'completo', store.iter_contacts(), now)
+        else:
+            last_id = backups[-1].last_id if backups else 0
+            backup = write_backup(backup_dir, 'incremental', store.iter_contacts(after_id=last_id), now)
+
+        if backup:
+            logger.info(f"Respaldo {backup.kind} creado: {backup.path}")
+            apply_retention(backup_dir)
+        return backup
+
+
+def apply_retention(backup_dir=BACKUP_DIR, keep_daily=BACKUP_KEEP_DAILY, keep_weekly=BACKUP_KEEP_WEEKLY):
+    """
+    Borra los respaldos completos que no son el último de uno de los
+    `keep_daily` días o `keep_weekly` semanas más recientes, y los
+    incrementales anteriores al completo más viejo que queda.
+    """
+    backups = list_backups(backup_dir)
+    fulls = [backup for backup in backups if backup.kind == 'completo']
+    if not fulls:
+        return []
+
+    keep = {fulls[-1].path}
+    for period, limit in ((lambda b: b.created.date(), keep_daily),
+                          (lambda b: b.created.isocalendar()[:2], keep_weekly)):
+        latest = {}
+        for backup in fulls:
+            latest[period(backup)] = backup.path
+        keep.update(path for _, path in sorted(latest.items())[-limit:] if limit > 0)
+
+    oldest_kept = min(backup.last_id for backup in fulls if backup.path in keep)
+    removed = []
+    for backup in backups:
+        if backup.kind == 'completo':
+            obsolete = backup.path not in keep
+        else:
+            obsolete = backup.last_id <= oldest_kept
+        if obsolete:
+            os.remove(backup.path)
+            removed.append(backup.path)
+    if removed:
+        logger.info(f"Respaldos borrados por la política de retención: {len(removed)}")
+    return removed
+
+
+def restore_chain(backup_dir=BACKUP_DIR):
+    """
+    Último respaldo completo y los incrementales que lo siguen, en orden.
+    Cada incremental tiene que empezar justo después del anterior: si falta
+    uno (ValueError) no se restaura, en lugar de perder sus contactos.
+    """
+    backups = list_backups(backup_dir)
+    fulls = [backup for backup in backups if backup.kind == 'completo']
+    if not fulls:
+        raise FileNotFoundError(f"No hay respaldos completos en {backup_dir}")
+
+    chain = [fulls[-1]]
+    for backup in backups:
+        if backup.kind != 'incremental' or backup.last_id <= chain[-1].last_id:
+            continue
+        if backup.first_id != chain[-1].last_id + 1:
+            raise ValueError(
+                f"Falta el respaldo de los contactos {chain[-1].last_id + 1} a {backup.first_id - 1} "
+                f"(entre {os.path.basename(chain[-1].path)} y {os.path.basename(backup.path)})")
+        chain.append(backup)
+    return chain
+
+
+def restore(store, backup_dir=BACKUP_DIR):
+    """Reconstruye la base de `store` (vacía) desde los respaldos. Devuelve cuántos contactos cargó."""
+    chain = restore_chain(backup_dir)
+
+    def contacts():
+        for backup in chain:
+            yield from read_backup(backup.path)
+
+    loaded = store.restore(contacts())
+    logger.info(f"Restaurados {loaded} contactos desde {len(chain)} respaldos de {backup_dir}")
+    return loaded
+
+
+class BackupWorker:
+    """
+    Hilo que respalda los contactos fuera de las peticiones: `notify()` solo
+    lo despierta, y el respaldo se hace cuando hay BACKUP_EVERY contactos
+    nuevos o cada BACKUP_INTERVAL segundos si quedó alguno pendiente.
+    """
+
+    def __init__(self, store, backup_dir=BACKUP_DIR, every=BACKUP_EVERY, interval=BACKUP_INTERVAL):
+        self.store = store
+        self.backup_dir = backup_dir
+        self.every = every
+        self.interval = interval
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='respaldos', daemon=True)
+        self._thread.start()
+
+    def notify(self):
+        self._wake.set()
+
+    def _pending(self):
+        backups = list_backups(self.backup_dir)
+        return self.store.last_id() - (backups[-1].last_id if backups else 0)
+
+    def _run(self):
+        # El plazo se cuenta desde el último respaldo, no desde el último
+        # aviso: si no, un goteo de contactos por debajo de `every` lo
+        # posterga para siempre
+        deadline = time.monotonic() + self.interval
+        while True:
+            self._wake.wait(max(0, deadline - time.monotonic()))
+            self._wake.clear()
+            try:
+                pending = self._pending()
+                if pending >= self.every or (pending > 0 and time.monotonic() >= deadline):
+                    create_backup(self.store, self.backup_dir)
+                    deadline = time.monotonic() + self.interval
+            except Exception as e:
+                logger.error(f"Error creando respaldo: {str(e)}")
+            if time.monotonic() >= deadline:
+                deadline = time.monotonic() + self.interval
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    command = sys.argv[1] if len(sys.argv) > 1 else ''
+    backup_dir = sys.argv[2] if len(sys.argv) > 2 else BACKUP_DIR
+
+    if command == 'crear':
+        backup = create_backup(ContactStore('respaldos'), backup_dir)
+        print(f"Respaldo creado: {backup.path}" if backup else "No hay contactos nuevos para respaldar")
+    elif command == 'restaurar':
+        try:
+            loaded = restore(ContactStore('respaldos'), backup_dir)
+        except (FileNotFoundError, ValueError) as e:
+            print(f"No se pudo restaurar: {e}")
+            sys.exit(1)
+        print(f"Contactos restaurados: {loaded}")
+    else:
+        print("Uso: python respaldos.py crear|restaurar [directorio]")
+        sys.exit(2)
@@ -1,8 +1,7 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-from openpyxl import Workbook, load_workbook
-from datetime import datetime
-import os
+
+from almacenamiento import ContactStore
 
 
 app = Flask(__name__)
@@ -11,50 +10,20 @@ CORS(app)  # Permitir peticiones desde el navegador
 # Nombre del archivo Excel
 EXCEL_FILE = 'contactos_dante_propiedades.xlsx'
 
-def init_excel():
-    """Inicializa el archivo Excel si no existe"""
-    if not os.path.exists(EXCEL_FILE):
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Contactos"
-        # Crear encabezados
-        ws['A1'] = 'Fecha/Hora'
-        ws['B1'] = 'Nombre'
-        ws['C1'] = 'Firma'
-        ws['D1'] = 'Teléfono'
-        ws['E1'] = 'Propiedad'
-        
-        # Ajustar ancho de columnas
-        ws.column_dimensions['A'].width = 20
-        ws.column_dimensions['B'].width = 25
-        ws.column_dimensions['C'].width = 15
-        ws.column_dimensions['D'].width = 15
-        ws.column_dimensions['E'].width = 15
-        
-        wb.save(EXCEL_FILE)
-        print(f"✓ Archivo {EXCEL_FILE} creado exitosamente")
-    else:
-        print(f"✓ Archivo {EXCEL_FILE} encontrado")
+# Los contactos se guardan en la base (database.py); el Excel de versiones
+# anteriores se importa una sola vez
+contact_store = ContactStore('servidor_contactos')
+contact_store.import_legacy(EXCEL_FILE)
 
 def guardar_contacto(nombre, firma, telefono, propiedad="DESTACADA0"):
-    """Guarda los datos del contacto en el archivo Excel"""
+    """Guarda los datos del contacto en la base de contactos"""
     try:
-        # Cargar el archivo Excel existente
-        wb = load_workbook(EXCEL_FILE)
-        ws = wb.active
-        
-        # Obtener la siguiente fila vacía
-        next_row = ws.max_row + 1
-        
-        # Agregar los datos
-        ws[f'A{next_row}'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        ws[f'B{next_row}'] = nombre
-        ws[f'C{next_row}'] = firma if firma else '-'
-        ws[f'D{next_row}'] = telefono
-        ws[f'E{next_row}'] = propiedad
-        
-        # Guardar el archivo
-        wb.save(EXCEL_FILE)
+        contact_store.add(
+            name=nombre,
+            signature=firma if firma else '-',
+            phone=telefono,
+            property_code=propiedad
+        )
         print(f"✓ Contacto guardado: {nombre} - {telefono}")
         return True
     except Exception as e:
@@ -94,7 +63,7 @@ def guardar_contacto_route():
         if guardar_contacto(nombre, firma, telefono, propiedad):
             return jsonify({
                 'success': True,
-                'message': 'Datos guardados correctamente en Excel'
+                'message': 'Datos guardados correctamente'
             })
         else:
             return jsonify({
@@ -113,14 +82,11 @@ def guardar_contacto_route():
 def estadisticas():
     """Muestra estadísticas de contactos guardados"""
     try:
-        if os.path.exists(EXCEL_FILE):
-            wb = load_workbook(EXCEL_FILE)
-            ws = wb.active
-            total = ws.max_row - 1  # Resta la fila de encabezados
+        total = contact_store.count()
+        if total:
             return jsonify({
                 'success': True,
-                'total_contactos': max(0, total),
-                'archivo': EXCEL_FILE
+                'total_contactos': total
             })
         return jsonify({
             'success': False, 
@@ -138,7 +104,7 @@ def test():
     return jsonify({
         'success': True,
         'message': 'Servidor funcionando correctamente',
-        'excel_existe': os.path.exists(EXCEL_FILE)
+        'total_contactos': contact_store.count()
     })
 
 if __name__ == '__main__':
@@ -147,13 +113,8 @@ if __name__ == '__main__':
     print("=" * 60)
     print()
     
-    # Inicializar el archivo Excel
-    init_excel()
-    
-    print()
     print("🚀 Servidor iniciando...")
-    print(f"📋 Archivo Excel: {EXCEL_FILE}")
-    print(f"📂 Ruta completa: {os.path.abspath(EXCEL_FILE)}")
+    print(f"📋 Contactos registrados: {contact_store.count()}")
     print("🌐 URL local: http://localhost:5000")
     print("🌐 Test: http://localhost:5000/test")
     print("📊 Estadísticas: http://localhost:5000/estadisticas")
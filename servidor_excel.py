@@ -5,11 +5,14 @@ PARCHE URGENTE - Corregir error 'Fecha' en API de estadísticas
 Dante Propiedades - Solución para problema "desconectado"
 """
 
-from flask import Flask, request, jsonify, send_file
-import pandas as pd
+from flask import Flask, Response, request, jsonify, send_file, stream_with_context
 from datetime import datetime
+import json
 import os
+import threading
+import time
 from flask_cors import CORS
+from almacenamiento import ContactStore, SubmissionIndex, created, idempotent, parse_date_range, xlsx_response
 
 app = Flask(__name__)
 CORS(app)  # Permitir requests desde el frontend
@@ -18,6 +21,86 @@ CORS(app)  # Permitir requests desde el frontend
 EXCEL_FILE = 'contactos_dante_propiedades.xlsx'
 LOG_FILE = 'registro_contactos.log'
 
+# Los contactos se guardan en la base (database.py); el Excel se genera a
+# pedido en /api/descargar-excel con estas columnas
+COLUMNAS_EXCEL = {
+    'Fecha': created('%Y-%m-%d %H:%M:%S'),
+    'Nombre': 'name',
+    'Email': 'email',
+    'Teléfono': 'phone',
+    'Interés': 'interest',
+    'Presupuesto': 'budget',
+    'Mensaje': 'message',
+    'Página_Origen': 'page',
+    'IP_Cliente': 'ip',
+    'User_Agent': 'user_agent'
+}
+contact_store = ContactStore('servidor_excel')
+
+# Excel de contactos de versiones anteriores: se importa una sola vez
+contact_store.import_legacy(EXCEL_FILE)
+
+# Envíos recientes: reintentos y doble click no se guardan dos veces
+envios_recientes = SubmissionIndex()
+
+def contacto_como_fila(registro):
+    """Contacto como lo devuelven los endpoints de lectura"""
+    return {
+        'id': registro['contact_id'],
+        'nombre': registro.get('name') or '',
+        'email': registro.get('email') or '',
+        'telefono': registro.get('phone') or '',
+        'mensaje': registro.get('message') or '',
+        'fecha': registro['created_at'].strftime('%Y-%m-%d %H:%M:%S')
+    }
+
+# Contactos por página en GET /api/guardar-contacto
+LIMITE_POR_DEFECTO = 50
+LIMITE_MAXIMO = 500
+
+# Panel admin: /api/eventos espera un aviso de contacto nuevo; sin avisos
+# manda un ping (y revisa si otro proceso guardó algo) cada EVENTOS_PING segundos
+EVENTOS_PING = 15
+EVENTOS_MAX_PENDIENTES = 100
+# Cada conexión se cierra a los EVENTOS_DURACION segundos y el navegador
+# reconecta solo (retry) con Last-Event-ID, sin perder contactos. Mientras
+# dura ocupa un hilo: con gunicorn hay que usar workers con hilos, por ejemplo
+#   gunicorn -k gthread --threads 8 servidor_excel:app
+# (con workers sync cada panel abierto ocupa un worker entero)
+EVENTOS_DURACION = int(os.environ.get('EVENTOS_DURACION', 300))
+_avisos = threading.Condition()
+_avisos_version = 0
+
+def avisar_paneles():
+    """Despierta a los paneles admin conectados a /api/eventos"""
+    global _avisos_version
+    with _avisos:
+        _avisos_version += 1
+        _avisos.notify_all()
+
+def esperar_aviso(visto, timeout):
+    """Espera un aviso posterior a `visto`; devuelve la versión actual"""
+    with _avisos:
+        _avisos.wait_for(lambda: _avisos_version != visto, timeout)
+        return _avisos_version
+
+def resumen_estadisticas():
+    """Total, contactos de hoy y fecha del último, desde contact_stats y los recientes"""
+    _, total = contact_store.version()
+    ultimo = contact_store.last() if total else None
+    return {
+        'total_contactos': total,
+        'contactos_hoy': contact_store.count_today() if total else 0,
+        'ultimo_contacto': contacto_como_fila(ultimo)['fecha'] if ultimo else None
+    }
+
+def evento_sse(tipo, datos, id_evento=None):
+    lineas = [f"event: {tipo}"]
+    if id_evento is not None:
+        lineas.append(f"id: {id_evento}")
+    lineas.append(f"data: {json.dumps(datos, ensure_ascii=False)}")
+    return '\n'.join(lineas) + '\n\n'
+
 def log_contacto(mensaje):
     """Registra actividad en archivo de log"""
     timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
@@ -29,46 +112,26 @@ def log_contacto(mensaje):
 
 def guardar_contacto_excel(datos):
     """
-    Guarda un nuevo contacto en el archivo Excel
+    Guarda un nuevo contacto en la base de contactos
     """
     try:
-        fecha_hora = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        
         # Nuevo registro
-        nuevo_registro = {
-            'Fecha': fecha_hora,
-            'Nombre': datos.get('nombre', ''),
-            'Email': datos.get('email', ''),
-            'Teléfono': datos.get('telefono', ''),
-            'Interés': datos.get('interes', ''),
-            'Presupuesto': datos.get('presupuesto', ''),
-            'Mensaje': datos.get('mensaje', ''),
-            'Página_Origen': datos.get('pagina_origen', ''),
-            'IP_Cliente': request.remote_addr,
-            'User_Agent': request.headers.get('User-Agent', '')[:100] + '...'
-        }
-        
-        # Verificar si el archivo existe
-        if os.path.exists(EXCEL_FILE):
-            # Leer archivo existente y agregar nuevo registro
-            try:
-                df = pd.read_excel(EXCEL_FILE)
-                df_nuevo = pd.DataFrame([nuevo_registro])
-                df_completo = pd.concat([df, df_nuevo], ignore_index=True)
-            except Exception as e:
-                # Si hay error, crear nuevo archivo
-                log_contacto(f"⚠️ Error leyendo Excel: {str(e)}. Creando nuevo archivo.")
-                df_completo = pd.DataFrame([nuevo_registro])
-        else:
-            # Crear nuevo archivo con encabezados
-            df_completo = pd.DataFrame([nuevo_registro])
-        
-        # Guardar archivo Excel
-        df_completo.to_excel(EXCEL_FILE, index=False, engine='openpyxl')
+        nuevo_registro = contact_store.add(
+            name=datos.get('nombre', ''),
+            email=datos.get('email', ''),
+            phone=datos.get('telefono', ''),
+            interest=datos.get('interes', ''),
+            budget=datos.get('presupuesto', ''),
+            message=datos.get('mensaje', ''),
+            page=datos.get('pagina_origen', ''),
+            ip=request.remote_addr,
+            user_agent=request.headers.get('User-Agent', '')[:100] + '...'
+        )
+        avisar_paneles()
         
         log_contacto(f"✅ Contacto guardado: {datos.get('nombre', 'Sin nombre')} - {datos.get('email', 'Sin email')}")
         
-        return True, f"Contacto registrado exitosamente: {nuevo_registro['Nombre']}"
+        return True, f"Contacto registrado exitosamente: {nuevo_registro['name']}"
         
     except Exception as e:
         error_msg = f"❌ Error al guardar contacto: {str(e)}"
@@ -77,30 +140,29 @@ def guardar_contacto_excel(datos):
 
 def obtener_contactos():
     """
-    Función para obtener la lista de contactos guardados
+    Función para obtener la lista de contactos guardados, del más nuevo al
+    más viejo y de a páginas: ?limit=N (hasta LIMITE_MAXIMO) y los cursores
+    ?before=id para seguir con los anteriores o ?after=id para los nuevos
     """
     try:
-        if not os.path.exists(EXCEL_FILE):
-            return jsonify({
-                'success': True,
-                'contactos': [],
-                'total': 0,
-                'mensaje': 'No hay contactos registrados aún'
-            })
-        
-        try:
-            # Leer el archivo Excel
-            df = pd.read_excel(EXCEL_FILE)
-        except Exception as e:
-            log_contacto(f"⚠️ Error leyendo Excel en obtener_contactos: {str(e)}")
-            return jsonify({
-                'success': True,
-                'contactos': [],
-                'total': 0,
-                'mensaje': f'Error leyendo datos: {str(e)}'
-            })
+        limite = int(request.args.get('limit', LIMITE_POR_DEFECTO))
+        before = request.args.get('before')
+        after = request.args.get('after')
+        before = int(before) if before else None
+        after = int(after) if after else None
+        if limite < 1:
+            raise ValueError('limit debe ser mayor que 0')
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': f'Parámetros de paginación inválidos: {str(e)}'
+        }), 400
+    
+    try:
+        registros, total = contact_store.page(min(limite, LIMITE_MAXIMO), before=before, after=after)
+        contactos = [contacto_como_fila(registro) for registro in registros]
         
-        if df.empty:
+        if total == 0:
             return jsonify({
                 'success': True,
                 'contactos': [],
@@ -108,27 +170,14 @@ def obtener_contactos():
                 'mensaje': 'No hay contactos registrados aún'
             })
         
-        # Convertir DataFrame a lista de diccionarios
-        contactos = []
-        for _, row in df.iterrows():
-            try:
-                contacto = {
-                    'nombre': str(row.get('Nombre', 'N/A')),
-                    'email': str(row.get('Email', 'N/A')),
-                    'telefono': str(row.get('Teléfono', 'N/A')),
-                    'mensaje': str(row.get('Mensaje', 'N/A')),
-                    'fecha': str(row.get('Fecha', 'N/A'))
-                }
-                contactos.append(contacto)
-            except Exception as e:
-                log_contacto(f"⚠️ Error procesando fila: {str(e)}")
-                continue
-        
         return jsonify({
             'success': True,
             'contactos': contactos,
-            'total': len(contactos),
-            'mensaje': f'Total de contactos: {len(contactos)}'
+            'total': total,
+            # Cursores para la página siguiente (más viejos) y para consultar los nuevos
+            'before': contactos[-1]['id'] if contactos else before,
+            'after': contactos[0]['id'] if contactos else after,
+            'mensaje': f'Total de contactos: {total}'
         })
         
     except Exception as e:
@@ -141,6 +190,7 @@ def obtener_contactos():
         }), 500
 
 @app.route('/api/guardar-contacto', methods=['GET', 'POST'])
+@idempotent(envios_recientes)
 def guardar_contacto():
     """
     Endpoint para recibir y guardar datos del formulario (POST)
@@ -206,73 +256,17 @@ def obtener_estadisticas():
     Endpoint para obtener estadísticas de contactos - VERSIÓN CORREGIDA
     """
     try:
-        if not os.path.exists(EXCEL_FILE):
+        # Contadores de contact_stats: no se recorren los contactos
+        resumen = resumen_estadisticas()
+        if not resumen['total_contactos']:
             return jsonify({
                 'total_contactos': 0,
                 'contactos_hoy': 0,
                 'mensaje': 'No hay datos registrados aún'
             })
         
-        try:
-            # Leer archivo Excel
-            df = pd.read_excel(EXCEL_FILE)
-        except Exception as e:
-            log_contacto(f"⚠️ Error leyendo Excel en estadísticas: {str(e)}")
-            return jsonify({
-                'total_contactos': 0,
-                'contactos_hoy': 0,
-                'mensaje': f'Error leyendo datos: {str(e)}'
-            })
-        
-        if df.empty:
-            return jsonify({
-                'total_contactos': 0,
-                'contactos_hoy': 0,
-                'mensaje': 'No hay datos registrados aún'
-            })
-        
-        # Estadísticas básicas - CON MANEJO SEGURO DE ERRORES
-        total = len(df)
-        hoy = datetime.now().date()
-        contactos_hoy = 0
-        ultimo_contacto = None
-        
-        try:
-            # Verificar si existe la columna 'Fecha' con manejo de errores
-            columnas = df.columns.tolist()
-            fecha_col = None
-            
-            # Buscar columna de fecha con diferentes variaciones
-            for col in columnas:
-                if 'fecha' in col.lower() or col == 'Fecha':
-                    fecha_col = col
-                    break
-            
-            if fecha_col and fecha_col in df.columns:
-                # Contar contactos de hoy
-                try:
-                    contactos_hoy = len(df[df[fecha_col].astype(str).str.startswith(str(hoy), na=False)])
-                    ultimo_contacto = str(df[fecha_col].iloc[-1]) if len(df) > 0 else None
-                except Exception as e:
-                    log_contacto(f"⚠️ Error procesando fechas: {str(e)}")
-                    contactos_hoy = 0
-                    ultimo_contacto = None
-            else:
-                log_contacto(f"⚠️ No se encontró columna 'Fecha'. Columnas disponibles: {columnas}")
-                contactos_hoy = 0
-                ultimo_contacto = None
-                
-        except Exception as e:
-            log_contacto(f"⚠️ Error en cálculo de estadísticas: {str(e)}")
-            contactos_hoy = 0
-            ultimo_contacto = None
-        
-        return jsonify({
-            'total_contactos': total,
-            'contactos_hoy': contactos_hoy,
-            'ultimo_contacto': ultimo_contacto,
-            'mensaje': f'Total: {total}, Hoy: {contactos_hoy}'
-        })
+        resumen['mensaje'] = f"Total: {resumen['total_contactos']}, Hoy: {resumen['contactos_hoy']}"
+        return jsonify(resumen)
         
     except Exception as e:
         log_contacto(f"❌ Error crítico en estadísticas: {str(e)}")
@@ -283,6 +277,58 @@ def obtener_estadisticas():
             'mensaje': 'Error interno del servidor'
         }), 500
 
+@app.route('/api/eventos', methods=['GET'])
+def eventos_panel():
+    """
+    Server-Sent Events para el panel admin: un evento `contacto` por cada
+    contacto nuevo y uno `estadisticas` después de cada tanda (con el id del
+    último contacto enviado). La conexión dura EVENTOS_DURACION segundos; al
+    reconectar, el navegador manda Last-Event-ID y se envían los que se perdió.
+    """
+    try:
+        ultimo_id = int(request.headers.get('Last-Event-ID', ''))
+    except ValueError:
+        ultimo_id = None
+    
+    def generar(ultimo_id):
+        visto = _avisos_version
+        primera = True
+        fin = time.monotonic() + EVENTOS_DURACION
+        yield 'retry: 3000\n\n'
+        while True:
+            if ultimo_id is None:
+                ultimo_id = contact_store.last_id()
+            
+            # Los siguientes a ultimo_id, de a EVENTOS_MAX_PENDIENTES
+            registros, _ = contact_store.page(EVENTOS_MAX_PENDIENTES, after=ultimo_id)
+            nuevos = [contacto_como_fila(registro) for registro in reversed(registros)]
+            for contacto in nuevos:
+                yield evento_sse('contacto', contacto, contacto['id'])
+            
+            if nuevos or primera:
+                resumen = resumen_estadisticas()
+                resumen['nuevos'] = len(nuevos)
+                if nuevos:
+                    ultimo_id = nuevos[-1]['id']
+                # Con id: aunque no haya contactos nuevos, la reconexión sigue desde acá
+                yield evento_sse('estadisticas', resumen, ultimo_id)
+                primera = False
+            if len(nuevos) == EVENTOS_MAX_PENDIENTES:
+                continue
+            
+            restante = fin - time.monotonic()
+            if restante <= 0:
+                return
+            anterior = visto
+            visto = esperar_aviso(visto, min(EVENTOS_PING, restante))
+            if visto == anterior:
+                yield ': ping\n\n'
+    
+    return Response(stream_with_context(generar(ultimo_id)), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
 # RUTA ADMIN - VERSIÓN MEJORADA
 @app.route('/admin')
 def admin_panel():
@@ -347,6 +393,7 @@ def admin_panel():
     
     <script>
         let conectado = false;
+        let ultimosContactos = [];
         
         function actualizarStatusConexion(status, mensaje) {
             const statusDiv = document.getElementById('conexionStatus');
@@ -383,6 +430,23 @@ def admin_panel():
                 });
         }
         
+        function mostrarEstadisticas(data) {
+            document.getElementById('totalContactos').textContent = data.total_contactos || 0;
+            document.getElementById('contactosHoy').textContent = data.contactos_hoy || 0;
+            if (data.ultimo_contacto && data.ultimo_contacto !== 'None') {
+                try {
+                    const fecha = new Date(data.ultimo_contacto);
+                    document.getElementById('ultimoContacto').textContent = 
+                        fecha.toLocaleDateString('es-ES', { day: '2-digit', month: '2-digit' });
+                } catch (e) {
+                    document.getElementById('ultimoContacto').textContent = 
+                        String(data.ultimo_contacto).substring(0, 10);
+                }
+            } else {
+                document.getElementById('ultimoContacto').textContent = 'Sin datos';
+            }
+        }
+        
         function cargarEstadisticas() {
             console.log('📊 Cargando estadísticas...');
             fetch('/api/estadisticas')
@@ -392,20 +456,7 @@ def admin_panel():
                 })
                 .then(data => {
                     console.log('📊 Datos recibidos:', data);
-                    document.getElementById('totalContactos').textContent = data.total_contactos || 0;
-                    document.getElementById('contactosHoy').textContent = data.contactos_hoy || 0;
-                    if (data.ultimo_contacto && data.ultimo_contacto !== 'None') {
-                        try {
-                            const fecha = new Date(data.ultimo_contacto);
-                            document.getElementById('ultimoContacto').textContent = 
-                                fecha.toLocaleDateString('es-ES', { day: '2-digit', month: '2-digit' });
-                        } catch (e) {
-                            document.getElementById('ultimoContacto').textContent = 
-                                String(data.ultimo_contacto).substring(0, 10);
-                        }
-                    } else {
-                        document.getElementById('ultimoContacto').textContent = 'Sin datos';
-                    }
+                    mostrarEstadisticas(data);
                 })
                 .catch(error => {
                     console.error('❌ Error cargando estadísticas:', error);
@@ -415,9 +466,26 @@ def admin_panel():
                 });
         }
         
+        function mostrarContactos() {
+            let html = '<table><tr><th>Fecha</th><th>Nombre</th><th>Email</th><th>Teléfono</th><th>Mensaje</th></tr>';
+            
+            ultimosContactos.slice().reverse().forEach(contacto => {
+                html += '<tr>' +
+                    '<td>' + (contacto.fecha || 'N/A') + '</td>' +
+                    '<td>' + (contacto.nombre || 'N/A') + '</td>' +
+                    '<td>' + (contacto.email || 'N/A') + '</td>' +
+                    '<td>' + (contacto.telefono || 'N/A') + '</td>' +
+                    '<td>' + ((contacto.mensaje || '').substring(0, 30) + ((contacto.mensaje || '').length > 30 ? '...' : '')) + '</td>' +
+                '</tr>';
+            });
+            
+            html += '</table>';
+            document.getElementById('contactosContainer').innerHTML = html;
+        }
+        
         function cargarContactos() {
             console.log('📋 Cargando contactos...');
-            fetch('/api/guardar-contacto')
+            fetch('/api/guardar-contacto?limit=10')
                 .then(response => {
                     console.log('📋 Status respuesta:', response.status);
                     return response.json();
@@ -436,20 +504,8 @@ def admin_panel():
                         return;
                     }
                     
-                    let html = '<table><tr><th>Fecha</th><th>Nombre</th><th>Email</th><th>Teléfono</th><th>Mensaje</th></tr>';
-                    
-                    data.contactos.slice(-10).reverse().forEach(contacto => {
-                        html += '<tr>' +
-                            '<td>' + (contacto.fecha || 'N/A') + '</td>' +
-                            '<td>' + (contacto.nombre || 'N/A') + '</td>' +
-                            '<td>' + (contacto.email || 'N/A') + '</td>' +
-                            '<td>' + (contacto.telefono || 'N/A') + '</td>' +
-                            '<td>' + ((contacto.mensaje || '').substring(0, 30) + ((contacto.mensaje || '').length > 30 ? '...' : '')) + '</td>' +
-                        '</tr>';
-                    });
-                    
-                    html += '</table>';
-                    container.innerHTML = html;
+                    ultimosContactos = data.contactos.slice().reverse();
+                    mostrarContactos();
                 })
                 .catch(error => {
                     console.error('❌ Error cargando contactos:', error);
@@ -467,6 +523,33 @@ def admin_panel():
             }, 1000);
         }
         
+        function escucharEventos() {
+            // El servidor avisa cuando llega un contacto: sin consultas periódicas
+            const eventos = new EventSource('/api/eventos');
+            
+            eventos.addEventListener('contacto', event => {
+                const contacto = JSON.parse(event.data);
+                if (ultimosContactos.some(c => c.id === contacto.id)) {
+                    return;
+                }
+                ultimosContactos.push(contacto);
+                ultimosContactos = ultimosContactos.slice(-10);
+                mostrarContactos();
+            });
+            eventos.addEventListener('estadisticas', event => {
+                mostrarEstadisticas(JSON.parse(event.data));
+            });
+            eventos.onopen = () => {
+                actualizarStatusConexion(true, 'Recibiendo contactos en vivo');
+                conectado = true;
+            };
+            eventos.onerror = () => {
+                // EventSource reconecta solo y recupera lo perdido con Last-Event-ID
+                actualizarStatusConexion(false, 'Reconectando...');
+                conectado = false;
+            };
+        }
+        
         // Cargar datos al iniciar
         document.addEventListener('DOMContentLoaded', function() {
             console.log('🚀 Inicializando admin panel...');
@@ -476,8 +559,12 @@ def admin_panel():
                 cargarContactos();
             }, 1000);
             
-            // Actualizar cada 30 segundos
-            setInterval(actualizarDatos, 30000);
+            if (window.EventSource) {
+                escucharEventos();
+            } else {
+                // Navegadores sin EventSource: actualizar cada 30 segundos
+                setInterval(actualizarDatos, 30000);
+            }
         });
     </script>
 </body>
@@ -488,7 +575,6 @@ def admin_panel():
 def debug():
     """Ruta de diagnóstico - VERSIÓN CORREGIDA"""
     try:
-        excel_existe = os.path.exists(EXCEL_FILE)
         archivos = []
         try:
             if os.path.exists('.'):
@@ -502,20 +588,23 @@ def debug():
             'timestamp': datetime.now().isoformat(),
             'directorio': os.getcwd() if os.path.exists('.') else 'No accesible',
             'archivos_disponibles': archivos,
-            'excel_existe': excel_existe,
-            'excel_path': EXCEL_FILE if excel_existe else 'No existe'
+            'contactos_registrados': contact_store.version()[1]
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/descargar-excel', methods=['GET'])
 def api_descargar_excel():
-    """API para descargar archivo Excel"""
+    """API para descargar los contactos en Excel (se genera en el momento)"""
+    # Rango opcional: ?desde=AAAA-MM-DD&hasta=AAAA-MM-DD
     try:
-        if os.path.exists(EXCEL_FILE):
-            return send_file(EXCEL_FILE, as_attachment=True, download_name='contactos_dante_propiedades.xlsx')
-        else:
-            return jsonify({'error': 'Archivo no encontrado'}), 404
+        desde, hasta = parse_date_range(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        stream = contact_store.export_excel(COLUMNAS_EXCEL, since=desde, until=hasta)
+        return xlsx_response(stream, 'contactos_dante_propiedades.xlsx')
     except Exception as e:
         log_contacto(f"Error en descarga Excel: {str(e)}")
         return jsonify({'error': str(e)}), 500
@@ -540,25 +629,12 @@ def formulario():
 if __name__ == '__main__':
     print("🏢 Dante Propiedades - Servidor PARCHE CORREGIDO")
     print("=" * 60)
-    print(f"📁 Archivo Excel: {EXCEL_FILE}")
+    print(f"📁 Contactos: base de datos ({contact_store.count()} registrados)")
     print(f"📋 Archivo Log: {LOG_FILE}")
     print("🚀 Iniciando servidor...")
     
     log_contacto("🎉 Servidor iniciado correctamente con parche de 'Fecha'")
     
-    # Crear archivo Excel inicial si no existe
-    if not os.path.exists(EXCEL_FILE):
-        try:
-            df_inicial = pd.DataFrame(columns=[
-                'Fecha', 'Nombre', 'Email', 'Teléfono', 'Interés', 
-                'Presupuesto', 'Mensaje', 'Página_Origen', 'IP_Cliente', 'User_Agent'
-            ])
-            df_inicial.to_excel(EXCEL_FILE, index=False, engine='openpyxl')
-            print("📄 Archivo Excel inicializado")
-            log_contacto("📄 Archivo Excel creado inicialmente")
-        except Exception as e:
-            print(f"⚠️ Error inicializando Excel: {str(e)}")
-    
     # Configuración para Render (puerto dinámico)
     port = int(os.environ.get('PORT', 5000))
     print(f"🌐 Servidor corriendo en puerto: {port}")
@@ -571,6 +647,7 @@ if __name__ == '__main__':
     print("📡 APIs disponibles:")
     print("   POST /api/guardar-contacto - Guardar nuevo contacto")
     print("   GET  /api/estadisticas - Ver estadísticas (CORREGIDA)")
+    print("   GET  /api/eventos - Contactos nuevos en vivo para el panel (SSE)")
     print("   GET  /api/descargar-excel - Descargar archivo Excel")
     print("   GET  /debug - Diagnóstico del sistema (MEJORADO)")
     print("=" * 60)
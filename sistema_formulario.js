@@ -72,6 +72,8 @@ class FormStorageManager {
         const timestamp = new Date().toISOString();
         const registroCompleto = {
             ...datos,
+            // Mismo id en todos los reintentos: el servidor no lo guarda dos veces
+            id_envio: this._generarIdEnvio(),
             timestamp,
             pagina: window.location.href,
             userAgent: navigator.userAgent,
@@ -172,11 +174,14 @@ class FormStorageManager {
     }
     
     async _enviarAlServidor(datos) {
+        const headers = { 'Content-Type': 'application/json' };
+        if (datos.id_envio) {
+            headers['Idempotency-Key'] = datos.id_envio;
+        }
+        
         const response = await fetch(FormSystemConfig.serverEndpoints.save, {
             method: 'POST',
-            headers: {
-                'Content-Type': 'application/json',
-            },
+            headers,
             body: JSON.stringify(datos)
         });
         
@@ -187,6 +192,13 @@ class FormStorageManager {
         return await response.json();
     }
     
+    _generarIdEnvio() {
+        if (window.crypto && crypto.randomUUID) {
+            return crypto.randomUUID();
+        }
+        return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+    }
+    
     _agregarAColaSync(datos) {
         this.syncQueue.push(datos);
         console.log(`📋 Datos agregados a cola de sincronización. Total en cola: ${this.syncQueue.length}`);
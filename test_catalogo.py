@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Pruebas de las consultas del catálogo de main.py
+Dante Propiedades - Búsqueda por índices (filtros, rangos de precio y
+mayúsculas), orden y paginación, texto libre con BM25 y prefijos, y
+búsquedas por posición, sobre las propiedades de propiedades.json.
+
+    python -m pytest -q test_catalogo.py
+"""
+
+import itertools
+import json
+import os
+
+import pytest
+
+# Sin precompresión al importar main (la base de contactos la fija conftest.py)
+os.environ.setdefault('PRECOMPRESS_STATIC', '0')
+
+import main
+from catalogo import GRID_FIELDS, CatalogAggregates, CatalogSnapshot, PropertyCatalog, QueryCache
+
+REPO = os.path.dirname(os.path.abspath(__file__))
+
+# propiedades.json no trae coordenadas: se agregan para las búsquedas por posición
+COORDENADAS = {
+    'UF001': {'latitud': -34.6300, 'longitud': -58.4200},   # Boedo
+    'UF002': {'lat': '-34,6037', 'lng': '-58,3816'},        # Obelisco
+    'UF003': {'lat': -34.6050, 'lon': -58.3750},            # Microcentro
+    'UF004': {'latitud': -34.4587, 'longitud': -58.9142},   # Pilar
+}
+
+
+@pytest.fixture
+def catalogo(tmp_path, monkeypatch):
+    with open(os.path.join(REPO, 'propiedades.json'), encoding='utf-8') as f:
+        propiedades = json.load(f)
+    for propiedad in propiedades:
+        propiedad.update(COORDENADAS[propiedad['id_temporal']])
+
+    archivo = tmp_path / 'propiedades.json'
+    archivo.write_text(json.dumps(propiedades, ensure_ascii=False), encoding='utf-8')
+    monkeypatch.setattr(main, 'catalog', PropertyCatalog(str(archivo)))
+    return main.app.test_client(), propiedades
+
+
+def _ids(response):
+    assert response.status_code == 200, response.data
+    return [propiedad['id_temporal'] for propiedad in response.get_json()['properties']]
+
+
+def _buscar_lineal(propiedades, ope=None, tipo=None, loc=None, precio_max=None, ambientes=None):
+    """La búsqueda de antes de los índices: recorre todo el catálogo"""
+    resultados = []
+    for prop in propiedades:
+        if ope and prop.get('operacion') != ope:
+            continue
+        if tipo and prop.get('tipo') != tipo:
+            continue
+        if loc and prop.get('barrio', '').lower() != loc.lower():
+            continue
+        if precio_max:
+            try:
+                if float(prop.get('precio', 0)) > precio_max:
+                    continue
+            except (ValueError, TypeError):
+                continue
+        if ambientes:
+            try:
+                if int(prop.get('ambientes', 0)) < ambientes:
+                    continue
+            except (ValueError, TypeError):
+                continue
+        resultados.append(prop['id_temporal'])
+    return resultados
+
+
+@pytest.mark.parametrize('consulta, esperados', [
+    ('', ['UF001', 'UF002', 'UF003', 'UF004']),
+    ('cod=uf001', ['UF001']),
+    ('cod=UF9', []),
+    ('ope=ALQUILER', ['UF002', 'UF003', 'UF004']),
+    ('loc=microCENTRO', ['UF002', 'UF003']),
+    ('tipo=Oficina&ope=alquiler', ['UF003']),
+    ('precio_min=1000', ['UF002', 'UF003', 'UF004']),
+    ('precio_min=1000&precio_max=500000', ['UF002', 'UF004']),
+    ('precio_min=1200&precio_max=1200', ['UF004']),
+    ('precio_max=0', ['UF001', 'UF002', 'UF003', 'UF004']),
+    ('ambientes=6', ['UF003', 'UF004']),
+    ('ambientes=abc&precio_max=abc', ['UF001', 'UF002', 'UF003', 'UF004']),
+    ('ope=venta&loc=microcentro', []),
+])
+def test_filtros(catalogo, consulta, esperados):
+    client, _ = catalogo
+    assert _ids(client.get(f'/api/properties/search?{consulta}')) == esperados
+
+
+def test_filtros_como_la_busqueda_lineal(catalogo):
+    client, propiedades = catalogo
+    valores = {
+        'ope': [None, 'venta', 'alquiler'],
+        'tipo': [None, 'terreno', 'departamento', 'oficina', 'ph'],
+        'loc': [None, 'Microcentro', 'boedo', 'Pilar'],
+        'precio_max': [None, 1200, 400000, 1000000],
+        'ambientes': [None, 1, 6, 9],
+    }
+    for combinacion in itertools.product(*valores.values()):
+        filtros = {nombre: valor for nombre, valor in zip(valores, combinacion) if valor is not None}
+        response = client.get('/api/properties/search', query_string=filtros)
+        assert _ids(response) == _buscar_lineal(propiedades, **filtros), filtros
+
+
+@pytest.mark.parametrize('consulta, esperados', [
+    ('sort=precio', ['UF001', 'UF004', 'UF002', 'UF003']),
+    ('sort=-precio', ['UF003', 'UF002', 'UF004', 'UF001']),
+    ('sort=-ambientes', ['UF004', 'UF003', 'UF002', 'UF001']),
+    ('sort=-metros_cuadrados&limit=2&offset=1', ['UF004', 'UF003']),
+    ('sort=precio&offset=3', ['UF003']),
+    ('offset=10', []),
+])
+def test_orden_y_paginacion(catalogo, consulta, esperados):
+    client, _ = catalogo
+    assert _ids(client.get(f'/api/properties?{consulta}')) == esperados
+    assert _ids(client.get(f'/api/properties/search?{consulta}')) == esperados
+
+
+def test_datos_de_paginacion(catalogo):
+    client, _ = catalogo
+    pagina = client.get('/api/properties?sort=-metros_cuadrados&limit=2&offset=1').get_json()
+    assert (pagina['total'], pagina['offset'], pagina['limit'], pagina['next_offset']) == (4, 1, 2, 3)
+
+    ultima = client.get('/api/properties?limit=2&offset=2').get_json()
+    assert ultima['next_offset'] is None
+
+    # Sin limit ni offset la respuesta no cambia de forma
+    assert set(client.get('/api/properties').get_json()) == {'total', 'properties'}
+
+    assert client.get('/api/properties?sort=fecha').status_code == 400
+
+
+def test_campos(catalogo):
+    client, _ = catalogo
+    propiedades = client.get('/api/properties?fields=id_temporal,precio').get_json()['properties']
+    assert propiedades == [{'id_temporal': 'UF001', 'precio': 0}, {'id_temporal': 'UF002', 'precio': 400000},
+                           {'id_temporal': 'UF003', 'precio': 660000}, {'id_temporal': 'UF004', 'precio': 1200}]
+
+    grilla = client.get('/api/properties/search?fields=grid&cod=UF002').get_json()['properties']
+    assert set(grilla[0]) == set(GRID_FIELDS)
+
+
+@pytest.mark.parametrize('q, esperados', [
+    ('micro', ['UF002', 'UF003']),
+    ('MONO', ['UF002']),
+    ('superlumin', ['UF003']),
+    ('pileta', ['UF004', 'UF003']),
+    ('terreno pileta', ['UF004']),
+    ('jardin', ['UF003']),
+    ('conservación', ['UF001']),
+    # Con menos de 3 letras solo cuentan las palabras completas
+    ('su', []),
+    ('km', ['UF004']),
+    ('pileta obelisco', []),
+    ('¿?', ['UF001', 'UF002', 'UF003', 'UF004']),
+])
+def test_texto_libre(catalogo, q, esperados):
+    client, _ = catalogo
+    assert _ids(client.get('/api/properties/search', query_string={'q': q})) == esperados
+
+
+def test_texto_libre_con_filtros_y_orden(catalogo):
+    client, _ = catalogo
+    consulta = {'q': 'pileta', 'sort': '-precio'}
+    assert _ids(client.get('/api/properties/search', query_string=consulta)) == ['UF003', 'UF004']
+    consulta = {'q': 'excelente', 'ope': 'alquiler'}
+    assert _ids(client.get('/api/properties/search', query_string=consulta)) == ['UF002']
+
+
+def test_cerca(catalogo):
+    client, _ = catalogo
+    respuesta = client.get('/api/properties/near?lat=-34.6037&lon=-58.3816&radius_km=2')
+    assert _ids(respuesta) == ['UF002', 'UF003']
+    distancias = [propiedad['distancia_km'] for propiedad in respuesta.get_json()['properties']]
+    assert distancias[0] == 0 and 0.5 < distancias[1] < 0.8
+
+    assert _ids(client.get('/api/properties/near?lat=-34.6037&lon=-58.3816&radius_km=10')) == \
+        ['UF002', 'UF003', 'UF001']
+    # El radio se limita a MAX_RADIUS_KM: Pilar queda a más de 50 km
+    respuesta = client.get('/api/properties/near?lat=-34.6037&lon=-58.3816&radius_km=500')
+    assert _ids(respuesta) == ['UF002', 'UF003', 'UF001']
+    assert respuesta.get_json()['radius_km'] == main.MAX_RADIUS_KM
+
+    pagina = client.get('/api/properties/near?lat=-34.6037&lon=-58.3816&radius_km=10&limit=1&offset=1'
+                        '&fields=id_temporal')
+    assert pagina.get_json()['properties'] == [{'id_temporal': 'UF003', 'distancia_km': pytest.approx(0.63, abs=0.05)}]
+
+    assert client.get('/api/properties/near?lat=-95&lon=-58').status_code == 400
+    assert client.get('/api/properties/near?lon=-58').status_code == 400
+
+
+def test_rectangulo(catalogo):
+    client, _ = catalogo
+    consulta = '/api/properties/within?min_lat=-34.64&min_lon=-58.43&max_lat=-34.60&max_lon=-58.37'
+    # Ordenadas por distancia al centro del rectángulo (-34.62, -58.40)
+    assert _ids(client.get(consulta)) == ['UF001', 'UF002', 'UF003']
+
+    consulta = '/api/properties/within?min_lat=-34.7&min_lon=-59&max_lat=-34.4&max_lon=-58.8'
+    assert _ids(client.get(consulta)) == ['UF004']
+
+    consulta = '/api/properties/within?min_lat=-34.60&min_lon=-58.43&max_lat=-34.64&max_lon=-58.37'
+    assert client.get(consulta).status_code == 400
+
+
+def test_error_de_busqueda_no_se_guarda(catalogo, monkeypatch):
+    client, _ = catalogo
+    monkeypatch.setattr(main, 'search_cache', QueryCache())
+
+    def falla(self, **kwargs):
+        raise RuntimeError('índice roto')
+
+    with monkeypatch.context() as parche:
+        parche.setattr(CatalogSnapshot, 'search', falla)
+        respuesta = client.get('/api/properties/search?ope=venta')
+        assert respuesta.status_code == 500
+        assert 'error' in respuesta.get_json()
+    assert main.search_cache.stats()['entries'] == 0
+
+    # Arreglado el error, la misma consulta responde y recién ahí se guarda
+    assert _ids(client.get('/api/properties/search?ope=venta')) == ['UF001']
+    assert main.search_cache.stats()['entries'] == 1
+
+
+def test_cache_de_consultas():
+    cache = QueryCache(max_entries=2)
+    assert cache.get('v1', 'a') is None
+    cache.put('v1', 'a', 'A')
+    cache.put('v1', 'b', 'B')
+    assert cache.get('v1', 'a') == 'A'
+
+    # Lleno: sale el usado hace más tiempo ('b', porque 'a' se acaba de leer)
+    cache.put('v1', 'c', 'C')
+    assert cache.get('v1', 'b') is None
+    assert (cache.get('v1', 'a'), cache.get('v1', 'c')) == ('A', 'C')
+
+    # Otra versión del catálogo descarta todo lo anterior
+    assert cache.get('v2', 'a') is None
+    estadisticas = cache.stats()
+    assert (estadisticas['version'], estadisticas['entries']) == ('v2', 0)
+    assert (estadisticas['hits'], estadisticas['misses'], estadisticas['evictions']) == (3, 3, 1)
+    assert estadisticas['hit_ratio'] == 0.5
+
+
+def test_busqueda_repetida_sale_del_cache(catalogo, monkeypatch):
+    client, _ = catalogo
+    monkeypatch.setattr(main, 'search_cache', QueryCache())
+    llamadas = []
+    buscar = main.search_properties
+
+    def contar(*args, **kwargs):
+        llamadas.append(args)
+        return buscar(*args, **kwargs)
+
+    monkeypatch.setattr(main, 'search_properties', contar)
+
+    primera = client.get('/api/properties/search?ope=Alquiler&loc=microcentro')
+    # Los mismos filtros escritos de otra forma son la misma consulta
+    segunda = client.get('/api/properties/search?loc=MicroCentro&ope=alquiler&precio_max=abc')
+    assert len(llamadas) == 1
+    assert primera.get_json()['properties'] == segunda.get_json()['properties']
+    assert client.get('/api/cache/search').get_json()['hits'] == 1
+
+    client.get('/api/properties/search?ope=alquiler&loc=microcentro&limit=1')
+    assert len(llamadas) == 2
+
+
+def _reescribir(archivo, contenido, paso):
+    # mtime explícito: dos escrituras seguidas pueden caer en el mismo instante
+    archivo.write_text(contenido, encoding='utf-8')
+    os.utime(archivo, ns=(paso * 10**9, (1700000000 + paso) * 10**9))
+
+
+def test_recarga_del_archivo(catalogo, tmp_path):
+    client, propiedades = catalogo
+    archivo = tmp_path / 'propiedades.json'
+    main.catalog.check_interval = 0
+
+    primera = client.get('/api/properties/stats')
+    assert primera.get_json() == CatalogAggregates(propiedades).stats()
+
+    # Una modificada, una quitada y una nueva: los conteos se ajustan con la
+    # diferencia y tienen que dar lo mismo que recalcularlos desde cero
+    nuevas = [dict(p) for p in propiedades if p['id_temporal'] != 'UF004']
+    nuevas[1]['barrio'] = 'Palermo'
+    nuevas.append({**propiedades[0], 'id_temporal': 'UF005', 'tipo': 'Casa', 'operacion': 'Alquiler'})
+    _reescribir(archivo, json.dumps(nuevas, ensure_ascii=False), 1)
+
+    segunda = client.get('/api/properties/stats', headers={'If-None-Match': primera.headers['ETag']})
+    assert segunda.status_code == 200
+    assert segunda.headers['ETag'] != primera.headers['ETag']
+    assert segunda.get_json() == CatalogAggregates(nuevas).stats()
+    assert client.get('/api/properties/filter-options').get_json() == CatalogAggregates(nuevas).filter_options()
+    assert _ids(client.get('/api/properties')) == ['UF001', 'UF002', 'UF003', 'UF005']
+
+    # JSON roto a mitad de una escritura: se sigue sirviendo la última versión válida
+    _reescribir(archivo, '[{"id_temporal": "UF00', 2)
+    assert client.get('/api/properties/stats', headers={'If-None-Match': segunda.headers['ETag']}).status_code == 304
+    assert _ids(client.get('/api/properties')) == ['UF001', 'UF002', 'UF003', 'UF005']
+
+    # Arreglado el archivo, la versión vuelve a cambiar. Sale del contenido:
+    # el catálogo original vuelve a tener el ETag del principio
+    _reescribir(archivo, json.dumps(propiedades, ensure_ascii=False), 3)
+    tercera = client.get('/api/properties/stats')
+    assert tercera.headers['ETag'] == primera.headers['ETag']
+    assert tercera.get_json() == CatalogAggregates(propiedades).stats()
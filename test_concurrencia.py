@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Prueba de concurrencia del almacenamiento de contactos
+Dante Propiedades - Varios procesos (como los workers de gunicorn)
+escribiendo a la vez en la misma base no deben perder contactos.
+
+Se puede correr con pytest o directamente:
+
+    python test_concurrencia.py
+"""
+
+import multiprocessing
+import os
+import sqlite3
+import sys
+import tempfile
+from pathlib import Path
+
+from openpyxl import Workbook
+
+PROCESOS = 6
+CONTACTOS_POR_PROCESO = 20
+
+REPO = os.path.dirname(os.path.abspath(__file__))
+
+
+def _preparar(directorio):
+    os.chdir(directorio)
+    if REPO not in sys.path:
+        sys.path.insert(0, REPO)
+    os.environ['PRECOMPRESS_STATIC'] = '0'
+    # La base de contactos de cada prueba, aunque el proceso padre tenga otra
+    os.environ['CONTACTS_DATABASE_URL'] = 'sqlite:///./data/contactos.db'
+
+
+def _trabajador_main(directorio, proceso, cantidad):
+    _preparar(directorio)
+    import main
+    client = main.app.test_client()
+    for i in range(cantidad):
+        response = client.post('/api/guardar_contacto', json={
+            'nombre': f'P{proceso}-{i}',
+            'email': f'p{proceso}.{i}@ejemplo.com',
+            'telefono': '11-1234-5678',
+            'propiedad_interes': 'UF001'
+        })
+        assert response.status_code == 200, response.data
+
+
+def _trabajador_servidor_excel(directorio, proceso, cantidad):
+    _preparar(directorio)
+    import servidor_excel
+    client = servidor_excel.app.test_client()
+    for i in range(cantidad):
+        response = client.post('/api/guardar-contacto', json={
+            'nombre': f'P{proceso}-{i}',
+            'email': f'p{proceso}.{i}@ejemplo.com',
+            'mensaje': 'Prueba de concurrencia'
+        })
+        assert response.status_code == 200, response.data
+
+
+def _trabajador_contactos(directorio, proceso, cantidad):
+    _preparar(directorio)
+    import servidor_contactos
+    client = servidor_contactos.app.test_client()
+    for i in range(cantidad):
+        response = client.post('/guardar_contacto', json={
+            'nombre': f'P{proceso}-{i}',
+            'telefono': '11-1234-5678'
+        })
+        assert response.status_code == 200, response.data
+
+
+def _trabajador_storage_manager(directorio, proceso, cantidad):
+    _preparar(directorio)
+    from almacenamiento import ExcelStorageManager
+    storage = ExcelStorageManager(os.path.join(directorio, 'data'))
+    for i in range(cantidad):
+        resultado = storage.añadir_consulta({
+            'nombre': f'P{proceso}-{i}',
+            'email': f'p{proceso}.{i}@ejemplo.com',
+            'mensaje': 'Prueba de concurrencia'
+        })
+        assert resultado['success'], resultado
+
+
+def _martillar(trabajador, directorio, procesos=PROCESOS, cantidad=CONTACTOS_POR_PROCESO):
+    """Corre `trabajador` en varios procesos a la vez y exige que todos terminen bien"""
+    contexto = multiprocessing.get_context('spawn')
+    hijos = [contexto.Process(target=trabajador, args=(directorio, p, cantidad))
+             for p in range(procesos)]
+    for hijo in hijos:
+        hijo.start()
+    for hijo in hijos:
+        hijo.join(timeout=300)
+    assert all(hijo.exitcode == 0 for hijo in hijos), [hijo.exitcode for hijo in hijos]
+    return {f'P{p}-{i}' for p in range(procesos) for i in range(cantidad)}
+
+
+def _nombres_guardados(directorio):
+    conexion = sqlite3.connect(os.path.join(directorio, 'data', 'contactos.db'))
+    try:
+        return [fila[0] for fila in conexion.execute('SELECT name FROM contacts')]
+    finally:
+        conexion.close()
+
+
+def _sin_perdidas(nombres, esperados):
+    assert len(nombres) == len(esperados), f"{len(nombres)} contactos, se esperaban {len(esperados)}"
+    assert set(nombres) == esperados
+
+
+def test_main(tmp_path):
+    esperados = _martillar(_trabajador_main, str(tmp_path))
+    _sin_perdidas(_nombres_guardados(tmp_path), esperados)
+
+
+def test_servidor_excel(tmp_path):
+    esperados = _martillar(_trabajador_servidor_excel, str(tmp_path))
+    _sin_perdidas(_nombres_guardados(tmp_path), esperados)
+
+
+def test_servidor_contactos_importa_excel_una_vez(tmp_path):
+    # Excel de una versión anterior: cada proceso intenta importarlo al arrancar
+    wb = Workbook()
+    wb.active.append(['Fecha/Hora', 'Nombre', 'Firma', 'Teléfono', 'Propiedad'])
+    anteriores = {f'Anterior-{i}' for i in range(10)}
+    for nombre in sorted(anteriores):
+        wb.active.append(['2024-01-01 10:00:00', nombre, '-', '11-1234-5678', 'UF001'])
+    wb.save(tmp_path / 'contactos_dante_propiedades.xlsx')
+    
+    esperados = _martillar(_trabajador_contactos, str(tmp_path))
+    _sin_perdidas(_nombres_guardados(tmp_path), esperados | anteriores)
+
+
+def test_excel_storage_manager(tmp_path):
+    esperados = _martillar(_trabajador_storage_manager, str(tmp_path), procesos=4, cantidad=10)
+    _sin_perdidas(_nombres_guardados(tmp_path), esperados)
+    
+    # Los contadores de estadísticas se actualizan en la misma transacción
+    conexion = sqlite3.connect(os.path.join(tmp_path, 'data', 'contactos.db'))
+    try:
+        total, = conexion.execute("SELECT count FROM contact_stats WHERE metric = 'total'").fetchone()
+    finally:
+        conexion.close()
+    assert total == len(esperados)
+
+
+def main():
+    print("🧪 PRUEBA DE CONCURRENCIA - ALMACENAMIENTO DE CONTACTOS")
+    print("=" * 60)
+    pruebas = [test_main, test_servidor_excel, test_servidor_contactos_importa_excel_una_vez,
+               test_excel_storage_manager]
+    fallidas = 0
+    for prueba in pruebas:
+        directorio_original = os.getcwd()
+        with tempfile.TemporaryDirectory() as directorio:
+            try:
+                prueba(Path(directorio))
+                print(f"✅ {prueba.__name__}")
+            except AssertionError as e:
+                fallidas += 1
+                print(f"❌ {prueba.__name__}: {e}")
+            finally:
+                os.chdir(directorio_original)
+    print("=" * 60)
+    return fallidas == 0
+
+
+if __name__ == '__main__':
+    sys.exit(0 if main() else 1)
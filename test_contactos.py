@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Pruebas de ContactStore (almacenamiento.py)
+Dante Propiedades - Páginas por cursor sobre contact_id y lo que se mantiene
+junto con cada alta en contact_stats, sobre una base propia por prueba.
+
+    python -m pytest -q test_contactos.py
+"""
+
+import importlib
+import io
+import os
+from datetime import datetime, timedelta
+
+import openpyxl
+import pytest
+from sqlalchemy import delete, insert
+
+from almacenamiento import (ExcelStorageManager, bucket_range, bucket_value, created, parse_date_range,
+                            xlsx_response)
+from database import Contact, ContactStat
+from test_respaldos import _store
+
+LUNES = datetime(2025, 1, 6, 9, 0, 0)
+
+
+def _ids(contactos):
+    return [contacto['contact_id'] for contacto in contactos]
+
+
+@pytest.fixture
+def store(tmp_path):
+    return _store(tmp_path, 'contactos')
+
+
+def _agregar(store, cantidad, fecha=LUNES, paso=timedelta(minutes=1), **campos):
+    return [store.add(created_at=fecha + i * paso, name=f'Contacto {i}', **campos) for i in range(cantidad)]
+
+
+def test_paginas_por_cursor(store):
+    assert store.page(5) == ([], 0)
+    _agregar(store, 12)
+
+    pagina, total = store.page(5)
+    assert (_ids(pagina), total) == ([12, 11, 10, 9, 8], 12)
+    # Siguiendo el cursor `before` se recorren todos, sin repetir ni saltear
+    assert _ids(store.page(5, before=8)[0]) == [7, 6, 5, 4, 3]
+    assert _ids(store.page(5, before=3)[0]) == [2, 1]
+    assert _ids(store.page(5, before=1)[0]) == []
+
+    # `after`: los más próximos a ese id, también del más nuevo al más viejo
+    assert _ids(store.page(5, after=10)[0]) == [12, 11]
+    assert _ids(store.page(3, after=2)[0]) == [5, 4, 3]
+    assert _ids(store.page(3, after=2, before=5)[0]) == [4, 3]
+    assert _ids(store.page(5, after=12)[0]) == []
+
+    # Cursores fuera de rango
+    assert _ids(store.page(2, before=100)[0]) == [12, 11]
+    assert _ids(store.page(2, before=0)[0]) == []
+    assert _ids(store.page(2, after=-5)[0]) == [2, 1]
+
+
+@pytest.mark.parametrize('args, esperado', [
+    ({}, (None, None)),
+    ({'desde': '2025-01-06'}, (datetime(2025, 1, 6), None)),
+    # Una fecha sola en `hasta` incluye todo ese día
+    ({'hasta': '2025-01-06'}, (None, datetime(2025, 1, 7))),
+    ({'desde': '2025-01-06', 'hasta': '2025-01-06'}, (datetime(2025, 1, 6), datetime(2025, 1, 7))),
+    ({'desde': '2025-01-06T09:30', 'hasta': '2025-01-06 18:00:00'},
+     (datetime(2025, 1, 6, 9, 30), datetime(2025, 1, 6, 18))),
+    ({'desde': '  ', 'hasta': ''}, (None, None)),
+])
+def test_rango_de_fechas(args, esperado):
+    assert parse_date_range(args) == esperado
+
+
+@pytest.mark.parametrize('args', [
+    {'desde': '06/01/2025'}, {'hasta': 'ayer'}, {'desde': '2025-02-30'},
+    {'desde': '2025-01-07', 'hasta': '2025-01-06'},
+    {'desde': '2025-01-06T10:00', 'hasta': '2025-01-06T10:00'},
+])
+def test_rango_de_fechas_invalido(args):
+    with pytest.raises(ValueError):
+        parse_date_range(args)
+
+
+def test_exportacion_excel(store):
+    _agregar(store, 3, paso=timedelta(days=1), email='ana@ejemplo.com')
+    columnas = {'Fecha': created('%d/%m/%Y'), 'Nombre': 'name', 'Email': 'email', 'Teléfono': 'phone'}
+
+    stream = store.export_excel(columnas, since=LUNES + timedelta(days=1))
+    response = xlsx_response(stream, 'contactos.xlsx')
+    assert response.headers['Content-Disposition'] == 'attachment; filename="contactos.xlsx"'
+    assert int(response.headers['Content-Length']) == os.path.getsize(stream.path)
+
+    contenido = b''.join(response.response)
+    hoja = openpyxl.load_workbook(io.BytesIO(contenido)).active
+    assert list(hoja.values) == [('Fecha', 'Nombre', 'Email', 'Teléfono'),
+                                 ('07/01/2025', 'Contacto 1', 'ana@ejemplo.com', None),
+                                 ('08/01/2025', 'Contacto 2', 'ana@ejemplo.com', None)]
+
+    # El servidor cierra la respuesta al terminar (o si el cliente corta): se borra el temporal
+    response.close()
+    assert not os.path.exists(stream.path)
+
+
+def test_contadores_acumulados(tmp_path, store):
+    _agregar(store, 3, interest='Compra', budget='100k')
+    _agregar(store, 2, interest='Alquiler', budget='')
+    store.add(created_at=LUNES, name='Sin datos')
+    stats = store.stats()
+    assert (stats['total'], stats['interest'], stats['budget']) == (6, {'Compra': 3, 'Alquiler': 2}, {'100k': 3})
+
+    # Al abrir la base otra vez los contadores coinciden: no se recalculan
+    assert _store(tmp_path, 'contactos').stats() == stats
+
+    # Recalculados desde cero (tabla vacía o filas cargadas por fuera) dan lo mismo
+    with store.session_factory() as session:
+        session.execute(delete(ContactStat))
+        session.commit()
+    assert _store(tmp_path, 'contactos').stats() == stats
+    with store.session_factory() as session:
+        session.execute(insert(Contact).values(created_at=LUNES, name='Importado', interest='Compra'))
+        session.commit()
+    stats = _store(tmp_path, 'contactos').stats()
+    assert (stats['total'], stats['interest']['Compra']) == (7, 4)
+
+
+def test_hoja_de_estadisticas(tmp_path, store, monkeypatch):
+    gestor = ExcelStorageManager(str(tmp_path / 'data'))
+    monkeypatch.setattr(gestor, 'store', store)
+    ahora = datetime.now()
+    _agregar(store, 2, fecha=ahora - timedelta(days=10), interest='Compra', budget='100k')
+    _agregar(store, 3, fecha=ahora - timedelta(minutes=5), paso=timedelta(seconds=1),
+             interest='Alquiler', budget='100k')
+
+    estadisticas = dict(gestor._generar_estadisticas())
+    assert estadisticas == {
+        'Total Consultas': 5,
+        'Consultas Hoy': store.count_today(),
+        'Interés Más Común': {'Alquiler': 3},
+        'Presupuesto Más Común': {'100k': 5},
+        'Última Consulta': ahora.strftime('%d/%m/%Y'),
+        'Consultas Esta Semana': 3,
+    }
+
+    stream = gestor.exportar_excel()
+    try:
+        hojas = openpyxl.load_workbook(io.BytesIO(b''.join(stream)))
+    finally:
+        stream.close()
+    assert hojas.sheetnames == ['Consultas', 'Estadísticas']
+    assert ('Total Consultas', '5') in list(hojas['Estadísticas'].values)
+
+
+def _anchos(stream):
+    try:
+        hoja = openpyxl.load_workbook(io.BytesIO(b''.join(stream))).active
+    finally:
+        stream.close()
+    # xlsxwriter suma el margen de la celda (0,71) al ancho pedido
+    return [int(columna.width) for columna in hoja.column_dimensions.values()]
+
+
+def test_anchos_de_columna(tmp_path, store):
+    store.add(created_at=LUNES, name='Ana', email='ana@ejemplo.com')
+    store.add(created_at=LUNES, name='Bartolomé Mitre', phone='')
+    store.add(created_at=LUNES, name='Beto')
+    anchos = {'name': 15, 'email': 15}
+    assert store.field_widths() == anchos
+    assert _store(tmp_path, 'contactos').field_widths() == anchos
+
+    # Otro proceso guarda un valor más largo: el máximo es el de la base, no el
+    # que este store conocía
+    otro = _store(tmp_path, 'contactos')
+    otro.add(created_at=LUNES, name='N' * 20)
+    store.add(created_at=LUNES, name='N' * 17)
+    assert store.field_widths()['name'] == 20
+
+    with store.session_factory() as session:
+        session.execute(delete(ContactStat))
+        session.commit()
+    assert _store(tmp_path, 'contactos').field_widths() == {'name': 20, 'email': 15}
+
+    # Las columnas de campos usan esos anchos; las calculadas se miden al escribir
+    columnas = {'Nombre': 'name', 'Fecha': created('%d/%m/%Y'), 'Teléfono': 'phone'}
+    assert _anchos(store.export_excel(columnas)) == [22, 12, 10]
+    store.add(created_at=LUNES, name='N' * 80)
+    assert _anchos(store.export_excel(columnas))[0] == 50
+
+
+def test_ultimos_contactos(tmp_path):
+    store = _store(tmp_path, 'contactos', recent_size=5)
+    assert (store.recent(3), store.last()) == ([], None)
+    _agregar(store, 3)
+    assert _ids(store.recent(2)) == [2, 3]
+    assert store.recent(0) == []
+
+    # Los guardados por otro proceso también llegan al buffer
+    otro = _store(tmp_path, 'contactos')
+    otro.add(created_at=LUNES, name='De otro proceso')
+    assert _ids(store.recent(5)) == [1, 2, 3, 4]
+    assert store.last()['name'] == 'De otro proceso'
+
+    # Nunca guarda más de recent_size, aunque lleguen más juntos
+    _agregar(otro, 8)
+    assert _ids(store.recent(5)) == [8, 9, 10, 11, 12]
+    assert len(store._recent) == 5
+    # Más de los que entran en el buffer: se leen de la base
+    assert _ids(store.recent(7)) == [6, 7, 8, 9, 10, 11, 12]
+
+
+def test_consultas_recientes_del_gestor(tmp_path, store, monkeypatch):
+    gestor = ExcelStorageManager(str(tmp_path / 'data'))
+    monkeypatch.setattr(gestor, 'store', store)
+    _agregar(store, 4, email='ana@ejemplo.com', page='/contacto.html')
+
+    consultas = gestor.obtener_consultas(limite=2)
+    assert [c['Nombre'] for c in consultas] == ['Contacto 2', 'Contacto 3']
+    assert consultas[-1]['Fecha'] == '06/01/2025' and consultas[-1]['Página'] == '/contacto.html'
+    assert set(consultas[0]) == set(gestor.columnas)
+
+
+@pytest.mark.parametrize('granularidad, desde, hasta, esperado', [
+    ('day', None, None, (None, None)),
+    ('day', datetime(2025, 1, 6, 15), None, ('2025-01-06', None)),
+    # `hasta` es exclusiva: a las 00:00 en punto ese día queda afuera
+    ('day', None, datetime(2025, 1, 7), (None, '2025-01-07')),
+    ('day', None, datetime(2025, 1, 7, 0, 0, 1), (None, '2025-01-08')),
+    ('day', datetime(2025, 1, 31), datetime(2025, 2, 1), ('2025-01-31', '2025-02-01')),
+    ('hour', datetime(2025, 1, 6, 9, 59), datetime(2025, 1, 6, 11), ('2025-01-06 09', '2025-01-06 11')),
+    ('hour', None, datetime(2025, 1, 6, 23, 30), (None, '2025-01-07 00')),
+])
+def test_claves_de_periodo(granularidad, desde, hasta, esperado):
+    assert bucket_range(granularidad, desde, hasta) == esperado
+
+
+def test_contadores_por_periodo(store):
+    for fecha, interes in ((datetime(2025, 1, 6, 23, 59, 59), 'Compra'), (datetime(2025, 1, 7), 'Compra'),
+                           (datetime(2025, 1, 7, 0, 59), 'Alquiler'), (datetime(2025, 1, 7, 1), None)):
+        store.add(created_at=fecha, interest=interes)
+
+    assert store.rollup('day') == {'2025-01-06': 1, '2025-01-07': 3}
+    assert store.rollup('hour') == {'2025-01-06 23': 1, '2025-01-07 00': 2, '2025-01-07 01': 1}
+    assert store.rollup('day', since=datetime(2025, 1, 7), until=datetime(2025, 1, 8)) == {'2025-01-07': 3}
+    assert store.rollup('hour', since=datetime(2025, 1, 7, 0, 30), until=datetime(2025, 1, 7, 1)) == \
+        {'2025-01-07 00': 2}
+    assert store.rollup('day', by='interest') == {'2025-01-06': {'Compra': 1},
+                                                  '2025-01-07': {'Compra': 1, 'Alquiler': 1}}
+    with pytest.raises(ValueError):
+        store.rollup('hour', by='interest')
+
+
+@pytest.mark.parametrize('pagina, clave', [
+    ('https://dantepropiedades.com/contacto.html?utm_source=mail#formulario', '/contacto.html'),
+    ('https://dantepropiedades.com', '/'),
+    ('/propiedades.html?id=UF001', '/propiedades.html'),
+    ('Directo', 'Directo'),
+    ('http://[::1', 'http://[::1'),
+])
+def test_pagina_por_ruta(pagina, clave):
+    assert bucket_value('page', pagina) == clave
+    assert bucket_value('interest', pagina) == pagina
+
+
+def test_contadores_por_pagina(tmp_path, store):
+    # Cada visita trae otra consulta en el Referer: se cuentan juntas por ruta
+    for i in range(5):
+        store.add(created_at=LUNES, page=f'https://dantepropiedades.com/contacto.html?v={i}#form')
+    store.add(created_at=LUNES, page='Directo')
+    esperado = {'2025-01-06': {'/contacto.html': 5, 'Directo': 1}}
+    assert store.rollup('day', by='page') == esperado
+
+    # Bases que guardaron la URL entera se recalculan al abrirlas
+    with store.session_factory() as session:
+        session.execute(delete(ContactStat).where(ContactStat.metric == 'day:page'))
+        session.add(ContactStat(metric='day:page', key='2025-01-06|https://dantepropiedades.com/?v=1', count=6))
+        session.commit()
+    assert _store(tmp_path, 'contactos').rollup('day', by='page') == esperado
+
+
+@pytest.fixture
+def sistema(tmp_path, store, monkeypatch):
+    """Cliente de sistema_formulario.py sobre `store`"""
+    # Al importarse abre data/sistema-formularios.log y arma su gestor en
+    # data/: que sea en una carpeta temporal y no en el repositorio
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / 'data').mkdir()
+    sistema_formulario = importlib.import_module('sistema_formulario')
+    # Su hilo de respaldos usa una ruta relativa: fijarla fuera del repositorio
+    respaldos = sistema_formulario.storage_manager.respaldos
+    respaldos.backup_dir = os.path.abspath(respaldos.backup_dir)
+    monkeypatch.setattr(sistema_formulario.storage_manager, 'store', store)
+    return sistema_formulario.app.test_client()
+
+
+def test_estadisticas_por_periodo(sistema, store):
+    ahora = datetime.now().replace(minute=30)
+    store.add(created_at=ahora - timedelta(days=8), interest='Compra', page='/index.html')
+    store.add(created_at=ahora - timedelta(days=1), interest='Compra', page='https://x.com/index.html?a=1')
+    store.add(created_at=ahora, interest='Alquiler', page='https://x.com/index.html?a=2')
+    hoy, ayer = ahora.strftime('%Y-%m-%d'), (ahora - timedelta(days=1)).strftime('%Y-%m-%d')
+
+    # Sin rango: los últimos 7 días
+    respuesta = sistema.get('/api/estadisticas/periodo').get_json()
+    assert (respuesta['contactos'], respuesta['total']) == ({ayer: 1, hoy: 1}, 2)
+    assert respuesta['por_interes'] == {ayer: {'Compra': 1}, hoy: {'Alquiler': 1}}
+    assert respuesta['por_pagina'] == {ayer: {'/index.html': 1}, hoy: {'/index.html': 1}}
+
+    respuesta = sistema.get(f'/api/estadisticas/periodo?desde={hoy}&hasta={hoy}&por=hora').get_json()
+    assert respuesta['contactos'] == {ahora.strftime('%Y-%m-%d %H'): 1}
+    assert 'por_interes' not in respuesta
+
+    desde = (ahora - timedelta(days=30)).strftime('%Y-%m-%d')
+    assert sistema.get(f'/api/estadisticas/periodo?desde={desde}').get_json()['total'] == 3
+
+
+@pytest.mark.parametrize('consulta', ['por=semana', 'desde=ayer', 'desde=2025-01-07&hasta=2025-01-06'])
+def test_estadisticas_por_periodo_invalido(sistema, consulta):
+    respuesta = sistema.get(f'/api/estadisticas/periodo?{consulta}')
+    assert respuesta.status_code == 400
+    assert respuesta.get_json()['success'] is False
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Pruebas de los envíos repetidos del formulario
+Dante Propiedades - `idempotent()` y `SubmissionIndex` de almacenamiento.py:
+un reintento o doble click devuelve la respuesta guardada, los duplicados
+simultáneos esperan al primero y un envío que falló se puede reintentar.
+
+    python -m pytest -q test_envios.py
+"""
+
+import threading
+import time
+
+from flask import Flask, jsonify, request
+
+from almacenamiento import SubmissionIndex, idempotent
+
+CONTACTO = {'nombre': 'Ana', 'email': 'ana@ejemplo.com', 'mensaje': 'Hola'}
+
+
+class Formulario:
+    """App mínima con un endpoint protegido; `respuestas` decide qué contesta cada llamada"""
+
+    def __init__(self, index=None, respuestas=None):
+        self.app = Flask(__name__)
+        self.llamadas = 0
+        self.respuestas = list(respuestas or [])
+        self.liberar = None
+        index = index or SubmissionIndex()
+
+        @self.app.route('/guardar', methods=['POST'])
+        @idempotent(index)
+        def guardar():
+            self.llamadas += 1
+            numero = self.llamadas
+            if self.liberar is not None:
+                self.liberar.wait(5)
+            estado = self.respuestas.pop(0) if self.respuestas else 200
+            if estado == 'error':
+                raise RuntimeError('falla al guardar')
+            return jsonify({'success': estado < 300, 'llamada': numero, 'datos': request.get_json(silent=True)}), estado
+
+    def post(self, payload, **kwargs):
+        return self.app.test_client().post('/guardar', json=payload, **kwargs)
+
+
+def test_reintento_devuelve_la_misma_respuesta():
+    formulario = Formulario()
+    primera = formulario.post(CONTACTO)
+    segunda = formulario.post(CONTACTO)
+    assert formulario.llamadas == 1
+    assert (segunda.status_code, segunda.data) == (primera.status_code, primera.data)
+    assert segunda.mimetype == 'application/json'
+
+    # Los campos que cambian entre reintentos no cuentan para la huella
+    formulario.post({**CONTACTO, 'timestamp': '2025-01-01T10:00:00', 'online': True})
+    assert formulario.llamadas == 1
+
+    # Otro contenido es otro envío
+    formulario.post({**CONTACTO, 'mensaje': 'Otra consulta'})
+    assert formulario.llamadas == 2
+
+
+def test_misma_clave_de_envio():
+    formulario = Formulario()
+    formulario.post({**CONTACTO, 'id_envio': 'abc'})
+    # El cliente reintenta con la misma clave aunque haya cambiado un campo
+    repetido = formulario.post({**CONTACTO, 'mensaje': 'Hola!', 'id_envio': 'abc'})
+    assert formulario.llamadas == 1
+    assert repetido.get_json()['llamada'] == 1
+
+    formulario.post({'nombre': 'Beto'}, headers={'Idempotency-Key': 'k-1'})
+    formulario.post({'nombre': 'Carla'}, headers={'Idempotency-Key': 'k-1'})
+    assert formulario.llamadas == 2
+
+
+def test_duplicados_simultaneos_esperan_al_primero():
+    formulario = Formulario()
+    formulario.liberar = threading.Event()
+    respuestas = []
+
+    def enviar():
+        respuestas.append(formulario.post(CONTACTO))
+
+    hilos = [threading.Thread(target=enviar) for _ in range(5)]
+    for hilo in hilos:
+        hilo.start()
+    time.sleep(0.3)
+    # Uno solo está guardando; los demás esperan su respuesta
+    assert formulario.llamadas == 1
+    formulario.liberar.set()
+    for hilo in hilos:
+        hilo.join(10)
+
+    assert formulario.llamadas == 1
+    assert len(respuestas) == 5
+    assert {(r.status_code, r.data) for r in respuestas} == {(respuestas[0].status_code, respuestas[0].data)}
+
+
+def test_envio_fallido_se_olvida():
+    formulario = Formulario(respuestas=[500, 'error', 200])
+    assert formulario.post(CONTACTO).status_code == 500
+    assert formulario.post(CONTACTO).status_code == 500  # excepción en la vista
+    reintento = formulario.post(CONTACTO)
+    assert reintento.status_code == 200 and reintento.get_json()['llamada'] == 3
+
+    # Ya guardado: no se vuelve a llamar
+    assert formulario.post(CONTACTO).get_json()['llamada'] == 3
+    assert formulario.llamadas == 3
+
+
+def test_errores_de_validacion_no_se_recuerdan():
+    formulario = Formulario(respuestas=[400, 200])
+    assert formulario.post(CONTACTO).status_code == 400
+    assert formulario.post(CONTACTO).status_code == 200
+    assert formulario.llamadas == 2
+
+
+def test_duplicado_de_un_envio_que_falla_lo_reintenta():
+    formulario = Formulario(respuestas=[500, 200])
+    formulario.liberar = threading.Event()
+    respuestas = {}
+
+    def enviar(nombre):
+        respuestas[nombre] = formulario.post(CONTACTO)
+
+    primero = threading.Thread(target=enviar, args=('primero',))
+    primero.start()
+    time.sleep(0.2)
+    segundo = threading.Thread(target=enviar, args=('segundo',))
+    segundo.start()
+    time.sleep(0.2)
+    formulario.liberar.set()
+    primero.join(10)
+    segundo.join(10)
+
+    # El que esperaba no recibe el error ajeno: vuelve a intentar el guardado
+    assert respuestas['primero'].status_code == 500
+    assert respuestas['segundo'].status_code == 200
+    assert formulario.llamadas == 2
+
+
+def test_ventana_y_tamaño_del_indice():
+    formulario = Formulario(index=SubmissionIndex(window=0.2))
+    formulario.post(CONTACTO)
+    formulario.post(CONTACTO)
+    assert formulario.llamadas == 1
+    time.sleep(0.3)
+    formulario.post(CONTACTO)
+    assert formulario.llamadas == 2
+
+    # Cada envío ocupa dos claves (id y huella): con lugar para dos claves
+    # solo se recuerda el último
+    formulario = Formulario(index=SubmissionIndex(size=2))
+    formulario.post({**CONTACTO, 'id_envio': 'a'})
+    formulario.post({**CONTACTO, 'id_envio': 'b', 'mensaje': 'Otra'})
+    formulario.post({**CONTACTO, 'id_envio': 'b', 'mensaje': 'Otra'})
+    assert formulario.llamadas == 2
+    formulario.post({**CONTACTO, 'id_envio': 'a'})
+    assert formulario.llamadas == 3
+
+
+def test_sin_json_no_se_deduplica():
+    formulario = Formulario()
+    cliente = formulario.app.test_client()
+    cliente.post('/guardar', data='nombre=Ana', content_type='application/x-www-form-urlencoded')
+    cliente.post('/guardar', data='nombre=Ana', content_type='application/x-www-form-urlencoded')
+    assert formulario.llamadas == 2
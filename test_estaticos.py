@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Pruebas de los archivos estáticos de main.py
+Dante Propiedades - GET condicionales (304) de archivos y del catálogo,
+pedidos por rango (206) y variantes precomprimidas según Accept-Encoding,
+sobre un sitio de prueba en una carpeta temporal.
+
+    python -m pytest -q test_estaticos.py
+"""
+
+import gzip
+import os
+
+import pytest
+
+# Sin precompresión al importar main (la base de contactos la fija conftest.py)
+os.environ.setdefault('PRECOMPRESS_STATIC', '0')
+
+import main
+from precomprimir import STATIC_CACHE_DIR, precompress_static_files, prune_cache
+
+ESTILOS = 'body { color: #333; }\n' * 100
+
+
+@pytest.fixture
+def sitio(tmp_path, monkeypatch):
+    """Carpeta de trabajo con un .css y una página; main sirve desde ahí"""
+    (tmp_path / 'estilos.css').write_text(ESTILOS, encoding='utf-8')
+    (tmp_path / 'index.html').write_text('<h1>Dante Propiedades</h1>', encoding='utf-8')
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(main, 'COMPRESSED_VARIANTS', {})
+    return main.app.test_client()
+
+
+def test_archivo_no_modificado(sitio):
+    respuesta = sitio.get('/estilos.css')
+    assert respuesta.status_code == 200
+    assert respuesta.headers['Cache-Control'] == main.CACHE_CONTROL['assets']
+    etag, modificado = respuesta.headers['ETag'], respuesta.headers['Last-Modified']
+
+    repetida = sitio.get('/estilos.css', headers={'If-None-Match': etag})
+    assert (repetida.status_code, repetida.data) == (304, b'')
+    assert repetida.headers['ETag'] == etag
+    assert sitio.get('/estilos.css', headers={'If-Modified-Since': modificado}).status_code == 304
+
+    # Otro ETag: If-None-Match manda aunque la fecha coincida
+    otra = sitio.get('/estilos.css', headers={'If-None-Match': '"otro"', 'If-Modified-Since': modificado})
+    assert otra.status_code == 200
+    assert sitio.get('/estilos.css', headers={'If-Modified-Since': 'Mon, 01 Jan 2001 00:00:00 GMT'}).status_code == 200
+
+
+def test_archivo_cambiado_tiene_otro_etag(sitio, tmp_path, monkeypatch):
+    monkeypatch.setattr(main, 'STATIC_REVALIDATE_SECONDS', 0)
+    etag = sitio.get('/index.html').headers['ETag']
+    (tmp_path / 'index.html').write_text('<h1>Nueva portada</h1>', encoding='utf-8')
+
+    respuesta = sitio.get('/index.html', headers={'If-None-Match': etag})
+    assert respuesta.status_code == 200
+    assert respuesta.data == b'<h1>Nueva portada</h1>'
+    assert respuesta.headers['ETag'] != etag
+
+
+def test_catalogo_no_modificado(tmp_path, monkeypatch):
+    archivo = tmp_path / 'propiedades.json'
+    archivo.write_text('[{"id_temporal": "UF001", "precio": 100}]', encoding='utf-8')
+    monkeypatch.setattr(main, 'catalog', main.PropertyCatalog(str(archivo)))
+    client = main.app.test_client()
+
+    respuesta = client.get('/api/properties?limit=1')
+    assert respuesta.status_code == 200
+    etag = respuesta.headers['ETag']
+    assert respuesta.headers['Cache-Control'] == main.CACHE_CONTROL['api']
+
+    assert client.get('/api/properties?limit=1', headers={'If-None-Match': etag}).status_code == 304
+    modificado = respuesta.headers['Last-Modified']
+    assert client.get('/api/properties?limit=1', headers={'If-Modified-Since': modificado}).status_code == 304
+    # El ETag depende de la URL: otra consulta no lo acepta
+    assert client.get('/api/properties?limit=2', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_rango(sitio):
+    completo = sitio.get('/estilos.css')
+    assert completo.headers['Accept-Ranges'] == 'bytes'
+    assert completo.data == ESTILOS.encode()
+
+    parte = sitio.get('/estilos.css', headers={'Range': 'bytes=5-14'})
+    assert parte.status_code == 206
+    assert parte.data == ESTILOS.encode()[5:15]
+    assert parte.headers['Content-Range'] == f'bytes 5-14/{len(ESTILOS)}'
+
+    final = sitio.get('/estilos.css', headers={'Range': 'bytes=-3'})
+    assert (final.status_code, final.data) == (206, ESTILOS.encode()[-3:])
+
+    assert sitio.get('/estilos.css', headers={'Range': f'bytes={len(ESTILOS)}-'}).status_code == 416
+
+    # If-Range con un ETag viejo: el archivo completo
+    viejo = sitio.get('/estilos.css', headers={'Range': 'bytes=0-9', 'If-Range': '"viejo"'})
+    assert (viejo.status_code, viejo.data) == (200, ESTILOS.encode())
+    vigente = sitio.get('/estilos.css', headers={'Range': 'bytes=0-9', 'If-Range': completo.headers['ETag']})
+    assert vigente.status_code == 206
+
+
+@pytest.mark.parametrize('ruta', ['data/contactos.db', '.git/config', 'main.py', 'propiedades.json', 'no-existe.css'])
+def test_archivos_que_no_se_sirven(sitio, tmp_path, ruta):
+    archivo = tmp_path / ruta
+    archivo.parent.mkdir(parents=True, exist_ok=True)
+    if ruta != 'no-existe.css':
+        archivo.write_text('privado', encoding='utf-8')
+    assert sitio.get(f'/{ruta}').status_code == 404
+
+
+def test_variante_comprimida(sitio, tmp_path, monkeypatch):
+    variantes = precompress_static_files(str(tmp_path))
+    monkeypatch.setattr(main, 'COMPRESSED_VARIANTS', variantes)
+    # Solo estilos.css: index.html es más chico que MIN_SIZE
+    assert len(variantes) == 1
+
+    comprimida = sitio.get('/estilos.css', headers={'Accept-Encoding': 'gzip, deflate'})
+    assert comprimida.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in comprimida.headers['Vary']
+    assert gzip.decompress(comprimida.data) == ESTILOS.encode()
+
+    # Sin gzip aceptado: el original, con otro ETag y el mismo Vary
+    original = sitio.get('/estilos.css', headers={'Accept-Encoding': 'identity'})
+    assert 'Content-Encoding' not in original.headers
+    assert original.data == ESTILOS.encode()
+    assert 'Accept-Encoding' in original.headers['Vary']
+    assert original.headers['ETag'] != comprimida.headers['ETag']
+
+    # El 304 es de la variante que tiene el navegador
+    etag = comprimida.headers['ETag']
+    assert sitio.get('/estilos.css', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag}).status_code == 304
+    assert sitio.get('/estilos.css', headers={'If-None-Match': etag}).status_code == 200
+
+    assert 'Vary' not in sitio.get('/index.html', headers={'Accept-Encoding': 'gzip'}).headers
+
+
+def test_brotli_antes_que_gzip(sitio, tmp_path, monkeypatch):
+    # Variante br armada a mano: brotli es opcional y puede no estar instalado
+    variantes = precompress_static_files(str(tmp_path))
+    (hash_estilos, rutas), = variantes.items()
+    rutas['br'] = str(tmp_path / STATIC_CACHE_DIR / f'{hash_estilos}.br')
+    with open(rutas['br'], 'wb') as f:
+        f.write(b'variante br')
+    monkeypatch.setattr(main, 'COMPRESSED_VARIANTS', variantes)
+
+    respuesta = sitio.get('/estilos.css', headers={'Accept-Encoding': 'gzip, br'})
+    assert (respuesta.headers['Content-Encoding'], respuesta.data) == ('br', b'variante br')
+    assert respuesta.headers['ETag'] == f'"{hash_estilos}-br"'
+    # La preferencia del navegador (q) manda sobre el orden del servidor
+    respuesta = sitio.get('/estilos.css', headers={'Accept-Encoding': 'br;q=0.5, gzip'})
+    assert respuesta.headers['Content-Encoding'] == 'gzip'
+
+
+def test_borra_variantes_obsoletas(tmp_path):
+    cache = tmp_path / 'cache'
+    cache.mkdir()
+    for nombre in ('vigente.gz', 'vigente.br', 'vieja.gz', 'vieja.br', 'vieja.gz.123.tmp', 'notas.txt'):
+        (cache / nombre).write_bytes(b'x')
+
+    assert prune_cache(str(cache), {'vigente'}) == 2
+    assert sorted(os.listdir(cache)) == ['notas.txt', 'vieja.gz.123.tmp', 'vigente.br', 'vigente.gz']
+    assert prune_cache(str(cache), {'vigente'}) == 0
+
+
+def test_precompresion_borra_la_version_anterior(tmp_path):
+    archivo = tmp_path / 'estilos.css'
+    archivo.write_text(ESTILOS, encoding='utf-8')
+    anterior, = precompress_static_files(str(tmp_path)).values()
+
+    archivo.write_text(ESTILOS + '/* v2 */\n', encoding='utf-8')
+    actual, = precompress_static_files(str(tmp_path)).values()
+    assert actual['gzip'] != anterior['gzip']
+    assert not os.path.exists(anterior['gzip'])
+    assert os.listdir(tmp_path / STATIC_CACHE_DIR) == [os.path.basename(actual['gzip'])]
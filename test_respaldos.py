@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Pruebas de los respaldos de contactos
+Dante Propiedades - Respaldo completo, incrementales, restauración sobre una
+base vacía, política de retención y el hilo que respalda en segundo plano.
+
+    python -m pytest -q test_respaldos.py
+"""
+
+import os
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from almacenamiento import ContactStore
+from database import create_contacts_engine
+from respaldos import (BackupWorker, apply_retention, create_backup, list_backups,
+                       restore, restore_chain, write_backup)
+
+LUNES = datetime(2025, 1, 6, 9, 0, 0)
+
+
+def _store(directorio, nombre, **kwargs):
+    """ContactStore sobre su propia base en `directorio`"""
+    engine = create_contacts_engine(f"sqlite:///{directorio / nombre}.db")
+    return ContactStore('respaldos', session_factory=sessionmaker(bind=engine), **kwargs)
+
+
+def _agregar(store, desde, hasta, fecha=LUNES):
+    for i in range(desde, hasta):
+        store.add(created_at=fecha + timedelta(minutes=i), name=f'Contacto {i}',
+                  email=f'c{i}@ejemplo.com', interest='Compra' if i % 2 else 'Alquiler')
+
+
+def _sin_source(contactos):
+    return [{k: v for k, v in contacto.items() if k != 'source'} for contacto in contactos]
+
+
+def test_completo_incrementales_y_restauracion(tmp_path):
+    respaldos = tmp_path / 'respaldos'
+    origen = _store(tmp_path, 'origen')
+
+    _agregar(origen, 0, 5)
+    completo = create_backup(origen, respaldos, now=LUNES)
+    assert (completo.kind, completo.first_id, completo.last_id) == ('completo', 1, 5)
+
+    # Mismo día: solo los contactos nuevos
+    _agregar(origen, 5, 8)
+    primero = create_backup(origen, respaldos, now=LUNES + timedelta(hours=1))
+    assert (primero.kind, primero.first_id, primero.last_id) == ('incremental', 6, 8)
+    assert create_backup(origen, respaldos, now=LUNES + timedelta(hours=2)) is None
+
+    _agregar(origen, 8, 10)
+    segundo = create_backup(origen, respaldos, now=LUNES + timedelta(hours=3))
+    assert (segundo.kind, segundo.first_id, segundo.last_id) == ('incremental', 9, 10)
+
+    assert [b.path for b in restore_chain(respaldos)] == [completo.path, primero.path, segundo.path]
+
+    destino = _store(tmp_path, 'destino')
+    assert restore(destino, respaldos) == 10
+    assert _sin_source(destino.contacts()) == _sin_source(origen.contacts())
+    assert destino.stats() == origen.stats()
+
+    # Solo sobre una base vacía
+    with pytest.raises(ValueError):
+        restore(destino, respaldos)
+
+
+def test_no_restaura_si_falta_un_incremental(tmp_path):
+    respaldos = tmp_path / 'respaldos'
+    origen = _store(tmp_path, 'origen')
+
+    _agregar(origen, 0, 5)
+    create_backup(origen, respaldos, now=LUNES)
+    for hora, (desde, hasta) in enumerate(((5, 8), (8, 10), (10, 12)), start=1):
+        _agregar(origen, desde, hasta)
+        create_backup(origen, respaldos, now=LUNES + timedelta(hours=hora))
+
+    medio = [b for b in list_backups(respaldos) if b.kind == 'incremental'][1]
+    assert (medio.first_id, medio.last_id) == (9, 10)
+    os.remove(medio.path)
+
+    with pytest.raises(ValueError, match='9 a 10'):
+        restore_chain(respaldos)
+    destino = _store(tmp_path, 'destino')
+    with pytest.raises(ValueError):
+        restore(destino, respaldos)
+    assert destino.count() == 0
+
+
+def test_primer_respaldo_de_cada_dia_es_completo(tmp_path):
+    respaldos = tmp_path / 'respaldos'
+    origen = _store(tmp_path, 'origen')
+
+    _agregar(origen, 0, 3)
+    create_backup(origen, respaldos, now=LUNES)
+    _agregar(origen, 3, 6)
+    martes = create_backup(origen, respaldos, now=LUNES + timedelta(days=1))
+    assert (martes.kind, martes.last_id) == ('completo', 6)
+    assert restore_chain(respaldos) == [martes]
+
+
+def test_retencion_por_dias_y_semanas(tmp_path):
+    # Del miércoles 1/1/2025 al lunes 20/1: dos completos por día (el de las
+    # 9 y el de las 18) y un incremental entre ellos
+    ultimo_id = 0
+    for dia in range(1, 21):
+        fecha = datetime(2025, 1, dia)
+        for hora, tipo in ((9, 'completo'), (12, 'incremental'), (18, 'completo')):
+            desde = 1 if tipo == 'completo' else ultimo_id + 1
+            ultimo_id += 5
+            contactos = [{'contact_id': i, 'created_at': fecha} for i in range(desde, ultimo_id + 1)]
+            write_backup(tmp_path, tipo, contactos, fecha.replace(hour=hora))
+
+    borrados = apply_retention(tmp_path, keep_daily=2, keep_weekly=3)
+
+    quedan = list_backups(tmp_path)
+    completos = [b.created for b in quedan if b.kind == 'completo']
+    # Últimos 2 días (19 y 20) y último completo de las 3 semanas más recientes
+    # (domingo 12, domingo 19 y lunes 20)
+    assert completos == [datetime(2025, 1, 12, 18), datetime(2025, 1, 19, 18), datetime(2025, 1, 20, 18)]
+    mas_viejo = min(b.last_id for b in quedan if b.kind == 'completo')
+    incrementales = [b for b in quedan if b.kind == 'incremental']
+    assert incrementales and all(b.last_id > mas_viejo for b in incrementales)
+    assert len(borrados) + len(quedan) == 60
+
+    # Aplicarla otra vez no borra nada más
+    assert apply_retention(tmp_path, keep_daily=2, keep_weekly=3) == []
+
+
+def test_worker_respalda_goteo_por_debajo_del_umbral(tmp_path):
+    # Avisos más seguidos que el intervalo: el plazo corre desde el último respaldo
+    respaldos = tmp_path / 'respaldos'
+    origen = _store(tmp_path, 'origen')
+    worker = BackupWorker(origen, respaldos, every=1000, interval=0.5)
+    for i in range(15):
+        _agregar(origen, i, i + 1, fecha=datetime.now())
+        worker.notify()
+        time.sleep(0.1)
+    time.sleep(0.6)
+
+    backups = list_backups(respaldos)
+    assert len(backups) >= 2
+    assert backups[-1].last_id == 15
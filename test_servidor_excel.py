@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Pruebas de los endpoints de servidor_excel.py
+Dante Propiedades - Lista de contactos paginada por cursores, sobre una base
+de contactos propia por prueba.
+
+    python -m pytest -q test_servidor_excel.py
+"""
+
+import io
+import json
+import os
+import uuid
+from datetime import datetime, timedelta
+
+import openpyxl
+import pytest
+
+import almacenamiento
+import servidor_excel
+from test_respaldos import _store
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    store = _store(tmp_path, 'contactos')
+    monkeypatch.setattr(servidor_excel, 'contact_store', store)
+    monkeypatch.setattr(servidor_excel, 'LOG_FILE', str(tmp_path / 'registro_contactos.log'))
+    return servidor_excel.app.test_client()
+
+
+def _guardar(client, cantidad):
+    # Mensajes distintos en cada llamada: los envíos repetidos no se guardan de nuevo
+    for i in range(cantidad):
+        response = client.post('/api/guardar-contacto', json={
+            'nombre': f'Contacto {i}', 'email': f'c{i}@ejemplo.com', 'mensaje': f'Consulta {uuid.uuid4()}'})
+        assert response.status_code == 200, response.data
+
+
+def _listar(client, **params):
+    response = client.get('/api/guardar-contacto', query_string=params)
+    assert response.status_code == 200, response.data
+    return response.get_json()
+
+
+def test_lista_paginada(client):
+    assert _listar(client)['contactos'] == []
+    _guardar(client, 7)
+
+    pagina = _listar(client, limit=3)
+    assert [c['nombre'] for c in pagina['contactos']] == ['Contacto 6', 'Contacto 5', 'Contacto 4']
+    assert (pagina['total'], pagina['before'], pagina['after']) == (7, 5, 7)
+
+    vistos = [c['id'] for c in pagina['contactos']]
+    while True:
+        pagina = _listar(client, limit=3, before=pagina['before'])
+        if not pagina['contactos']:
+            break
+        vistos.extend(c['id'] for c in pagina['contactos'])
+    assert vistos == [7, 6, 5, 4, 3, 2, 1]
+    # Página vacía: el cursor se mantiene
+    assert pagina['before'] == 1
+
+    # Nuevos desde el último visto
+    assert _listar(client, after=7)['contactos'] == []
+    _guardar(client, 1)
+    assert [c['id'] for c in _listar(client, after=7)['contactos']] == [8]
+
+
+def test_limite_maximo(client, monkeypatch):
+    monkeypatch.setattr(servidor_excel, 'LIMITE_MAXIMO', 2)
+    _guardar(client, 3)
+    assert len(_listar(client, limit=50)['contactos']) == 2
+
+
+@pytest.mark.parametrize('params', [
+    {'limit': 0}, {'limit': -1}, {'limit': 'abc'}, {'before': 'x'}, {'after': '1.5'},
+])
+def test_parametros_invalidos(client, params):
+    response = client.get('/api/guardar-contacto', query_string=params)
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+
+
+def _eventos(response):
+    """Cuadros SSE de la respuesta (sin esperar a que termine) como (tipo, id, datos)"""
+    for trozo in response.response:
+        cuadro = trozo.decode() if isinstance(trozo, bytes) else trozo
+        if cuadro.startswith(':'):
+            yield 'ping', None, None
+            continue
+        campos = dict(linea.split(': ', 1) for linea in cuadro.strip().split('\n'))
+        datos = campos.get('data')
+        yield campos.get('event', 'retry'), campos.get('id'), json.loads(datos) if datos else None
+
+
+def test_eventos(client, monkeypatch):
+    monkeypatch.setattr(servidor_excel, 'EVENTOS_PING', 0.1)
+    monkeypatch.setattr(servidor_excel, 'EVENTOS_DURACION', 1)
+    _guardar(client, 2)
+
+    response = client.get('/api/eventos', buffered=False)
+    assert response.mimetype == 'text/event-stream'
+    eventos = _eventos(response)
+    assert next(eventos)[0] == 'retry'
+
+    tipo, id_evento, resumen = next(eventos)
+    assert (tipo, id_evento) == ('estadisticas', '2')
+    assert (resumen['total_contactos'], resumen['nuevos']) == (2, 0)
+    assert next(eventos)[0] == 'ping'
+
+    # Un contacto nuevo llega al panel sin volver a pedir la lista
+    _guardar(client, 1)
+    tipo, id_evento, contacto = next(eventos)
+    assert (tipo, id_evento, contacto['id'], contacto['nombre']) == ('contacto', '3', 3, 'Contacto 0')
+    tipo, id_evento, resumen = next(eventos)
+    assert (tipo, id_evento) == ('estadisticas', '3')
+    assert (resumen['total_contactos'], resumen['nuevos']) == (3, 1)
+
+    # Pasado EVENTOS_DURACION la conexión termina (el navegador reconecta con retry)
+    assert {tipo for tipo, _, _ in eventos} <= {'ping'}
+    response.close()
+
+    # Al reconectar se envía lo que faltó desde Last-Event-ID
+    monkeypatch.setattr(servidor_excel, 'EVENTOS_DURACION', 0)
+    response = client.get('/api/eventos', headers={'Last-Event-ID': '1'})
+    eventos = list(_eventos(response))
+    assert [(tipo, id_evento) for tipo, id_evento, _ in eventos] == \
+        [('retry', None), ('contacto', '2'), ('contacto', '3'), ('estadisticas', '3')]
+
+
+def test_descarga_excel(client, monkeypatch):
+    temporales = []
+    crear = almacenamiento.temporary_xlsx_path
+
+    def temporal():
+        temporales.append(crear())
+        return temporales[-1]
+
+    monkeypatch.setattr(almacenamiento, 'temporary_xlsx_path', temporal)
+    _guardar(client, 2)
+
+    response = client.get('/api/descargar-excel?desde=2000-01-01')
+    assert response.status_code == 200
+    assert response.mimetype == almacenamiento.XLSX_MIMETYPE
+    hoja = openpyxl.load_workbook(io.BytesIO(response.data)).active
+    filas = list(hoja.values)
+    assert filas[0] == tuple(servidor_excel.COLUMNAS_EXCEL)
+    assert [fila[1] for fila in filas[1:]] == ['Contacto 0', 'Contacto 1']
+    # El Excel se armó en un temporal que se borra cuando el servidor cierra la respuesta
+    assert len(temporales) == 1 and os.path.exists(temporales[0])
+    response.close()
+    assert not os.path.exists(temporales[0])
+
+    # Sin contactos en el rango: solo los encabezados
+    response = client.get('/api/descargar-excel?hasta=2000-01-01')
+    assert len(list(openpyxl.load_workbook(io.BytesIO(response.data)).active.values)) == 1
+    response.close()
+    assert not os.path.exists(temporales[1])
+
+
+@pytest.mark.parametrize('consulta', ['desde=ayer', 'desde=2025-01-07&hasta=2025-01-06'])
+def test_descarga_excel_con_fechas_invalidas(client, consulta):
+    response = client.get(f'/api/descargar-excel?{consulta}')
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+def test_estadisticas(client, tmp_path):
+    vacio = client.get('/api/estadisticas').get_json()
+    assert (vacio['total_contactos'], vacio['contactos_hoy']) == (0, 0)
+
+    # Uno de ayer cargado por otro proceso sobre la misma base y dos de hoy
+    otro = _store(tmp_path, 'contactos')
+    otro.add(created_at=datetime.now() - timedelta(days=1), name='Ayer')
+    _guardar(client, 2)
+
+    resumen = client.get('/api/estadisticas').get_json()
+    assert (resumen['total_contactos'], resumen['contactos_hoy']) == (3, 2)
+    ultimo = datetime.strptime(resumen['ultimo_contacto'], '%Y-%m-%d %H:%M:%S')
+    assert datetime.now() - ultimo < timedelta(minutes=1)
+    assert resumen['mensaje'] == 'Total: 3, Hoy: 2'
+    assert client.get('/debug').get_json()['contactos_registrados'] == 3